@@ -54,6 +54,9 @@ CSRF_HEADER_NAME = 'HTTP_X_CSRFTOKEN'
 CSRF_FAILURE_VIEW = 'django.views.csrf.csrf_failure'
 
 # For nginx reverse proxy and Render
+# Proxies in front of the app that append to X-Forwarded-For; the client IP
+# used for rate limits is taken that many entries from the right (Render has one)
+TRUSTED_PROXY_COUNT = int(os.environ.get('TRUSTED_PROXY_COUNT', 1 if RENDER_EXTERNAL_HOSTNAME else 0))
 USE_X_FORWARDED_HOST = True
 USE_X_FORWARDED_PORT = True
 SECURE_PROXY_SSL_HEADER = ('HTTP_X_FORWARDED_PROTO', 'https')
@@ -77,12 +80,17 @@ INSTALLED_APPS = [
     'django.contrib.staticfiles',
     'django.contrib.humanize',
     'rest_framework',
+    'rest_framework.authtoken',
     'django_filters',
     'corsheaders',
     'authentication',
 ]
 
 MIDDLEWARE = [
+    'authentication.middleware.MetricsMiddleware',  # Outermost, so request durations cover the whole stack
+    'authentication.middleware.ProfilingMiddleware',
+    'authentication.middleware.ServerTimingMiddleware',
+    'authentication.middleware.NPlusOneMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',  # Add WhiteNoise for static files
@@ -112,7 +120,57 @@ TEMPLATES = [
     },
 ]
 
+# Request instrumentation (authentication.middleware.ServerTimingMiddleware):
+# per-request query count and time, app cache hits/misses and render time,
+# sent as a Server-Timing header and logged on 'authentication.timing'.
+# Off by default; when off the middleware and its hooks are not installed.
+SERVER_TIMING_ENABLED = os.environ.get('SERVER_TIMING_ENABLED', 'False') == 'True'
+SERVER_TIMING_SAMPLE_RATE = float(os.environ.get('SERVER_TIMING_SAMPLE_RATE', 1.0))  # fraction of requests measured
+SERVER_TIMING_HEADER = os.environ.get('SERVER_TIMING_HEADER', 'True') == 'True'
+SERVER_TIMING_LOG = True
+
+if SERVER_TIMING_ENABLED:
+    # Same engine, with template render time added to the request metrics
+    TEMPLATES[0]['BACKEND'] = 'authentication.instrumentation.TimedTemplates'
+
+# N+1 query detection (authentication.middleware.NPlusOneMiddleware): flags
+# NPLUSONE_THRESHOLD or more identical queries from the same code or template
+# line in one request. On with DEBUG; NPLUSONE_RAISE=True turns reports into
+# errors so the test suite fails. Keep it off in production (it inspects the
+# stack on every query).
+NPLUSONE_ENABLED = os.environ.get('NPLUSONE_ENABLED', str(DEBUG)) == 'True'
+NPLUSONE_THRESHOLD = int(os.environ.get('NPLUSONE_THRESHOLD', 5))
+NPLUSONE_RAISE = os.environ.get('NPLUSONE_RAISE', 'False') == 'True'
+
+# Prometheus metrics (authentication.metrics), scraped from /metrics: request
+# latency histograms per URL name, query/cache counters, orders and inventory
+# conflicts. Workers batch their increments and flush them into the
+# METRICS_CACHE_ALIAS cache every METRICS_FLUSH_INTERVAL seconds, so with Redis
+# the endpoint reports the total across all gunicorn workers. The scrape needs
+# `Authorization: Bearer <METRICS_AUTH_TOKEN>` when that is set, otherwise an
+# admin session.
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'False') == 'True'
+METRICS_CACHE_ALIAS = 'default'
+METRICS_FLUSH_INTERVAL = float(os.environ.get('METRICS_FLUSH_INTERVAL', 5.0))
+METRICS_AUTH_TOKEN = os.environ.get('METRICS_AUTH_TOKEN', '')
+
+# On-demand profiling (authentication.profiling), off by default: a request
+# carrying a signed token from /profiles/ in an X-Profile header is run under
+# cProfile with its queries recorded, and the result is shown at /profiles/.
+# Other requests only pay for a header lookup.
+PROFILING_ENABLED = os.environ.get('PROFILING_ENABLED', 'False') == 'True'
+PROFILING_CACHE_ALIAS = 'default'
+PROFILING_TOKEN_MAX_AGE = 3600  # seconds a profiling token stays valid
+PROFILING_TIMEOUT = 86400  # seconds a saved profile is kept
+PROFILING_KEEP = 50  # profiles listed in the viewer
+
 WSGI_APPLICATION = 'KoraQuest.wsgi.application'
+ASGI_APPLICATION = 'KoraQuest.asgi.application'
+
+# Serve the async view implementations (set when running under an ASGI server;
+# KoraQuest/asgi.py turns it on by default)
+ASYNC_VIEWS = os.environ.get('ASYNC_VIEWS', 'False') == 'True'
+ASYNC_QUERY_WORKERS = int(os.environ.get('ASYNC_QUERY_WORKERS', 8))  # Threads running concurrent catalog queries
 
 
 # Database
@@ -124,7 +182,9 @@ if os.environ.get('DATABASE_URL'):
     DATABASES = {
         'default': dj_database_url.config(
             default=os.environ.get('DATABASE_URL'),
-            conn_max_age=600,
+            # Persistent connections are not reused safely under ASGI; use a
+            # pooler (e.g. PgBouncer) there instead
+            conn_max_age=0 if ASYNC_VIEWS else 600,
             conn_health_checks=True,
         )
     }
@@ -137,8 +197,68 @@ else:
         }
     }
 
+# Caches
+# 'default' is the shared L2 (Redis when REDIS_URL is set, so every worker sees
+# the same sessions, tokens, OTPs and invalidations); 'local' is the
+# per-process L1 used by authentication.cache_utils
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ.get('REDIS_URL'),
+            'KEY_PREFIX': 'koraquest',
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'koraquest-default',
+        }
+    }
+CACHES['local'] = {
+    'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    'LOCATION': 'koraquest-l1',
+    'OPTIONS': {'MAX_ENTRIES': int(os.environ.get('CACHE_L1_MAX_ENTRIES', 5000))},
+}
+CACHE_L1_ALIAS = 'local'
+CACHE_L2_ALIAS = 'default'
+CACHE_L1_TIMEOUT = 5  # seconds; bounds cross-process staleness after an invalidation
+CACHE_DEFAULT_TIMEOUT = 300  # 5 minutes
+# Tag versions (cache_utils) and the catalog ETags built from them have to be
+# the same in every worker. Without REDIS_URL they live in one process's LocMem
+# cache, so tagged entries and ETags are only used with a single worker
+# (gunicorn's WEB_CONCURRENCY).
+CACHE_TAGS_ENABLED = bool(os.environ.get('REDIS_URL')) or int(os.environ.get('WEB_CONCURRENCY', 1)) <= 1
+
 AUTH_USER_MODEL = 'authentication.User'
 
+# The per-request user lookup is served from the cache (invalidated on save).
+# Only with a shared cache: with the per-process LocMem default, a save in one
+# worker would leave the others serving the stale user for the full timeout.
+if os.environ.get('REDIS_URL'):
+    AUTHENTICATION_BACKENDS = ['authentication.auth_backends.CachedModelBackend']
+else:
+    AUTHENTICATION_BACKENDS = ['django.contrib.auth.backends.ModelBackend']
+AUTH_USER_CACHE_ALIAS = 'default'
+AUTH_USER_CACHE_TIMEOUT = 300  # 5 minutes
+
+# Session storage, selected with SESSION_BACKEND:
+#   db        - Django's database sessions (default)
+#   cached_db - write-through cache in front of the database
+#   cache     - cache only, with a per-process L1 (needs a shared cache backend;
+#               run `manage.py migrate_sessions` when switching from db)
+SESSION_ENGINES = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'cache': 'authentication.session_backends',
+}
+SESSION_BACKEND = os.environ.get('SESSION_BACKEND', 'db')
+SESSION_ENGINE = SESSION_ENGINES[SESSION_BACKEND]
+SESSION_CACHE_ALIAS = 'default'
+SESSION_L1_TIMEOUT = 5  # seconds a session may be served from process memory
+SESSION_L1_MAX_ENTRIES = 10000
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -201,26 +321,58 @@ LOGOUT_REDIRECT_URL = '/'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
-# Email Configuration for OTP
+# Email Configuration for OTP and order mail
 if DEBUG:
     # For development, use console backend to see emails in terminal
-    EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
+    # (set EMAIL_BACKEND to the SMTP backend to test against `manage.py run_smtp_sink`)
+    EMAIL_BACKEND = os.environ.get('EMAIL_BACKEND', 'django.core.mail.backends.console.EmailBackend')
 else:
     # For production, use SMTP backend
     EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
-    EMAIL_HOST = os.environ.get('EMAIL_HOST', 'smtp.gmail.com')
-    EMAIL_PORT = int(os.environ.get('EMAIL_PORT', 587))
-    EMAIL_USE_TLS = os.environ.get('EMAIL_USE_TLS', 'True') == 'True'
-    EMAIL_HOST_USER = os.environ.get('EMAIL_HOST_USER', '')
-    EMAIL_HOST_PASSWORD = os.environ.get('EMAIL_HOST_PASSWORD', '')
-    DEFAULT_FROM_EMAIL = os.environ.get('DEFAULT_FROM_EMAIL', 'KoraQuest <noreply@koraquest.com>')
+EMAIL_HOST = os.environ.get('EMAIL_HOST', 'smtp.gmail.com')
+EMAIL_PORT = int(os.environ.get('EMAIL_PORT', 587))
+EMAIL_USE_TLS = os.environ.get('EMAIL_USE_TLS', 'True') == 'True'
+EMAIL_HOST_USER = os.environ.get('EMAIL_HOST_USER', '')
+EMAIL_HOST_PASSWORD = os.environ.get('EMAIL_HOST_PASSWORD', '')
+EMAIL_TIMEOUT = 10  # seconds; a stalled SMTP server must not hang the mail worker
+DEFAULT_FROM_EMAIL = os.environ.get('DEFAULT_FROM_EMAIL', 'KoraQuest <noreply@koraquest.com>')
+
+# Outbound mail is queued to a background worker that batches messages
+# over one persistent connection; set EMAIL_ASYNC=False to send inline.
+EMAIL_ASYNC = os.environ.get('EMAIL_ASYNC', 'True') == 'True'
+EMAIL_WORKER_BATCH_SIZE = 50
+EMAIL_WORKER_IDLE_TIMEOUT = 30  # seconds before an idle SMTP connection is closed
+EMAIL_MAX_RETRIES = 3
+EMAIL_RETRY_BACKOFF = 1.0  # seconds, doubled on each retry
+
+# OTP Settings
+# Codes are kept in the cache with a TTL (no database writes)
+OTP_CACHE_ALIAS = 'default'
+OTP_EXPIRY_SECONDS = 300  # 5 minutes
+OTP_MAX_ATTEMPTS = 5
+
+# Async auth endpoints: PBKDF2 hashing runs in a bounded pool, and in-flight
+# attempts are capped per client IP, per username and overall (429 beyond that)
+AUTH_HASHING_WORKERS = int(os.environ.get('AUTH_HASHING_WORKERS', 2))
+AUTH_MAX_PENDING_HASHES = AUTH_HASHING_WORKERS * 8
+AUTH_MAX_CONCURRENT_PER_IP = 4
+AUTH_MAX_CONCURRENT_PER_USERNAME = 2
+
+# API token authentication: token -> user mappings are cached for this long.
+# Like the cached session user, only with a shared cache: a per-process cache
+# could not be invalidated in the other workers on logout or deactivation.
+TOKEN_AUTH_CACHE_ENABLED = bool(os.environ.get('REDIS_URL'))
+TOKEN_AUTH_CACHE_ALIAS = 'default'
+TOKEN_AUTH_CACHE_TIMEOUT = 300  # 5 minutes
 
 # QR Code Settings
 QR_CODE_UPDATE_INTERVAL = 600  # 10 minutes in seconds
+QR_CODE_CACHE_SIZE = int(os.environ.get('QR_CODE_CACHE_SIZE', 256))  # Rendered images kept in memory per process
 
 # Django REST Framework Settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
+        'authentication.token_auth.CachedTokenAuthentication',
         'rest_framework.authentication.SessionAuthentication',
         'rest_framework.authentication.BasicAuthentication',
     ],
@@ -235,11 +387,59 @@ REST_FRAMEWORK = {
         'rest_framework.filters.OrderingFilter',
     ],
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
-        'rest_framework.renderers.BrowsableAPIRenderer',
+        'authentication.renderers.FastJSONRenderer',
     ],
+    'DEFAULT_THROTTLE_CLASSES': [
+        'authentication.throttling.SlidingWindowThrottle',
+    ],
+}
+
+# The browsable API is a development aid; production responses are JSON only
+if DEBUG:
+    REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'].append('rest_framework.renderers.BrowsableAPIRenderer')
+
+# Rate limiting (authentication.throttling): sliding windows stored in the cache,
+# per scope and per 'user', 'ip' or 'route' (all clients together).
+# Over-limit requests get 429 with Retry-After before any view work.
+RATE_LIMIT_ENABLED = os.environ.get('RATE_LIMIT_ENABLED', 'True') == 'True'
+RATE_LIMIT_CACHE_ALIAS = 'default'
+RATE_LIMITS = {
+    'api': {'user': '300/m', 'ip': '600/m'},  # DRF views without a throttle_scope
+    'login': {'ip': '20/m', 'route': '600/m'},
+    'dashboard': {'user': '60/m', 'ip': '240/m', 'route': '3000/m'},
+    'like': {'user': '30/m', 'ip': '120/m'},
+    'bookmark': {'user': '30/m', 'ip': '120/m'},
+    'otp': {'user': '5/h'},
+    'batch': {'user': '30/m', 'ip': '120/m'},  # each sub-request is also limited by its own scope
+    'sync': {'user': '60/m', 'ip': '240/m'},
 }
 
+# Batch endpoint (/v1/batch/): GET sub-requests per call and threads running them
+BATCH_MAX_REQUESTS = 10
+BATCH_WORKERS = int(os.environ.get('BATCH_WORKERS', 4))
+
+# Delta sync (/v1/sync/): rows per stream per call, how long rows must settle
+# before they are handed out, and how long deletions are remembered
+SYNC_BATCH_SIZE = 200
+SYNC_MAX_BATCH_SIZE = 500
+SYNC_SETTLE_SECONDS = 2
+SYNC_TOMBSTONE_RETENTION_DAYS = int(os.environ.get('SYNC_TOMBSTONE_RETENTION_DAYS', 30))
+
+# Bookmark sync (/v1/bookmarks/sync/): added + removed ids accepted per request
+BOOKMARK_SYNC_MAX_ITEMS = 500
+
+# Likes (authentication.like_service): with write-behind on, toggles are buffered
+# in the cache and written to the database in bulk every LIKE_FLUSH_INTERVAL
+# seconds. Needs a shared cache (REDIS_URL) when running several workers.
+LIKE_WRITE_BEHIND = os.environ.get('LIKE_WRITE_BEHIND', 'False') == 'True'
+LIKE_BUFFER_CACHE_ALIAS = 'default'
+LIKE_FLUSH_INTERVAL = 2.0  # seconds
+LIKE_FLUSH_BATCH_SIZE = 500  # buffered toggles written per flush
+
+# JSON encoder for JsonResponse views and the DRF renderer: 'orjson' (falls back
+# to the standard library when orjson is not installed) or 'stdlib'
+JSON_BACKEND = os.environ.get('JSON_BACKEND', 'orjson')
+
 # CORS Settings
 CORS_ALLOWED_ORIGINS = os.environ.get(
     'CORS_ALLOWED_ORIGINS', 
@@ -281,4 +481,34 @@ CORS_ALLOW_METHODS = [
     'PATCH',
     'POST',
     'PUT',
-]
\ No newline at end of file
+]
+# Response headers readable by cross-origin clients
+CORS_EXPOSE_HEADERS = [
+    'etag',
+    'retry-after',
+    'server-timing',
+]
+
+# Logging: request timing lines (SERVER_TIMING_ENABLED) and N+1 reports go to the console,
+# which Render collects; everything else keeps Django's defaults
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'authentication.timing': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+        'authentication.nplusone': {
+            'handlers': ['console'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+    },
+}
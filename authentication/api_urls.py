@@ -1,6 +1,7 @@
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from . import api_views_rest, api_views
+from . import api_views_rest, api_views, async_views
 
 # Create router for ViewSets
 router = DefaultRouter()
@@ -13,8 +14,8 @@ router.register(r'reviews', api_views_rest.ProductReviewViewSet, basename='revie
 # API URL patterns
 urlpatterns = [
     # Authentication endpoints
-    path('auth/register/', api_views_rest.UserRegistrationView.as_view(), name='api-register'),
-    path('auth/login/', api_views_rest.UserLoginView.as_view(), name='api-login'),
+    path('auth/register/', async_views.user_registration_view if settings.ASYNC_VIEWS else api_views_rest.UserRegistrationView.as_view(), name='api-register'),
+    path('auth/login/', async_views.user_login_view if settings.ASYNC_VIEWS else api_views_rest.UserLoginView.as_view(), name='api-login'),
     path('auth/logout/', api_views_rest.user_logout_view, name='api-logout'),
     
     # Dashboard and statistics
@@ -24,6 +25,7 @@ urlpatterns = [
     path('admin/statistics/', api_views.get_admin_statistics, name='api-admin-statistics'),
     path('admin/orders/<str:order_id>/', api_views.get_order_details, name='api-order-details'),
     path('admin/orders/update/', api_views.update_order_status_api, name='api-update-order-status'),
+    path('admin/pickups/verify/', api_views.verify_pickups_batch, name='api-verify-pickups-batch'),
     
     # Include router URLs
     path('', include(router.urls)),
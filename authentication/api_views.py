@@ -1,10 +1,13 @@
-from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_POST
 from django.contrib.auth import authenticate
 from django.contrib.auth.decorators import login_required
 from django.utils import timezone
+from django.db import transaction
+from .json_utils import JsonResponse
 from .models import Purchase, User, Post
+from .cache_utils import invalidate_tags_on_commit, model_tag, post_tag, user_tag
+from .qr_utils import parse_qr_token, QR_PURCHASE_STATUSES
 import json
 from django.db.models import Sum, Count, Avg
 from decimal import Decimal
@@ -170,3 +173,131 @@ def get_order_details(request, order_id):
         return JsonResponse({'error': 'Order not found'}, status=404)
     except Exception as e:
         return JsonResponse({'error': f'Error processing request: {str(e)}'}, status=500)
+
+
+# Upper bound on tokens + purchase IDs accepted by one batch verification call
+MAX_PICKUP_BATCH_SIZE = 100
+
+def _pickup_result(purchase):
+    return {
+        'id': purchase.id,
+        'order_id': purchase.order_id,
+        'buyer': purchase.buyer.username,
+        'product': purchase.product.title,
+        'quantity': purchase.quantity,
+        'status': purchase.status,
+    }
+
+@login_required
+@require_POST
+def verify_pickups_batch(request):
+    """
+    Verify and complete many scanned QR tokens or purchase IDs at once (Admin only).
+    
+    Body: {"tokens": [...], "purchase_ids": [...], "complete": true}
+    All purchases are loaded in one query; eligible ones are completed with a
+    single UPDATE. Results are returned per submitted item, in order.
+    """
+    if not request.user.is_admin:
+        return JsonResponse({'error': 'Access denied. Admin role required.'}, status=403)
+    
+    try:
+        data = json.loads(request.body)
+    except json.JSONDecodeError:
+        return JsonResponse({'error': 'Invalid JSON data'}, status=400)
+    if not isinstance(data, dict):
+        return JsonResponse({'error': 'Request body must be a JSON object'}, status=400)
+    
+    tokens = data.get('tokens') or []
+    raw_purchase_ids = data.get('purchase_ids') or []
+    complete = data.get('complete', True)
+    
+    if not isinstance(tokens, list) or not isinstance(raw_purchase_ids, list):
+        return JsonResponse({'error': 'tokens and purchase_ids must be lists'}, status=400)
+    # int() would read true as purchase 1 and 1.9 as 1
+    if not all(isinstance(pid, int) and not isinstance(pid, bool) for pid in raw_purchase_ids):
+        return JsonResponse({'error': 'purchase_ids must be integers'}, status=400)
+    # A string such as "false" would otherwise count as true and complete the orders
+    if not isinstance(complete, bool):
+        return JsonResponse({'error': 'complete must be true or false'}, status=400)
+    if not tokens and not raw_purchase_ids:
+        return JsonResponse({'error': 'Provide at least one token or purchase ID'}, status=400)
+    if len(tokens) + len(raw_purchase_ids) > MAX_PICKUP_BATCH_SIZE:
+        return JsonResponse({'error': f'At most {MAX_PICKUP_BATCH_SIZE} items per batch'}, status=400)
+    
+    # Decode every item first so the database is only hit once for the whole batch
+    items = []
+    for token in tokens:
+        try:
+            token_data = parse_qr_token(str(token))
+            items.append({'type': 'token', 'value': token, 'user_id': token_data['user_id'], 'purchase_ids': token_data['purchase_ids']})
+        except ValueError as e:
+            items.append({'type': 'token', 'value': token, 'error': str(e)})
+    for purchase_id in raw_purchase_ids:
+        items.append({'type': 'purchase_id', 'value': purchase_id, 'user_id': None, 'purchase_ids': [purchase_id]})
+    
+    all_ids = {pid for item in items if 'error' not in item for pid in item['purchase_ids']}
+    
+    try:
+        with transaction.atomic():
+            purchases = Purchase.objects.filter(id__in=all_ids).select_related('buyer', 'product').order_by()
+            if complete:
+                purchases = purchases.select_for_update(of=('self',))
+            purchases = {purchase.id: purchase for purchase in purchases}
+            
+            eligible_ids = set()
+            for item in items:
+                if 'error' in item:
+                    continue
+                item['purchases'] = []
+                for pid in item['purchase_ids']:
+                    purchase = purchases.get(pid)
+                    if purchase is None or (item['user_id'] is not None and purchase.buyer_id != item['user_id']):
+                        item['purchases'].append({'id': pid, 'eligible': False, 'error': 'Purchase not found'})
+                    elif purchase.status not in QR_PURCHASE_STATUSES:
+                        item['purchases'].append(dict(_pickup_result(purchase), eligible=False, error=f'Order is already {purchase.status}'))
+                    else:
+                        eligible_ids.add(pid)
+                        item['purchases'].append(dict(_pickup_result(purchase), eligible=True))
+            
+            completed_count = 0
+            if complete and eligible_ids:
+                completed_count = Purchase.objects.filter(
+                    id__in=eligible_ids,
+                    status__in=QR_PURCHASE_STATUSES
+                ).update(status='completed', updated_at=timezone.now())
+                # .update() sends no post_save, so invalidate cached purchase data here
+                completed = [purchases[pid] for pid in eligible_ids]
+                invalidate_tags_on_commit(
+                    model_tag(Purchase),
+                    *{post_tag(purchase.product_id) for purchase in completed},
+                    *{user_tag(purchase.buyer_id) for purchase in completed},
+                )
+                for item in items:
+                    for result in item.get('purchases', []):
+                        if result['eligible']:
+                            result['status'] = 'completed'
+    except Exception as e:
+        return JsonResponse({'error': f'Error processing request: {str(e)}'}, status=500)
+    
+    results = []
+    for item in items:
+        result = {item['type']: item['value']}
+        if 'error' in item:
+            result.update(success=False, error=item['error'], purchases=[])
+        else:
+            result.update(
+                success=any(p['eligible'] for p in item['purchases']),
+                purchases=item['purchases']
+            )
+        results.append(result)
+    
+    return JsonResponse({
+        'success': True,
+        'results': results,
+        'summary': {
+            'items': len(items),
+            'eligible_purchases': len(eligible_ids),
+            'completed_purchases': completed_count,
+        }
+    })
@@ -4,8 +4,10 @@ from rest_framework.response import Response
 from rest_framework.viewsets import ModelViewSet
 from rest_framework.permissions import IsAuthenticated, AllowAny, IsAdminUser
 from rest_framework.pagination import PageNumberPagination
-from rest_framework.parsers import MultiPartParser, FormParser
+from rest_framework.exceptions import NotFound
+from rest_framework.parsers import JSONParser, MultiPartParser, FormParser
 from django_filters.rest_framework import DjangoFilterBackend
+from django.db import transaction
 from django.db.models import Q, Sum, Count, Avg
 from django.utils import timezone
 from django.shortcuts import get_object_or_404
@@ -15,10 +17,15 @@ from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
 from django.utils.encoding import force_bytes, force_str
 from django.core.mail import send_mail
 from django.conf import settings
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
 
+from .http_utils import catalog_etag
+from . import bookmark_service, inventory_service, like_service
 from .models import (
     User, Post, Purchase, Bookmark, ProductImage, ProductReview
 )
+from .mail_utils import send_order_confirmation_email
 from .serializers import (
     UserSerializer, UserRegistrationSerializer, UserLoginSerializer,
     PostSerializer, PostCreateSerializer, PurchaseSerializer, PurchaseCreateSerializer,
@@ -58,6 +65,7 @@ class UserLoginView(generics.GenericAPIView):
     """User login endpoint"""
     serializer_class = UserLoginSerializer
     permission_classes = [AllowAny]
+    throttle_scope = 'login'
     
     def post(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
@@ -134,7 +142,7 @@ class PostViewSet(ModelViewSet):
         return PostSerializer
     
     def get_queryset(self):
-        if self.request.user.is_koraquest():
+        if self.request.user.is_admin:
             return Post.objects.all()
         else:
             return Post.objects.filter(user=self.request.user)
@@ -142,61 +150,70 @@ class PostViewSet(ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
     
+    def list(self, request, *args, **kwargs):
+        # Answer unchanged polls with 304 before running the query or serializer
+        etag = catalog_etag(request, request.user)
+        if etag is None:
+            return super().list(request, *args, **kwargs)
+        etag = quote_etag(etag)
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            return not_modified
+        response = super().list(request, *args, **kwargs)
+        if response.status_code == 200:
+            response['ETag'] = etag
+        return response
+    
     @action(detail=True, methods=['post'])
     def like(self, request, pk=None):
         """Like/unlike a post"""
         post = self.get_object()
-        if post.likes.filter(id=request.user.id).exists():
-            post.likes.remove(request.user)
-            liked = False
-        else:
-            post.likes.add(request.user)
-            liked = True
+        liked, likes_count = like_service.toggle_like(post.id, request.user.id)
         
         return Response({
             'liked': liked,
-            'likes_count': post.total_likes()
+            'likes_count': likes_count
         })
     
-    @action(detail=True, methods=['post'])
+    @action(detail=True, methods=['post'], parser_classes=[JSONParser, FormParser, MultiPartParser])
     def bookmark(self, request, pk=None):
-        """Bookmark/unbookmark a post"""
-        post = self.get_object()
-        bookmark, created = Bookmark.objects.get_or_create(
-            user=request.user,
-            post=post
-        )
-        
-        if not created:
-            bookmark.delete()
-            bookmarked = False
-        else:
-            bookmarked = True
+        """Bookmark/unbookmark a post; {"bookmarked": true|false} sets it instead of toggling"""
+        desired = request.data.get('bookmarked')
+        if isinstance(desired, str):
+            desired = {'true': True, 'false': False}.get(desired.lower())
+        # Skips get_object(): the bookmark write itself reports a missing product
+        try:
+            post_id = int(pk)
+            if isinstance(desired, bool):
+                bookmarked = bookmark_service.set_bookmark(request.user.id, post_id, desired)
+            else:
+                bookmarked = bookmark_service.toggle_bookmark(request.user.id, post_id)
+        except (Post.DoesNotExist, ValueError):
+            raise NotFound('Product not found')
         
         return Response({
             'bookmarked': bookmarked
         })
     
-    @action(detail=True, methods=['post'])
+    @action(detail=True, methods=['post'], parser_classes=[JSONParser, FormParser, MultiPartParser])
     def purchase(self, request, pk=None):
         """Purchase a product"""
         post = self.get_object()
         serializer = PurchaseCreateSerializer(data=request.data, context={'request': request})
         serializer.is_valid(raise_exception=True)
         
-        # Check inventory
-        if post.inventory < serializer.validated_data['quantity']:
-            return Response(
-                {'error': 'Insufficient inventory'}, 
-                status=status.HTTP_400_BAD_REQUEST
-            )
-        
-        # Create purchase
-        purchase = serializer.save()
+        with transaction.atomic():
+            # Reserve the stock in one conditional UPDATE so concurrent orders can't oversell
+            if not inventory_service.reserve_inventory(post.id, serializer.validated_data['quantity']):
+                return Response(
+                    {'error': 'Insufficient inventory'}, 
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            
+            # Create purchase
+            purchase = serializer.save()
         
-        # Update inventory
-        post.inventory -= purchase.quantity
-        post.save()
+        send_order_confirmation_email(purchase)
         
         return Response({
             'message': 'Purchase created successfully',
@@ -303,7 +320,7 @@ class ProductReviewViewSet(ModelViewSet):
     ordering = ['-created_at']
     
     def get_queryset(self):
-        if self.request.user.is_koraquest():
+        if self.request.user.is_admin:
             return ProductReview.objects.all()
         else:
             return ProductReview.objects.filter(reviewer=self.request.user)
@@ -325,6 +342,7 @@ def dashboard_stats(request):
         user_posts = Post.objects.all()
         total_posts = user_posts.count()
     else:
+        user_posts = Post.objects.none()
         total_posts = 0
     
     # Get user's purchases
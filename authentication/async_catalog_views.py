@@ -0,0 +1,356 @@
+"""
+Async versions of the read-heavy catalog views for ASGI deployments
+(served when ASYNC_VIEWS is on, see urls.py).
+
+Django's async ORM runs every query on the one thread-sensitive executor
+thread, so awaiting several of them with asyncio.gather would still execute
+them one after another. Independent queries are therefore run on a small
+dedicated pool (ASYNC_QUERY_WORKERS threads, each with its own database
+connection) so they overlap; dependent lookups use the async ORM directly.
+Templates still render in a sync thread, since they resolve lazy relations.
+"""
+
+import asyncio
+import functools
+import logging
+import math
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.decorators import login_required
+from django.db.models import Avg, Count, Q
+from django.shortcuts import aget_object_or_404, render
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_http_methods
+
+from .http_utils import catalog_etag, etag_conditional
+from .instrumentation import bind_context, run_with_connection_cleanup
+from .json_utils import JsonResponse
+from .models import Post, Bookmark, ProductImage, ProductReview
+from .throttling import rate_limit
+from .views import get_token_user, in_stock_category_counts, landing_page_stats
+
+logger = logging.getLogger(__name__)
+
+query_executor = ThreadPoolExecutor(
+    max_workers=getattr(settings, 'ASYNC_QUERY_WORKERS', 8),
+    thread_name_prefix='catalog-query',
+)
+
+DASHBOARD_SORTS = {
+    'price_low': ['price'],
+    'price_high': ['-price'],
+    'popular': ['-total_purchases', '-created_at'],
+    'rating': ['-created_at'],  # Order by average rating (implement this later)
+    'newest': ['-created_at'],
+}
+
+
+async def run_query(func, *args, **kwargs):
+    """Run a blocking ORM/cache call on the catalog query pool"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        query_executor,
+        bind_context(functools.partial(run_with_connection_cleanup, func, *args, **kwargs))
+    )
+
+
+async def gather_queries(**queries):
+    """
+    Run independent zero-argument query callables concurrently.
+    Returns {name: result}, e.g. gather_queries(count=qs.count, rows=lambda: list(qs)).
+    """
+    results = await asyncio.gather(*(run_query(func) for func in queries.values()))
+    return dict(zip(queries, results))
+
+
+async def get_request_user(request):
+    """Session user, falling back to the API token (like views.dashboard_api)"""
+    user = await request.auser()
+    if user.is_authenticated:
+        return user
+    return await run_query(get_token_user, request)
+
+
+# ============================================
+# LANDING PAGE (PUBLIC)
+# ============================================
+
+async def landing_page(request):
+    """Async landing page: the section queries run concurrently"""
+    in_stock = Post.objects.filter(inventory__gt=0)
+
+    data = await gather_queries(
+        new_arrivals=lambda: list(in_stock.order_by('-created_at')[:8]),
+        best_sellers=lambda: list(in_stock.order_by('-total_purchases')[:8]),
+        featured_products=lambda: list(in_stock.filter(price__isnull=False).order_by('-created_at')[:4]),
+        category_counts=in_stock_category_counts,
+        recent_reviews=lambda: list(
+            ProductReview.objects.filter(rating__gte=4).select_related('reviewer', 'product').order_by('-created_at')[:6]
+        ),
+        stats=landing_page_stats,
+    )
+
+    counts = data.pop('category_counts')
+    categories_with_counts = [
+        {'code': code, 'name': name, 'count': counts[code]}
+        for code, name in Post.CATEGORY_CHOICES
+        if counts.get(code, 0) > 0  # Only show categories with products
+    ]
+
+    context = dict(data, categories=categories_with_counts, is_landing_page=True)
+    return await sync_to_async(render)(request, 'authentication/landing_page.html', context)
+
+
+# ============================================
+# POST DETAIL
+# ============================================
+
+@login_required
+async def post_detail(request, post_id):
+    post = await aget_object_or_404(Post.objects.select_related('user'), id=post_id)
+    user = await request.auser()
+
+    data = await gather_queries(
+        is_bookmarked=Bookmark.objects.filter(user=user, post=post).exists,
+        auxiliary_images=lambda: list(ProductImage.objects.filter(product=post).order_by('display_order')),
+        reviews=lambda: list(ProductReview.objects.filter(product=post).select_related('reviewer').order_by('-created_at')),
+        user_review=ProductReview.objects.filter(product=post, reviewer=user).first,
+    )
+
+    context = dict(
+        data,
+        post=post,
+        is_owner=post.user_id == user.pk,
+        has_purchased=False,  # Always allow purchases
+    )
+    return await sync_to_async(render)(request, 'authentication/post_detail.html', context)
+
+
+# ============================================
+# V1 JSON API
+# ============================================
+
+async def dashboard_etag(request):
+    user = await get_request_user(request)
+    if not user:
+        return None
+    return await run_query(catalog_etag, request, user)
+
+
+def _dashboard_page_number(page_number, total, page_size):
+    """Same clamping as Paginator.get_page: invalid -> 1, out of range -> last page"""
+    num_pages = max(1, math.ceil(total / page_size))
+    try:
+        number = int(page_number)
+    except (TypeError, ValueError):
+        return 1, num_pages
+    if number < 1 or number > num_pages:
+        return num_pages, num_pages
+    return number, num_pages
+
+
+@csrf_exempt
+@require_http_methods(['GET'])
+@rate_limit('dashboard')
+@etag_conditional(dashboard_etag)
+async def dashboard_api(request):
+    """
+    Async dashboard_api with the same response. Per-post review and image
+    lookups are batched into one query each instead of one per post.
+    """
+    try:
+        user = await get_request_user(request)
+        if not user:
+            return JsonResponse({
+                'success': False,
+                'message': 'Authentication required',
+                'errors': {'auth': ['Please provide valid authentication credentials']}
+            }, status=401)
+
+        search_query = request.GET.get('q', '').strip()
+        category = request.GET.get('category', '')
+        min_price = request.GET.get('min_price', '')
+        max_price = request.GET.get('max_price', '')
+        sort_by = request.GET.get('sort', 'newest')
+        page_size = int(request.GET.get('page_size', 20))
+        if page_size > 100:
+            page_size = 100
+        elif page_size < 1:
+            page_size = 20
+
+        posts = Post.objects.filter(inventory__gt=0)
+        # Filter out the user's own products if they are a vendor (store admin)
+        if user.is_admin:
+            posts = posts.exclude(user=user)
+        if search_query:
+            posts = posts.filter(
+                Q(title__icontains=search_query) |
+                Q(description__icontains=search_query) |
+                Q(user__username__icontains=search_query)
+            )
+        if category:
+            category = category.lower()
+            posts = posts.filter(category=category)
+        for param, lookup in ((min_price, 'price__gte'), (max_price, 'price__lte')):
+            if param:
+                try:
+                    posts = posts.filter(**{lookup: float(param)})
+                except ValueError:
+                    pass
+        posts = posts.order_by(*DASHBOARD_SORTS.get(sort_by, DASHBOARD_SORTS['newest']))
+
+        counts = await gather_queries(
+            total=posts.count,
+            bookmarked=lambda: set(Bookmark.objects.filter(user=user).values_list('post_id', flat=True)),
+            liked=lambda: set(Post.likes.through.objects.filter(user_id=user.pk).values_list('post_id', flat=True)),
+        )
+        total_products = counts['total']
+        page_number, num_pages = _dashboard_page_number(request.GET.get('page', 1), total_products, page_size)
+
+        offset = (page_number - 1) * page_size
+        page_posts = [post async for post in posts.select_related('user')[offset:offset + page_size]]
+        page_ids = [post.id for post in page_posts]
+
+        related = await gather_queries(
+            images=lambda: list(ProductImage.objects.filter(product_id__in=page_ids).order_by('display_order')),
+            ratings=lambda: {
+                row['product_id']: row
+                for row in ProductReview.objects.filter(product_id__in=page_ids)
+                .values('product_id').annotate(avg=Avg('rating'), count=Count('id')).order_by()
+            },
+        )
+
+        images_by_post = {}
+        for img in related['images']:
+            images_by_post.setdefault(img.product_id, []).append({
+                'id': img.id,
+                'image_url': img.image.url if img.image else None,
+                'image_placeholder': img.image_placeholder or None,
+                'dominant_color': img.dominant_color or None,
+                'display_order': img.display_order
+            })
+
+        posts_data = []
+        for post in page_posts:
+            rating = related['ratings'].get(post.id, {})
+            avg_rating = rating.get('avg')
+            posts_data.append({
+                'id': post.id,
+                'title': post.title,
+                'description': post.description,
+                'price': float(post.price) if post.price else None,
+                'category': post.category,
+                'category_display': post.get_category_display(),
+                'inventory': post.inventory,
+                'created_at': post.created_at.isoformat(),
+                'updated_at': post.updated_at.isoformat(),
+                'total_purchases': post.total_purchases,
+                'image_url': post.image.url if post.image else None,
+                'image_placeholder': post.image_placeholder or None,
+                'dominant_color': post.dominant_color or None,
+                'auxiliary_images': images_by_post.get(post.id, []),
+                'average_rating': round(avg_rating, 1) if avg_rating else None,
+                'review_count': rating.get('count', 0),
+                'total_likes': post.like_count,
+                'is_bookmarked': post.id in counts['bookmarked'],
+                'is_liked': post.id in counts['liked'],
+                'user': {
+                    'id': post.user.id,
+                    'username': post.user.username,
+                    'first_name': post.user.first_name,
+                    'last_name': post.user.last_name,
+                    'is_vendor_role': post.user.is_admin,
+                    'profile_picture_url': post.user.profile_picture.url if post.user.profile_picture else None
+                } if post.user else None
+            })
+
+        return JsonResponse({
+            'success': True,
+            'message': 'Dashboard data retrieved successfully',
+            'data': {
+                'posts': posts_data,
+                'pagination': {
+                    'current_page': page_number,
+                    'total_pages': num_pages,
+                    'page_size': page_size,
+                    'total_items': total_products,
+                    'has_next': page_number < num_pages,
+                    'has_previous': page_number > 1,
+                    'next_page': page_number + 1 if page_number < num_pages else None,
+                    'previous_page': page_number - 1 if page_number > 1 else None
+                },
+                'filters': {
+                    'search_query': search_query,
+                    'selected_category': category,
+                    'min_price': min_price,
+                    'max_price': max_price,
+                    'sort_by': sort_by,
+                    'available_categories': [
+                        {'value': value, 'label': label} for value, label in Post.CATEGORY_CHOICES
+                    ],
+                    'available_sorts': [
+                        {'value': 'newest', 'label': 'Newest First'},
+                        {'value': 'price_low', 'label': 'Price: Low to High'},
+                        {'value': 'price_high', 'label': 'Price: High to Low'},
+                        {'value': 'popular', 'label': 'Most Popular'},
+                        {'value': 'rating', 'label': 'Highest Rated'}
+                    ]
+                },
+                'user_info': {
+                    'id': user.id,
+                    'username': user.username,
+                    'is_vendor_role': user.is_admin,
+                    'total_bookmarks': len(counts['bookmarked']),
+                    'total_liked_posts': len(counts['liked'])
+                },
+                'summary': {
+                    'total_products': total_products,
+                    'products_on_page': len(posts_data),
+                    'search_applied': bool(search_query),
+                    'filters_applied': bool(category or min_price or max_price),
+                    'sort_applied': sort_by != 'newest'
+                }
+            }
+        }, status=200)
+
+    except Exception as e:
+        logger.error(f"Async dashboard API error: {str(e)}")
+        return JsonResponse({
+            'success': False,
+            'message': 'Internal server error',
+            'errors': {'server': ['An unexpected error occurred']}
+        }, status=500)
+
+
+async def categories_etag(request):
+    return await run_query(catalog_etag, request)
+
+
+@csrf_exempt
+@require_http_methods(['GET'])
+@etag_conditional(categories_etag)
+async def categories_api(request):
+    """Async API endpoint to get all available categories"""
+    try:
+        counts = await run_query(in_stock_category_counts)
+        categories_data = [
+            {'value': value, 'label': label, 'product_count': counts.get(value, 0)}
+            for value, label in Post.CATEGORY_CHOICES
+        ]
+        return JsonResponse({
+            'success': True,
+            'message': 'Categories retrieved successfully',
+            'data': {
+                'categories': categories_data,
+                'total_categories': len(categories_data)
+            }
+        }, status=200)
+
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'message': 'Error retrieving categories',
+            'errors': {'server': [str(e)]}
+        }, status=500)
@@ -0,0 +1,351 @@
+"""
+Async versions of the login and registration endpoints for ASGI deployments.
+
+Password hashing (PBKDF2) runs in a small dedicated thread pool instead of on
+the event loop or the shared sync-view thread, and in-flight attempts are
+capped per client IP, per username and overall, so a credential-stuffing
+burst is rejected with 429 instead of starving catalog traffic.
+"""
+
+import asyncio
+import functools
+import json
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import authenticate, alogin
+from django.utils import timezone
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_http_methods
+from rest_framework.authtoken.models import Token
+
+from .forms import SignUpForm
+from .http_utils import get_client_ip
+from .instrumentation import bind_context, run_with_connection_cleanup
+from .json_utils import JsonResponse
+from .models import User
+from .serializers import UserSerializer, UserRegistrationSerializer, UserLoginSerializer
+from .throttling import rate_limit
+
+logger = logging.getLogger(__name__)
+
+hashing_executor = ThreadPoolExecutor(
+    max_workers=getattr(settings, 'AUTH_HASHING_WORKERS', 2),
+    thread_name_prefix='auth-hashing',
+)
+
+
+class ConcurrencyLimiter:
+    """Thread-safe count of in-flight operations per key, capped at `limit`"""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def try_acquire(self, key):
+        with self._lock:
+            count = self._counts.get(key, 0)
+            if count >= self.limit:
+                return False
+            self._counts[key] = count + 1
+            return True
+
+    def release(self, key):
+        with self._lock:
+            count = self._counts.get(key, 0) - 1
+            if count > 0:
+                self._counts[key] = count
+            else:
+                self._counts.pop(key, None)
+
+
+ip_limiter = ConcurrencyLimiter(getattr(settings, 'AUTH_MAX_CONCURRENT_PER_IP', 4))
+username_limiter = ConcurrencyLimiter(getattr(settings, 'AUTH_MAX_CONCURRENT_PER_USERNAME', 2))
+pending_limiter = ConcurrencyLimiter(getattr(settings, 'AUTH_MAX_PENDING_HASHES', 16))
+
+
+def acquire_auth_slots(request, username):
+    """
+    Reserve an IP, username and global hashing slot.
+    Returns the list of reservations to release, or None if any limit is hit.
+    """
+    wanted = [
+        (pending_limiter, 'all'),
+        (ip_limiter, get_client_ip(request)),
+        (username_limiter, (username or '').lower()),
+    ]
+    acquired = []
+    for limiter, key in wanted:
+        if not limiter.try_acquire(key):
+            release_auth_slots(acquired)
+            return None
+        acquired.append((limiter, key))
+    return acquired
+
+
+def release_auth_slots(acquired):
+    for limiter, key in acquired:
+        limiter.release(key)
+
+
+async def run_in_hashing_executor(func, *args, **kwargs):
+    """Run blocking, hashing-heavy code in the bounded auth thread pool"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        hashing_executor,
+        bind_context(functools.partial(run_with_connection_cleanup, func, *args, **kwargs))
+    )
+
+
+def too_many_requests(message):
+    response = JsonResponse({
+        'success': False,
+        'message': 'Too many requests',
+        'errors': {'throttle': [message]}
+    }, status=429)
+    response['Retry-After'] = '1'
+    return response
+
+
+def parse_request_data(request):
+    """
+    Parse JSON or form data the same way the sync v1 endpoints do.
+    Raises ValueError for invalid JSON and for JSON that is not an object.
+    """
+    if request.content_type == 'application/json':
+        data = json.loads(request.body)
+        if not isinstance(data, dict):
+            raise ValueError('Request body must be a JSON object')
+        return data
+    return request.POST.dict()
+
+
+# ============================================
+# V1 JSON API
+# ============================================
+
+@csrf_exempt
+@require_http_methods(['POST'])
+@rate_limit('login')
+async def login_api(request):
+    """Async API endpoint for user login"""
+    try:
+        data = parse_request_data(request)
+    except ValueError:
+        return JsonResponse({
+            'success': False,
+            'message': 'Invalid JSON data',
+            'errors': {'json': ['Request body contains invalid JSON']}
+        }, status=400)
+
+    username = data.get('username')
+    password = data.get('password')
+
+    if not username or not password:
+        return JsonResponse({
+            'success': False,
+            'message': 'Missing credentials',
+            'errors': {
+                'credentials': ['Both username and password are required']
+            }
+        }, status=400)
+
+    slots = acquire_auth_slots(request, username)
+    if slots is None:
+        return too_many_requests('Too many concurrent login attempts. Please retry shortly.')
+
+    try:
+        user = await run_in_hashing_executor(authenticate, request, username=username, password=password)
+    except Exception as e:
+        logger.error(f"Async login API error: {str(e)}")
+        return JsonResponse({
+            'success': False,
+            'message': 'Internal server error',
+            'errors': {
+                'server': ['An unexpected error occurred during login']
+            }
+        }, status=500)
+    finally:
+        release_auth_slots(slots)
+
+    if user is None:
+        return JsonResponse({
+            'success': False,
+            'message': 'Invalid credentials',
+            'errors': {
+                'credentials': ['Username or password is incorrect']
+            }
+        }, status=401)
+
+    if not user.is_active:
+        return JsonResponse({
+            'success': False,
+            'message': 'Account disabled',
+            'errors': {
+                'account': ['This account has been disabled. Please contact support.']
+            }
+        }, status=403)
+
+    user.last_login = timezone.now()
+    await User.objects.filter(pk=user.pk).aupdate(last_login=user.last_login)
+    token, created = await Token.objects.aget_or_create(user=user)
+
+    return JsonResponse({
+        'success': True,
+        'message': 'Login successful',
+        'data': {
+            'user': {
+                'id': user.id,
+                'username': user.username,
+                'email': user.email,
+                'first_name': user.first_name,
+                'last_name': user.last_name,
+                'role': user.role,
+                'phone_number': getattr(user, 'phone_number', ''),
+                'last_login': user.last_login.isoformat() if user.last_login else None
+            },
+            'auth': {
+                'token': token.key,
+                'token_type': 'Bearer',
+                'expires_in': '30 days'
+            }
+        }
+    }, status=200)
+
+
+def _register_with_form(data):
+    form = SignUpForm(data)
+    if form.is_valid():
+        return form.save(), None
+    return None, form.errors
+
+
+@csrf_exempt
+@require_http_methods(['POST'])
+async def register_api(request):
+    """Async API endpoint for user registration"""
+    try:
+        data = parse_request_data(request)
+    except ValueError:
+        return JsonResponse({
+            'success': False,
+            'message': 'Invalid JSON data',
+            'errors': {'json': ['Request body contains invalid JSON']}
+        }, status=400)
+
+    slots = acquire_auth_slots(request, data.get('username'))
+    if slots is None:
+        return too_many_requests('Too many concurrent registrations. Please retry shortly.')
+
+    try:
+        user, errors = await run_in_hashing_executor(_register_with_form, data)
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'message': 'Server error occurred',
+            'errors': {'server': [str(e)]}
+        }, status=500)
+    finally:
+        release_auth_slots(slots)
+
+    if errors is not None:
+        return JsonResponse({
+            'success': False,
+            'message': 'Validation failed',
+            'errors': errors
+        }, status=400)
+
+    return JsonResponse({
+        'success': True,
+        'message': 'Account created successfully',
+        'data': {
+            'user_id': user.id,
+            'username': user.username,
+            'email': user.email,
+            'first_name': user.first_name,
+            'last_name': user.last_name,
+            'role': user.role
+        }
+    }, status=201)
+
+
+# ============================================
+# REST API (async equivalents of UserLoginView / UserRegistrationView)
+# ============================================
+
+def _validate_login(data):
+    serializer = UserLoginSerializer(data=data)
+    if serializer.is_valid():
+        return serializer.validated_data['user'], None
+    return None, serializer.errors
+
+
+def _register_with_serializer(data):
+    serializer = UserRegistrationSerializer(data=data)
+    if serializer.is_valid():
+        user = serializer.save()
+        return user, UserSerializer(user).data, None
+    return None, None, serializer.errors
+
+
+@csrf_exempt
+@require_http_methods(['POST'])
+@rate_limit('login')
+async def user_login_view(request):
+    """User login endpoint"""
+    try:
+        data = parse_request_data(request)
+    except ValueError:
+        return JsonResponse({'detail': 'JSON parse error'}, status=400)
+
+    slots = acquire_auth_slots(request, data.get('username'))
+    if slots is None:
+        return too_many_requests('Too many concurrent login attempts. Please retry shortly.')
+
+    try:
+        user, errors = await run_in_hashing_executor(_validate_login, data)
+    finally:
+        release_auth_slots(slots)
+
+    if errors is not None:
+        return JsonResponse(errors, status=400)
+
+    await alogin(request, user)
+
+    return JsonResponse({
+        'message': 'Login successful',
+        'user': UserSerializer(user).data
+    })
+
+
+@csrf_exempt
+@require_http_methods(['POST'])
+async def user_registration_view(request):
+    """User registration endpoint"""
+    try:
+        data = parse_request_data(request)
+    except ValueError:
+        return JsonResponse({'detail': 'JSON parse error'}, status=400)
+
+    slots = acquire_auth_slots(request, data.get('username'))
+    if slots is None:
+        return too_many_requests('Too many concurrent registrations. Please retry shortly.')
+
+    try:
+        user, user_data, errors = await run_in_hashing_executor(_register_with_serializer, data)
+    finally:
+        release_auth_slots(slots)
+
+    if errors is not None:
+        return JsonResponse(errors, status=400)
+
+    # Auto-login after registration
+    await alogin(request, user)
+
+    return JsonResponse({
+        'message': 'User registered successfully',
+        'user': user_data
+    }, status=201)
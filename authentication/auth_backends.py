@@ -0,0 +1,32 @@
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import caches
+
+def _cache():
+    return caches[getattr(settings, 'AUTH_USER_CACHE_ALIAS', 'default')]
+
+def _user_cache_key(user_id):
+    return f"auth_user:{user_id}"
+
+def invalidate_cached_user(user_id):
+    """Drop the cached user row (called from signals when the user is saved)"""
+    _cache().delete(_user_cache_key(user_id))
+
+
+class CachedModelBackend(ModelBackend):
+    """
+    ModelBackend whose per-request user lookup is served from the cache.
+    AuthenticationMiddleware calls get_user() on every authenticated request;
+    with this backend a warm lookup costs no database query.
+    """
+
+    def get_user(self, user_id):
+        cache = _cache()
+        cache_key = _user_cache_key(user_id)
+        user = cache.get(cache_key)
+        if user is None:
+            user = super().get_user(user_id)
+            if user is None:
+                return None
+            cache.set(cache_key, user, timeout=getattr(settings, 'AUTH_USER_CACHE_TIMEOUT', 300))
+        return user if self.user_can_authenticate(user) else None
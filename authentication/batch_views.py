@@ -0,0 +1,195 @@
+"""
+Batch endpoint for mobile app startup.
+
+POST /v1/batch/ with
+    {"requests": [{"id": "dash", "path": "/v1/dashboard/?page=1"},
+                  {"id": "me", "path": "/api/rest/users/me/",
+                   "headers": {"If-None-Match": "\"...\""}}]}
+runs every sub-request in-process and returns
+    {"success": true, "responses": [{"id": "dash", "status": 200, "headers": {...}, "body": {...}}, ...]}
+in request order.
+
+Only GET requests to the read APIs in BATCH_VIEWS are accepted (the v1
+dashboard and categories, the REST dashboard stats and users/me); anything
+else is answered with 403 without running. Being side-effect free, they run
+concurrently on a small thread pool (BATCH_WORKERS).
+
+The caller is authenticated once (session or Bearer token) and the resolved
+user is handed to every sub-request, so sessions and tokens are not loaded
+again. Sub-requests get no session object of their own: the batch request's
+session is not shared across the pool threads. CSRF checks still apply as
+usual (they pass for GET). Per-view rate limits and ETag handling still apply
+to each sub-request.
+"""
+
+import functools
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.conf import settings
+from django.http import HttpRequest, QueryDict
+from django.urls import Resolver404, resolve
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_http_methods
+
+from .instrumentation import bind_context, run_with_connection_cleanup
+from .json_utils import JsonResponse, loads
+from .throttling import rate_limit
+from .token_auth import get_bearer_token, get_user_for_token
+
+logger = logging.getLogger(__name__)
+
+batch_executor = ThreadPoolExecutor(
+    max_workers=getattr(settings, 'BATCH_WORKERS', 4),
+    thread_name_prefix='batch-request',
+)
+
+# Request headers a sub-request may set; everything else (auth, cookies) comes from the batch
+SUB_REQUEST_HEADERS = {
+    'if-none-match': 'HTTP_IF_NONE_MATCH',
+    'accept': 'HTTP_ACCEPT',
+    'accept-language': 'HTTP_ACCEPT_LANGUAGE',
+}
+
+# Response headers copied into each sub-response
+SUB_RESPONSE_HEADERS = ('ETag', 'Retry-After', 'Location')
+
+# URL names a batch may call: read-only APIs used at app startup
+BATCH_VIEWS = frozenset({'dashboard_api', 'categories_api', 'api-dashboard-stats', 'user-me'})
+
+
+def build_sub_request(request, user, path, headers):
+    """A GET request for `path` carrying the batch request's client and user"""
+    path, _, query_string = path.partition('?')
+
+    sub_request = HttpRequest()
+    sub_request.method = 'GET'
+    sub_request.path = sub_request.path_info = path
+    sub_request.META = dict(request.META, REQUEST_METHOD='GET', PATH_INFO=path, QUERY_STRING=query_string)
+    sub_request.META.pop('CONTENT_TYPE', None)
+    sub_request.META.pop('CONTENT_LENGTH', None)
+    for name, value in (headers or {}).items():
+        meta_key = SUB_REQUEST_HEADERS.get(str(name).lower())
+        if meta_key:
+            sub_request.META[meta_key] = str(value)
+    sub_request.GET = QueryDict(query_string)
+    sub_request.COOKIES = dict(request.COOKIES)
+    sub_request.user = user
+
+    async def auser():
+        return user
+    sub_request.auser = auser
+    return sub_request
+
+
+def run_sub_request(sub_request, match):
+    """Call the resolved view and return (status, headers, body)"""
+    sub_request.resolver_match = match
+    view = match.func
+    if iscoroutinefunction(view):
+        response = async_to_sync(view)(sub_request, *match.args, **match.kwargs)
+    else:
+        response = view(sub_request, *match.args, **match.kwargs)
+    # DRF and template responses are rendered lazily by the handler normally
+    if hasattr(response, 'render') and not getattr(response, 'is_rendered', True):
+        response.render()
+
+    headers = {name: response[name] for name in SUB_RESPONSE_HEADERS if response.has_header(name)}
+    body = None
+    if not getattr(response, 'streaming', False) and response.content:
+        if response.get('Content-Type', '').startswith('application/json'):
+            body = loads(response.content)
+        else:
+            body = response.content.decode(response.charset or 'utf-8', errors='replace')
+    return response.status_code, headers, body
+
+
+def error_result(item_id, status, message):
+    return {'id': item_id, 'status': status, 'headers': {}, 'body': {'success': False, 'message': message}}
+
+
+@csrf_exempt
+@require_http_methods(['POST'])
+@rate_limit('batch')
+def batch_api(request):
+    """Run several GET API calls in one round trip"""
+    if request.user.is_authenticated:
+        user = request.user
+    else:
+        user = get_user_for_token(get_bearer_token(request))
+        if not user:
+            return JsonResponse({
+                'success': False,
+                'message': 'Authentication required',
+                'errors': {'auth': ['Please provide valid authentication credentials']}
+            }, status=401)
+
+    try:
+        data = json.loads(request.body)
+    except json.JSONDecodeError:
+        return JsonResponse({
+            'success': False,
+            'message': 'Invalid JSON data',
+            'errors': {'json': ['Request body contains invalid JSON']}
+        }, status=400)
+
+    items = data.get('requests') if isinstance(data, dict) else None
+    max_requests = getattr(settings, 'BATCH_MAX_REQUESTS', 10)
+    if not isinstance(items, list) or not items:
+        return JsonResponse({
+            'success': False,
+            'message': 'Validation failed',
+            'errors': {'requests': ['Provide a non-empty list of sub-requests']}
+        }, status=400)
+    if len(items) > max_requests:
+        return JsonResponse({
+            'success': False,
+            'message': 'Validation failed',
+            'errors': {'requests': [f'At most {max_requests} sub-requests per batch']}
+        }, status=400)
+
+    results = [None] * len(items)
+    jobs = []
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            results[index] = error_result(None, 400, 'Each sub-request must be an object')
+            continue
+        item_id = item.get('id', index)
+        path = item.get('path')
+        method = item.get('method', 'GET')
+        if not isinstance(method, str):
+            results[index] = error_result(item_id, 400, 'method must be a string')
+            continue
+        if method.upper() != 'GET':
+            results[index] = error_result(item_id, 405, 'Only GET sub-requests are supported')
+            continue
+        if not isinstance(path, str) or not path.startswith('/'):
+            results[index] = error_result(item_id, 400, 'path must be an absolute URL path')
+            continue
+        try:
+            match = resolve(path.partition('?')[0])
+        except Resolver404:
+            results[index] = error_result(item_id, 404, 'Not found')
+            continue
+        if match.url_name not in BATCH_VIEWS:
+            results[index] = error_result(item_id, 403, 'This endpoint cannot be called from a batch')
+            continue
+        sub_request = build_sub_request(request, user, path, item.get('headers'))
+        jobs.append((index, item_id, batch_executor.submit(
+            bind_context(functools.partial(run_with_connection_cleanup, run_sub_request, sub_request, match))
+        )))
+
+    for index, item_id, future in jobs:
+        try:
+            status, headers, body = future.result()
+            results[index] = {'id': item_id, 'status': status, 'headers': headers, 'body': body}
+        except Exception as e:
+            logger.error(f"Batch sub-request {items[index].get('path')} failed: {str(e)}")
+            results[index] = error_result(item_id, 500, 'An unexpected error occurred')
+
+    return JsonResponse({
+        'success': True,
+        'responses': results,
+    }, status=200)
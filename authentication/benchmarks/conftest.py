@@ -0,0 +1,156 @@
+"""
+Benchmark fixtures.
+
+The test database is seeded once per session with the large catalog from
+seed.py (scaled by --bench-scale). Each benchmark requests one view a few
+times with the caches cleared, so every round takes the full database path,
+and records the median and p95 wall time and the number of queries.
+
+Results are written to --bench-output. With --bench-save-baseline they also
+become the new baseline; otherwise a run is compared to the saved baseline
+(when it was recorded at the same scale, seed and database engine) and a
+view fails if its median exceeds the baseline by more than --bench-tolerance,
+or if it runs more queries than before. Timings depend on the machine, so
+record the baseline on the machine that runs the comparison. --nplusone also
+fails views whose requests run N+1 query patterns (see nplusone.py).
+
+    pytest --bench-scale 1                         # full size, compare to baseline
+    pytest --bench-scale 0.05                      # quick run on a small catalog
+    pytest --bench-scale 1 --bench-save-baseline   # record a new baseline
+
+Without a scale (--bench-scale or $BENCHMARK_SCALE) the benchmarks are
+deselected and a plain pytest runs only the unit tests.
+
+The seed is committed when the test database is created, so with a
+persistent database (DATABASE_URL pointing at PostgreSQL) and --reuse-db it
+is built only once.
+"""
+
+import statistics
+import time
+from contextlib import nullcontext
+
+import pytest
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Count
+from django.test.utils import override_settings
+
+from authentication import instrumentation
+from authentication.nplusone import detect_nplusone
+from authentication.benchmarks.plugin import NOISE_FLOOR_MS, load_baseline, results_key
+from authentication.benchmarks.seed import SEED_USERNAME_PREFIX, is_seeded, seed_catalog
+from authentication.models import User
+
+
+@pytest.fixture(scope='session')
+def django_db_setup(django_db_setup, django_db_blocker, request):
+    config = request.config
+    with django_db_blocker.unblock():
+        if not is_seeded():
+            start = time.perf_counter()
+            seed_catalog(scale=config.getoption('--bench-scale'), seed=config.getoption('--bench-seed'))
+            config.stash[results_key]['_seed_seconds'] = round(time.perf_counter() - start, 1)
+
+
+@pytest.fixture(scope='session', autouse=True)
+def bench_settings():
+    with override_settings(
+        ALLOWED_HOSTS=['*'],
+        RATE_LIMIT_ENABLED=False,
+        # The per-request metrics below replace the middleware's
+        SERVER_TIMING_ENABLED=False,
+        # Templates reference static files that are not collected here
+        STORAGES={**settings.STORAGES, 'staticfiles': {
+            'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+        }},
+        # Never clear a shared cache between rounds
+        CACHES={alias: {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': f'bench-{alias}'}
+                for alias in settings.CACHES},
+    ):
+        instrumentation.install_query_hook()
+        yield
+
+
+@pytest.fixture(scope='session')
+def bench_admin(django_db_setup, django_db_blocker):
+    with django_db_blocker.unblock():
+        return User.objects.filter(username__startswith=f'{SEED_USERNAME_PREFIX}_admin_').order_by('pk').first()
+
+
+@pytest.fixture(scope='session')
+def bench_customer(django_db_setup, django_db_blocker):
+    """The customer with the longest purchase history"""
+    with django_db_blocker.unblock():
+        return (
+            User.objects.filter(username__startswith=f'{SEED_USERNAME_PREFIX}_customer_')
+            .annotate(purchase_count=Count('purchases'))
+            .order_by('-purchase_count', 'pk')
+            .first()
+        )
+
+
+def _timed_get(client, url):
+    metrics, token = instrumentation.start_request()
+    try:
+        start = time.perf_counter()
+        response = client.get(url)
+        if response.streaming:
+            b''.join(response.streaming_content)
+        elapsed = time.perf_counter() - start
+    finally:
+        instrumentation.end_request(token)
+    return response, elapsed, metrics.db_queries
+
+
+@pytest.fixture
+def bench(request, db, client):
+    """
+    bench(name, url, user=None): time GET `url` as `user` and check the
+    result against the baseline. Returns the recorded figures.
+    """
+    config = request.config
+    rounds = config.getoption('--bench-rounds')
+
+    def run(name, url, user=None):
+        if user is not None:
+            client.force_login(user)
+        # Warm-up request: imports, template compilation, connection setup.
+        # With --nplusone it is also checked for N+1 patterns (untimed)
+        threshold = config.getoption('--nplusone')
+        with nullcontext() if threshold is None else detect_nplusone(threshold, label=f'{name} ({url})'):
+            response, _, _ = _timed_get(client, url)
+        assert response.status_code == 200, f'{url} returned {response.status_code}'
+
+        timings, queries = [], []
+        for _ in range(rounds):
+            for cache in caches.all():
+                cache.clear()
+            response, elapsed, query_count = _timed_get(client, url)
+            assert response.status_code == 200, f'{url} returned {response.status_code}'
+            timings.append(elapsed * 1000)
+            queries.append(query_count)
+
+        result = {
+            'url': url,
+            'rounds': rounds,
+            'median_ms': round(statistics.median(timings), 2),
+            'p95_ms': round(statistics.quantiles(timings, n=20)[18] if len(timings) > 1 else timings[0], 2),
+            'min_ms': round(min(timings), 2),
+            'queries': max(queries),
+        }
+        config.stash[results_key][name] = result
+
+        baseline = (load_baseline(config) or {}).get(name)
+        if baseline and not config.getoption('--bench-save-baseline'):
+            limit = baseline['median_ms'] * config.getoption('--bench-tolerance') + NOISE_FLOOR_MS
+            assert result['median_ms'] <= limit, (
+                f"{name}: median {result['median_ms']}ms exceeds {limit:.1f}ms "
+                f"(baseline {baseline['median_ms']}ms)"
+            )
+            assert result['queries'] <= baseline['queries'], (
+                f"{name}: {result['queries']} queries, baseline {baseline['queries']}"
+            )
+        return result
+
+    return run
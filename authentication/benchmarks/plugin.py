@@ -0,0 +1,104 @@
+"""
+Command-line options and reporting for the benchmark suite.
+
+Registered from the root conftest.py so the options exist before the
+benchmark conftest (which needs Django set up) is collected. Seeding the
+catalog takes minutes, so benchmarks are deselected unless a scale is given
+with --bench-scale or $BENCHMARK_SCALE. Every recorded
+result is kept in the config stash; at the end of the session the results
+are written to --bench-output, and to the baseline with
+--bench-save-baseline, and summarised in the terminal.
+"""
+
+import json
+import os
+from pathlib import Path
+
+import pytest
+
+BENCH_DIR = Path(__file__).resolve().parent
+
+# Medians within this many milliseconds of the baseline are never a regression
+NOISE_FLOOR_MS = 5.0
+
+results_key = pytest.StashKey[dict]()
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup('benchmark')
+    group.addoption('--bench-scale', type=float, default=os.environ.get('BENCHMARK_SCALE'),
+                    help='fraction of the full catalog volumes to seed, 1.0 for full size; '
+                         'benchmarks only run when this or $BENCHMARK_SCALE is set')
+    group.addoption('--bench-seed', type=int, default=42, help='random seed for the catalog')
+    group.addoption('--bench-rounds', type=int, default=5, help='timed requests per view')
+    group.addoption('--bench-baseline', default=str(BENCH_DIR / 'baseline.json'), help='baseline file')
+    group.addoption('--bench-save-baseline', action='store_true', help='write this run as the new baseline')
+    group.addoption('--bench-tolerance', type=float, default=1.25,
+                    help='allowed median slowdown against the baseline (1.25 = 25%%)')
+    group.addoption('--nplusone', type=int, nargs='?', const=0, default=None, metavar='THRESHOLD',
+                    help='fail views that run an N+1 query pattern (default threshold: NPLUSONE_THRESHOLD)')
+    group.addoption('--bench-output', default='bench_results.json', help='where to write this run\'s results')
+
+
+def pytest_configure(config):
+    config.stash[results_key] = {}
+
+
+def pytest_collection_modifyitems(config, items):
+    if config.getoption('--bench-scale') is not None:
+        return
+    deselected = [item for item in items if item.get_closest_marker('benchmark')]
+    if deselected:
+        config.hook.pytest_deselected(items=deselected)
+        items[:] = [item for item in items if not item.get_closest_marker('benchmark')]
+
+
+def run_info(config):
+    from django.db import connection
+    return {
+        'scale': config.getoption('--bench-scale'),
+        'seed': config.getoption('--bench-seed'),
+        'database': connection.vendor,
+    }
+
+
+def load_baseline(config):
+    path = Path(config.getoption('--bench-baseline'))
+    if not path.exists():
+        return None
+    baseline = json.loads(path.read_text())
+    if any(baseline.get(key) != value for key, value in run_info(config).items()):
+        return None
+    return baseline.get('results', {})
+
+
+
+
+def pytest_sessionfinish(session, exitstatus):
+    config = session.config
+    results = dict(config.stash.get(results_key, {}))
+    seed_seconds = results.pop('_seed_seconds', None)
+    if not results:
+        return
+    report = {**run_info(config), 'seed_seconds': seed_seconds, 'results': dict(sorted(results.items()))}
+    Path(config.getoption('--bench-output')).write_text(json.dumps(report, indent=2) + '\n')
+
+    if config.getoption('--bench-save-baseline'):
+        path = Path(config.getoption('--bench-baseline'))
+        previous = load_baseline(config) or {}
+        report['results'] = dict(sorted({**previous, **results}.items()))
+        path.write_text(json.dumps(report, indent=2) + '\n')
+
+
+def pytest_terminal_summary(terminalreporter, config):
+    results = {name: result for name, result in config.stash.get(results_key, {}).items() if not name.startswith('_')}
+    if not results:
+        return
+    baseline = load_baseline(config) or {}
+    terminalreporter.section('benchmarks')
+    terminalreporter.write_line(f"{'view':<28}{'median ms':>12}{'p95 ms':>12}{'queries':>10}{'baseline ms':>14}")
+    for name, result in sorted(results.items()):
+        previous = baseline.get(name, {}).get('median_ms', '-')
+        terminalreporter.write_line(
+            f"{name:<28}{result['median_ms']:>12}{result['p95_ms']:>12}{result['queries']:>10}{previous:>14}"
+        )
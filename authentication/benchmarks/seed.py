@@ -0,0 +1,25 @@
+"""
+The benchmark catalog: authentication.seeding's default volumes (100k
+products, 1M purchases, 500k likes, reviews and bookmarks) times `scale`,
+generated under its own username prefix.
+"""
+
+import os
+
+from authentication import seeding
+
+SEED_USERNAME_PREFIX = 'bench'
+
+
+def seed_catalog(scale=1.0, seed=42, stdout=None):
+    seeding.seed_store(
+        seeding.scaled_volumes(scale),
+        seed=seed,
+        prefix=SEED_USERNAME_PREFIX,
+        workers=os.cpu_count() or 1,
+        stdout=stdout,
+    )
+
+
+def is_seeded():
+    return seeding.is_seeded(SEED_USERNAME_PREFIX)
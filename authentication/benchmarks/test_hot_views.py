@@ -0,0 +1,67 @@
+"""
+Timings of the busiest views against the seeded catalog (see conftest.py).
+"""
+
+import pytest
+
+pytestmark = pytest.mark.benchmark
+
+
+# ============================================
+# CATALOG
+# ============================================
+
+def test_landing_page(bench):
+    bench('landing_page', '/')
+
+
+def test_dashboard(bench, bench_customer):
+    bench('dashboard', '/dashboard/', user=bench_customer)
+
+
+def test_dashboard_filtered(bench, bench_customer):
+    bench('dashboard_filtered', '/dashboard/?category=sneakers&sort=popular&max_price=100000', user=bench_customer)
+
+
+def test_dashboard_api(bench, bench_customer):
+    bench('dashboard_api', '/v1/dashboard/', user=bench_customer)
+
+
+def test_dashboard_api_search(bench, bench_customer):
+    bench('dashboard_api_search', '/v1/dashboard/?q=runner&sort=price_low&page=3', user=bench_customer)
+
+
+def test_post_list(bench, bench_admin):
+    bench('post_list', '/api/rest/posts/', user=bench_admin)
+
+
+# ============================================
+# PURCHASE HISTORY EXPORTS
+# ============================================
+
+def test_purchase_history(bench, bench_customer):
+    bench('purchase_history', '/purchases/', user=bench_customer)
+
+
+def test_purchase_history_csv(bench, bench_customer):
+    bench('purchase_history_csv', '/purchases/?export=csv', user=bench_customer)
+
+
+def test_purchase_history_pdf(bench, bench_customer):
+    bench('purchase_history_pdf', '/purchases/?export=pdf', user=bench_customer)
+
+
+# ============================================
+# ADMIN STATISTICS
+# ============================================
+
+def test_admin_dashboard(bench, bench_admin):
+    bench('admin_dashboard', '/admin-dashboard/', user=bench_admin)
+
+
+def test_dashboard_stats(bench, bench_admin):
+    bench('dashboard_stats', '/api/rest/dashboard/stats/', user=bench_admin)
+
+
+def test_admin_statistics(bench, bench_admin):
+    bench('admin_statistics', '/api/rest/admin/statistics/', user=bench_admin)
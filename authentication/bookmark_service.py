@@ -0,0 +1,99 @@
+"""
+Single-statement bookmark writes.
+
+Setting a bookmark is one INSERT that ignores an existing (user, post) row,
+and clearing it is a filtered DELETE; neither loads the product first. A
+missing product shows up as a foreign key failure on insert and is reported
+as Post.DoesNotExist. Toggling tries the DELETE first and inserts only when
+nothing was deleted.
+
+bulk_create skips the Bookmark post_save signal, so inserts invalidate the
+cache here. Deletes go through QuerySet.delete(), whose post_delete
+receivers (see signals.py) invalidate the cache and tombstone exactly the
+rows that were removed.
+"""
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+
+from .cache_utils import invalidate_tags_on_commit, model_tag, post_tag, user_tag
+from .models import Bookmark, Post
+
+
+def _changed(user_id, post_ids):
+    invalidate_tags_on_commit(
+        model_tag(Bookmark),
+        *(post_tag(post_id) for post_id in post_ids),
+        user_tag(user_id),
+    )
+
+
+def _delete(user_id, post_ids):
+    """DELETE the user's bookmarks on `post_ids`; returns the number removed"""
+    with transaction.atomic():
+        removed, _ = Bookmark.objects.filter(user_id=user_id, post_id__in=post_ids).delete()
+    return removed
+
+
+def _insert(user_id, post_ids):
+    """INSERT bookmarks, skipping ones that exist; raises Post.DoesNotExist for unknown products"""
+    try:
+        with transaction.atomic():
+            Bookmark.objects.bulk_create(
+                [Bookmark(user_id=user_id, post_id=post_id) for post_id in post_ids],
+                ignore_conflicts=True,
+            )
+    except IntegrityError:
+        # ignore_conflicts covers the unique (user, post) pair, not the post foreign key
+        raise Post.DoesNotExist(f'No product among {list(post_ids)}')
+    _changed(user_id, post_ids)
+
+
+def set_bookmark(user_id, post_id, bookmarked):
+    """Idempotently add or remove one bookmark. Returns the new state."""
+    if bookmarked:
+        _insert(user_id, [post_id])
+    else:
+        _delete(user_id, [post_id])
+    return bookmarked
+
+
+def toggle_bookmark(user_id, post_id):
+    """Flip one bookmark. Returns True if the product is now bookmarked."""
+    if _delete(user_id, [post_id]):
+        return False
+    _insert(user_id, [post_id])
+    return True
+
+
+def sync_bookmarks(user_id, add=(), remove=()):
+    """
+    Apply a client's bookmark diff in one transaction: one INSERT for `add`,
+    one DELETE for `remove` (an id in both is added). Unknown product ids in
+    `add` are skipped and reported. Returns {'added', 'removed', 'not_found',
+    'bookmarks'}, the last being the user's full bookmark set afterwards.
+    """
+    add = set(add)
+    remove = set(remove) - add
+    with transaction.atomic():
+        existing = set(
+            Bookmark.objects.filter(user_id=user_id, post_id__in=add | remove).values_list('post_id', flat=True)
+        )
+        new = add - existing
+        live = set(Post.objects.filter(pk__in=new).values_list('pk', flat=True)) if new else set()
+        if live:
+            _insert(user_id, live)
+        gone = remove & existing
+        if gone:
+            _delete(user_id, gone)
+        bookmarks = sorted(Bookmark.objects.filter(user_id=user_id).values_list('post_id', flat=True))
+    return {
+        'added': sorted(live),
+        'removed': sorted(gone),
+        'not_found': sorted(new - live),
+        'bookmarks': bookmarks,
+    }
+
+
+def max_sync_items():
+    return getattr(settings, 'BOOKMARK_SYNC_MAX_ITEMS', 500)
@@ -0,0 +1,231 @@
+"""
+Two-tier application cache.
+
+L1 is a small per-process LRU (the CACHE_L1_ALIAS cache, a LocMemCache) and
+L2 is the shared backend (CACHE_L2_ALIAS, Redis in production). Reads try L1,
+then L2, and fill L1 on the way back; writes go to both.
+
+Entries can be tagged. Each tag has a version counter stored in L2, and the
+current versions of an entry's tags are folded into its key, so bumping a tag
+(invalidate_tags) orphans every entry carrying it without scanning the cache.
+Tag versions are themselves held in L1 for CACHE_L1_TIMEOUT seconds, which
+bounds how long another process can keep serving an invalidated L1 entry.
+
+Signal handlers in signals.py bump the model tags below for Post, Purchase,
+ProductReview and Bookmark, so cached results built from those tables are
+invalidated when rows change. Queryset .update()/.delete() calls bypass
+signals and must call invalidate_tags_on_commit themselves.
+
+Tag versions are only meaningful when every worker reads them from the same
+L2. When CACHE_TAGS_ENABLED is off (LocMem L2 with several workers), tagged
+entries are never stored and always computed, and catalog ETags are skipped.
+"""
+
+import functools
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+from .instrumentation import record_cache
+
+# Bump to orphan every entry written by older code (e.g. a changed value shape)
+CACHE_KEY_VERSION = 1
+
+_MISSING = object()
+
+
+def model_tag(model):
+    """Tag covering every row of a model, e.g. 'model:authentication.post'"""
+    return f"model:{model._meta.label_lower}"
+
+
+def post_tag(post_id):
+    """Tag for data about one product (its reviews, likes, bookmarks, sales)"""
+    return f"post:{post_id}"
+
+
+def user_tag(user_id):
+    """Tag for one user's interactions (bookmarks, likes, purchases)"""
+    return f"user:{user_id}"
+
+
+def _l1():
+    return caches[getattr(settings, 'CACHE_L1_ALIAS', 'local')]
+
+
+def _l2():
+    return caches[getattr(settings, 'CACHE_L2_ALIAS', 'default')]
+
+
+def _l1_timeout():
+    return getattr(settings, 'CACHE_L1_TIMEOUT', 5)
+
+
+def tags_enabled():
+    return getattr(settings, 'CACHE_TAGS_ENABLED', True)
+
+
+def _tag_key(tag):
+    return f"cache_tag:{tag}"
+
+
+def get_tag_versions(tags):
+    """Return {tag: version}, creating missing tag counters in L2"""
+    if not tags:
+        return {}
+    keys = {_tag_key(tag): tag for tag in tags}
+    found = _l1().get_many(keys)
+
+    missing = [key for key in keys if key not in found]
+    if missing:
+        from_l2 = _l2().get_many(missing)
+        for key in missing:
+            if key not in from_l2:
+                # Seed new counters from the clock so a counter lost to eviction
+                # never restarts at a version an old entry was stored under
+                _l2().add(key, time.time_ns(), timeout=None)
+                from_l2[key] = _l2().get(key)
+        _l1().set_many(from_l2, timeout=_l1_timeout())
+        found.update(from_l2)
+
+    return {keys[key]: version for key, version in found.items()}
+
+
+def invalidate_tags(*tags):
+    """Orphan every cache entry stored under any of the given tags"""
+    l2 = _l2()
+    for tag in tags:
+        key = _tag_key(tag)
+        try:
+            l2.incr(key)
+        except ValueError:
+            # Counter not created yet (or evicted): nothing is cached under it
+            l2.add(key, time.time_ns(), timeout=None)
+    _l1().delete_many([_tag_key(tag) for tag in tags])
+
+
+def invalidate_tags_on_commit(*tags):
+    """
+    Invalidate once the current transaction commits (immediately outside one),
+    so a concurrent reader cannot re-cache rows that are about to change.
+    """
+    transaction.on_commit(lambda: invalidate_tags(*tags))
+
+
+def incr_counter(cache, key, delta):
+    """Atomically add `delta` to a counter that never expires, creating it at 0"""
+    cache.add(key, 0, timeout=None)
+    try:
+        return cache.incr(key, delta)
+    except ValueError:
+        # Evicted between add and incr
+        cache.set(key, delta, timeout=None)
+        return delta
+
+
+def make_key(name, tags=()):
+    """Build the versioned cache key for `name` under the current tag versions"""
+    key = f"app:v{CACHE_KEY_VERSION}:{name}"
+    if tags:
+        versions = get_tag_versions(tags)
+        fingerprint = ','.join(f"{tag}={versions[tag]}" for tag in sorted(versions))
+        key = f"{key}:{hashlib.md5(fingerprint.encode('utf-8')).hexdigest()}"
+    return key
+
+
+def cache_get(name, default=None, tags=()):
+    if tags and not tags_enabled():
+        record_cache(hit=False)
+        return default
+    key = make_key(name, tags)
+    value = _l1().get(key, _MISSING)
+    if value is _MISSING:
+        value = _l2().get(key, _MISSING)
+        if value is _MISSING:
+            record_cache(hit=False)
+            return default
+        _l1().set(key, value, timeout=_l1_timeout())
+    record_cache(hit=True)
+    return value
+
+
+def cache_set(name, value, timeout=None, tags=()):
+    if tags and not tags_enabled():
+        return
+    key = make_key(name, tags)
+    if timeout is None:
+        timeout = getattr(settings, 'CACHE_DEFAULT_TIMEOUT', 300)
+    _l2().set(key, value, timeout=timeout)
+    _l1().set(key, value, timeout=min(timeout, _l1_timeout()))
+
+
+def get_or_set(name, compute, timeout=None, tags=()):
+    """Return the cached value for `name`, computing and storing it on a miss"""
+    value = cache_get(name, _MISSING, tags)
+    if value is _MISSING:
+        value = compute()
+        cache_set(name, value, timeout, tags)
+    return value
+
+
+def _call_key(func, args, kwargs):
+    signature = repr((args, sorted(kwargs.items())))
+    digest = hashlib.md5(signature.encode('utf-8')).hexdigest()
+    return f"func:{func.__module__}.{func.__qualname__}:{digest}"
+
+
+def cached_function(timeout=None, tags=()):
+    """
+    Cache a function's return value per argument list.
+
+    `tags` may be a sequence of tags or a callable taking the function's
+    arguments and returning one, for per-object invalidation:
+
+        @cached_function(timeout=600, tags=lambda post_id: [post_tag(post_id)])
+        def rating_summary(post_id): ...
+
+    Arguments must have a stable repr() (ids, strings, numbers), not model
+    instances. The undecorated function is available as `.uncached`.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            entry_tags = tags(*args, **kwargs) if callable(tags) else tags
+            return get_or_set(
+                _call_key(func, args, kwargs),
+                lambda: func(*args, **kwargs),
+                timeout,
+                entry_tags,
+            )
+        wrapper.uncached = func
+        return wrapper
+    return decorator
+
+
+def cached_queryset(timeout=None, tags=()):
+    """
+    Like cached_function, for functions that return a queryset.
+
+    The queryset is evaluated and its rows cached as a list, so callers get a
+    list of model instances rather than a lazy queryset. The queryset's model
+    tag is always added, so any save or delete of that model invalidates it.
+    Prefetch related rows (select_related/prefetch_related) inside the
+    function, since lazy relations on cached instances would query again.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            queryset = func(*args, **kwargs)
+            entry_tags = tags(*args, **kwargs) if callable(tags) else tags
+            return get_or_set(
+                _call_key(func, args, kwargs),
+                lambda: list(queryset),
+                timeout,
+                [model_tag(queryset.model), *entry_tags],
+            )
+        wrapper.uncached = func
+        return wrapper
+    return decorator
@@ -0,0 +1,99 @@
+import functools
+import hashlib
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+
+from .cache_utils import get_tag_versions, model_tag, tags_enabled, user_tag
+from .models import Post, ProductImage, ProductReview
+
+
+def get_client_ip(request):
+    """
+    Return the client IP address for a request.
+
+    Each of the TRUSTED_PROXY_COUNT proxies in front of the app appends the
+    address it received the request from to X-Forwarded-For, so the client
+    is the entry that many places from the right. Entries further left were
+    sent by the client and can be anything. With no trusted proxies (or a
+    header shorter than expected) it is REMOTE_ADDR.
+    """
+    proxies = getattr(settings, 'TRUSTED_PROXY_COUNT', 0)
+    forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
+    if proxies and forwarded_for:
+        hops = [hop.strip() for hop in forwarded_for.split(',')]
+        if len(hops) >= proxies:
+            return hops[-proxies]
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def catalog_etag(request, user=None):
+    """
+    ETag for catalog responses, computed without touching the database.
+
+    Built from the cache tag versions of every table the catalog payloads
+    read (products and their likes, reviews and images) plus, for
+    per-user responses, the user's interaction tag (bookmarks, likes,
+    purchases, reviews), together with the full request path so each
+    filter/page combination gets its own validator. Any write to those
+    tables bumps a tag (see signals.py), which changes the ETag.
+
+    Versions live in the shared cache, so validators are only consistent
+    across workers when CACHES['default'] is shared (REDIS_URL). Returns None
+    (no conditional handling) when tags are disabled for that reason.
+    """
+    if not tags_enabled():
+        return None
+    tags = [model_tag(Post), model_tag(ProductReview), model_tag(ProductImage)]
+    if user is not None:
+        tags.append(user_tag(user.pk))
+    versions = get_tag_versions(tags)
+
+    parts = [request.get_full_path()]
+    parts += [f"{tag}={versions[tag]}" for tag in tags]
+    if user is not None:
+        parts.append(f"user={user.pk}")
+    return hashlib.md5('|'.join(parts).encode('utf-8')).hexdigest()
+
+
+def etag_conditional(etag_func):
+    """
+    Like django.views.decorators.http.condition(etag_func=...), but the ETag
+    is only attached to 200 responses, so error payloads are never revalidated
+    into a 304. `etag_func(request, *args, **kwargs)` may return None to skip
+    conditional handling for a request. Async views take an async etag_func.
+    """
+    def conditional_response(request, etag):
+        if etag is None:
+            return None, None
+        etag = quote_etag(etag)
+        return etag, get_conditional_response(request, etag=etag)
+
+    def tag_response(response, etag):
+        if etag is not None and response.status_code == 200:
+            response['ETag'] = etag
+        return response
+
+    def decorator(view_func):
+        if iscoroutinefunction(view_func):
+            async def wrapper(request, *args, **kwargs):
+                etag = None
+                if request.method in ('GET', 'HEAD'):
+                    etag = await etag_func(request, *args, **kwargs)
+                etag, not_modified = conditional_response(request, etag)
+                if not_modified is not None:
+                    return not_modified
+                return tag_response(await view_func(request, *args, **kwargs), etag)
+        else:
+            def wrapper(request, *args, **kwargs):
+                etag = None
+                if request.method in ('GET', 'HEAD'):
+                    etag = etag_func(request, *args, **kwargs)
+                etag, not_modified = conditional_response(request, etag)
+                if not_modified is not None:
+                    return not_modified
+                return tag_response(view_func(request, *args, **kwargs), etag)
+        return functools.wraps(view_func)(wrapper)
+    return decorator
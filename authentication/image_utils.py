@@ -0,0 +1,56 @@
+import io
+import base64
+from PIL import Image
+
+# Longest side of the inline preview; small enough to keep the data URI well under 1KB
+PLACEHOLDER_SIZE = 16
+
+def compute_image_placeholder(image_file):
+    """
+    Build a low-quality image placeholder and dominant colour for an image.
+
+    Returns a tuple of (data URI of a tiny PNG preview, '#rrggbb' colour).
+    Both values are empty strings if the image cannot be decoded, so callers
+    can store the result unconditionally.
+    """
+    try:
+        position = image_file.tell() if hasattr(image_file, 'tell') else None
+        if hasattr(image_file, 'seek'):
+            image_file.seek(0)
+
+        with Image.open(image_file) as img:
+            img.draft('RGB', (PLACEHOLDER_SIZE * 4, PLACEHOLDER_SIZE * 4))
+            preview = img.convert('RGB')
+            preview.thumbnail((PLACEHOLDER_SIZE, PLACEHOLDER_SIZE), Image.Resampling.BILINEAR)
+
+        # Dominant colour: most common entry of a small adaptive palette
+        quantized = preview.quantize(colors=5)
+        palette = quantized.getpalette()
+        count, index = max(quantized.getcolors())
+        red, green, blue = palette[index * 3:index * 3 + 3]
+        dominant_color = f'#{red:02x}{green:02x}{blue:02x}'
+
+        with io.BytesIO() as buffer:
+            preview.save(buffer, format='PNG', optimize=True)
+            encoded = base64.b64encode(buffer.getvalue()).decode('ascii')
+        placeholder = f'data:image/png;base64,{encoded}'
+
+        if position is not None:
+            image_file.seek(position)
+
+        return placeholder, dominant_color
+    except Exception as e:
+        print(f"Warning: Could not compute image placeholder: {str(e)}")
+        return '', ''
+
+def update_image_placeholder(instance, field_name='image'):
+    """
+    Fill `image_placeholder` and `dominant_color` on a model instance.
+
+    Only runs for freshly uploaded files (not yet committed to storage), so
+    saving an existing row never re-reads its image.
+    """
+    field_file = getattr(instance, field_name)
+    if not field_file or field_file._committed:
+        return
+    instance.image_placeholder, instance.dominant_color = compute_image_placeholder(field_file.file)
@@ -0,0 +1,217 @@
+"""
+Per-request performance counters.
+
+ServerTimingMiddleware (middleware.py) starts a RequestMetrics for each
+sampled request and stores it in a context variable; the hooks below add to
+it from wherever the work happens:
+
+    - database queries, through an execute wrapper installed on every
+      connection (including those of the worker-pool threads)
+    - application cache lookups, from cache_utils
+    - template rendering (TimedTemplates backend) and JSON encoding (json_utils)
+
+When no request is being measured every hook is a single context variable
+lookup, and with SERVER_TIMING_ENABLED off the database wrapper is never
+installed at all.
+
+Other tools can watch the same queries with listen_queries(), e.g. the N+1
+detector (nplusone.py).
+
+Work handed to a thread pool only counts towards the request if it is
+submitted through bind_context(), since executor threads do not inherit
+context variables; run_with_connection_cleanup() gives such work the
+connection handling of a request.
+"""
+
+import contextvars
+import functools
+import threading
+import time
+from contextlib import contextmanager
+
+from django.db import close_old_connections, connections
+from django.db.backends.signals import connection_created
+from django.template.backends.django import DjangoTemplates
+
+_current = contextvars.ContextVar('request_metrics', default=None)
+_listeners = contextvars.ContextVar('query_listeners', default=())
+
+
+class RequestMetrics:
+    """Counters for one request; safe to update from several threads"""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.db_queries = 0
+        self.db_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.render_time = 0.0
+        self._lock = threading.Lock()
+
+    def record_query(self, sql, duration):
+        with self._lock:
+            self.db_queries += 1
+            self.db_time += duration
+
+    def record_cache(self, hit):
+        with self._lock:
+            if hit:
+                self.cache_hits += 1
+            else:
+                self.cache_misses += 1
+
+    def record_render(self, duration):
+        with self._lock:
+            self.render_time += duration
+
+    def elapsed(self):
+        return time.perf_counter() - self.start
+
+
+def current_metrics():
+    """The RequestMetrics of the request being measured, or None"""
+    return _current.get()
+
+
+def start_request():
+    """
+    Start measuring the current request. Middleware that is nested inside
+    another measuring middleware shares its RequestMetrics (and gets no token).
+    """
+    _wrap_thread_connections()
+    metrics = _current.get()
+    if metrics is not None:
+        return metrics, None
+    metrics = RequestMetrics()
+    return metrics, _current.set(metrics)
+
+
+def end_request(token):
+    if token is not None:
+        _current.reset(token)
+
+
+def bind_context(func):
+    """
+    Wrap `func` to run in a copy of the caller's context, for submitting work
+    to a thread pool so its queries are counted for the calling request.
+    """
+    context = contextvars.copy_context()
+
+    @functools.wraps(func)
+    def run(*args, **kwargs):
+        _wrap_thread_connections()
+        return context.run(func, *args, **kwargs)
+    return run
+
+
+def run_with_connection_cleanup(func, *args, **kwargs):
+    """
+    Call `func` with stale database connections closed before and after, as
+    the request cycle does. Executor threads outlive requests, so work
+    submitted to a pool through bind_context() should run inside this.
+    """
+    close_old_connections()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        close_old_connections()
+
+
+# ============================================
+# HOOKS
+# ============================================
+
+def record_cache(hit):
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.record_cache(hit)
+
+
+@contextmanager
+def render_timer():
+    metrics = _current.get()
+    if metrics is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.record_render(time.perf_counter() - start)
+
+
+@contextmanager
+def listen_queries(callback):
+    """Call callback(sql, duration) for every query run in this context"""
+    install_query_hook()
+    token = _listeners.set(_listeners.get() + (callback,))
+    try:
+        yield
+    finally:
+        _listeners.reset(token)
+
+
+def _execute_wrapper(execute, sql, params, many, context):
+    metrics = _current.get()
+    listeners = _listeners.get()
+    if metrics is None and not listeners:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration = time.perf_counter() - start
+        if metrics is not None:
+            metrics.record_query(sql, duration)
+        for listener in listeners:
+            listener(sql, duration)
+
+
+def _install_wrapper(connection, **kwargs):
+    if _execute_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_execute_wrapper)
+
+
+_installed = False
+
+
+def _wrap_thread_connections():
+    # Connections are per thread; ones opened before install_query_hook ran
+    # (e.g. in a pool thread) are wrapped the first time they are used here
+    if _installed:
+        for connection in connections.all(initialized_only=True):
+            _install_wrapper(connection)
+
+
+def install_query_hook():
+    """Count queries on every connection, current and future (idempotent)"""
+    global _installed
+    if _installed:
+        return
+    _installed = True
+    connection_created.connect(_install_wrapper, dispatch_uid='request_metrics_query_hook')
+    _wrap_thread_connections()
+
+
+class _TimedTemplate:
+    def __init__(self, template):
+        self.template = template
+
+    def __getattr__(self, name):
+        return getattr(self.template, name)
+
+    def render(self, context=None, request=None):
+        with render_timer():
+            return self.template.render(context, request)
+
+
+class TimedTemplates(DjangoTemplates):
+    """DjangoTemplates backend that adds template render time to the request metrics"""
+
+    def from_string(self, template_code):
+        return _TimedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return _TimedTemplate(super().get_template(template_name))
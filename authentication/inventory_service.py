@@ -0,0 +1,30 @@
+"""
+Stock reservation for orders.
+
+An order takes its items out of stock with one conditional UPDATE
+(inventory >= quantity), so two buyers racing for the last item cannot both
+get it: the second UPDATE matches no row and the order is refused. The same
+statement counts the sale in Post.total_purchases. It bypasses Post.save(),
+so the product's cache tags and sync timestamp are updated here.
+"""
+
+from django.db.models import F
+from django.utils import timezone
+
+from . import metrics
+from .cache_utils import invalidate_tags_on_commit, model_tag, post_tag
+from .models import Post
+
+
+def reserve_inventory(post_id, quantity):
+    """Take `quantity` items of the product out of stock. Returns False if not enough are left."""
+    reserved = Post.objects.filter(pk=post_id, inventory__gte=quantity).update(
+        inventory=F('inventory') - quantity,
+        total_purchases=F('total_purchases') + 1,
+        updated_at=timezone.now(),
+    )
+    if not reserved:
+        metrics.INVENTORY_CONFLICTS.inc()
+        return False
+    invalidate_tags_on_commit(model_tag(Post), post_tag(post_id))
+    return True
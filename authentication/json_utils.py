@@ -0,0 +1,71 @@
+"""
+Fast JSON encoding for the v1 JsonResponse views and the DRF renderer.
+
+JSON_BACKEND selects the encoder: 'orjson' (default, used when the package is
+installed) or 'stdlib'. orjson serializes UUIDs natively and hands everything
+else (datetimes, Decimal, lazy translation strings, ...) to the same fallback
+the stdlib path uses, so both backends produce the same payloads: datetimes
+in particular keep the encoder's format (DjangoJSONEncoder rounds to
+milliseconds, orjson would not). Output is compact UTF-8 either way.
+"""
+
+import json
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse
+
+from .instrumentation import render_timer
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+_ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME if orjson else 0
+
+
+def use_orjson():
+    return orjson is not None and getattr(settings, 'JSON_BACKEND', 'orjson') == 'orjson'
+
+
+def dumps(data, encoder=DjangoJSONEncoder):
+    """
+    Serialize `data` to UTF-8 JSON bytes.
+    Objects the backend cannot encode natively go through `encoder().default`
+    (DjangoJSONEncoder for views, DRF's encoder for the API renderer).
+    """
+    with render_timer():
+        if use_orjson():
+            return orjson.dumps(data, default=encoder().default, option=_ORJSON_OPTIONS)
+        return json.dumps(
+            data, cls=encoder, ensure_ascii=False, separators=(',', ':')
+        ).encode('utf-8')
+
+
+def loads(data):
+    """Parse JSON bytes or str with the configured backend"""
+    if use_orjson():
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+class JsonResponse(HttpResponse):
+    """
+    Drop-in replacement for django.http.JsonResponse that encodes with dumps().
+    Accepts the same arguments; `json_dumps_params` forces the stdlib encoder
+    since orjson does not take json.dumps options.
+    """
+
+    def __init__(self, data, encoder=DjangoJSONEncoder, safe=True, json_dumps_params=None, **kwargs):
+        if safe and not isinstance(data, dict):
+            raise TypeError(
+                'In order to allow non-dict objects to be serialized set the '
+                'safe parameter to False.'
+            )
+        kwargs.setdefault('content_type', 'application/json')
+        if json_dumps_params:
+            content = json.dumps(data, cls=encoder, **json_dumps_params)
+        else:
+            content = dumps(data, encoder)
+        super().__init__(content=content, **kwargs)
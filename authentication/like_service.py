@@ -0,0 +1,298 @@
+"""
+Like toggling at constant cost.
+
+A like is one PostLike row, found through the unique (post, user) index, and
+the product's like total is the denormalised Post.like_count, moved with an
+atomic F() update in the same transaction. Neither step reads the product's
+list of likers, so toggling costs the same on a product with a million likes
+as on a new one.
+
+With LIKE_WRITE_BEHIND on, toggles are buffered in the shared cache instead
+(LIKE_BUFFER_CACHE_ALIAS, Redis in production, so every worker sees the same
+buffer) and written to the database in bulk every LIKE_FLUSH_INTERVAL seconds
+by a background thread, or by `manage.py flush_likes`. Rapid toggles of the
+same like coalesce into at most one insert or delete. Buffer layout:
+    like:state:<post>:<user>  the like's latest state (1/0)
+    like:delta:<post>         buffered change to the post's like total
+    like:pending:<n>          (post, user) of the n-th buffered toggle
+    like:seq / like:flushed   last toggle number handed out / flushed
+Until a flush lands, responses use the buffered state, while listings read
+from the database, so they can lag by up to one flush interval.
+"""
+
+import atexit
+import functools
+import logging
+import operator
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import IntegrityError, close_old_connections, transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from .cache_utils import incr_counter, invalidate_tags_on_commit, model_tag, post_tag, user_tag
+from .models import Post, PostLike, User
+
+logger = logging.getLogger(__name__)
+
+STATE_TIMEOUT = 86400  # buffered states outlive any realistic flush delay
+SEQ_KEY = 'like:seq'
+FLUSHED_KEY = 'like:flushed'
+GAP_KEY = 'like:gap'
+LOCK_KEY = 'like:flush_lock'
+
+
+def _cache():
+    return caches[getattr(settings, 'LIKE_BUFFER_CACHE_ALIAS', 'default')]
+
+
+def write_behind_enabled():
+    return getattr(settings, 'LIKE_WRITE_BEHIND', False)
+
+
+def _state_key(post_id, user_id):
+    return f"like:state:{post_id}:{user_id}"
+
+
+def _delta_key(post_id):
+    return f"like:delta:{post_id}"
+
+
+def _pending_key(seq):
+    return f"like:pending:{seq}"
+
+
+def _invalidate(post_ids, user_ids):
+    invalidate_tags_on_commit(
+        model_tag(Post),
+        *(post_tag(post_id) for post_id in post_ids),
+        *(user_tag(user_id) for user_id in user_ids),
+    )
+
+
+def _pairs_filter(pairs):
+    return functools.reduce(operator.or_, (Q(post_id=post_id, user_id=user_id) for post_id, user_id in pairs))
+
+
+def recount_likes(post_ids=None):
+    """Recompute Post.like_count from the PostLike table in one UPDATE (all posts when None)"""
+    posts = Post.objects.all()
+    if post_ids is not None:
+        post_ids = list(post_ids)
+        if not post_ids:
+            return
+        posts = posts.filter(pk__in=post_ids)
+    counts = PostLike.objects.filter(post=OuterRef('pk')).order_by().values('post').annotate(c=Count('id')).values('c')
+    posts.update(like_count=Coalesce(Subquery(counts), Value(0)))
+
+
+# ============================================
+# READS
+# ============================================
+
+def is_liked(post_id, user_id):
+    """Whether the user likes the post, including buffered toggles"""
+    if write_behind_enabled():
+        state = _cache().get(_state_key(post_id, user_id))
+        if state is not None:
+            return bool(state)
+    return PostLike.objects.filter(post_id=post_id, user_id=user_id).exists()
+
+
+def like_count(post_id):
+    """The post's like total, including buffered toggles"""
+    count = Post.objects.filter(pk=post_id).values_list('like_count', flat=True).first() or 0
+    if write_behind_enabled():
+        count += _cache().get(_delta_key(post_id), 0)
+    return max(count, 0)
+
+
+# ============================================
+# WRITES
+# ============================================
+
+def _write_like(post_id, user_id, liked):
+    """Insert or delete the like row and move the counter; returns the change (-1, 0, 1)"""
+    with transaction.atomic(savepoint=False):
+        if liked:
+            try:
+                with transaction.atomic():
+                    PostLike.objects.create(post_id=post_id, user_id=user_id)
+                change = 1
+            except IntegrityError:
+                change = 0  # already liked (e.g. a concurrent request won)
+        else:
+            deleted, _ = PostLike.objects.filter(post_id=post_id, user_id=user_id).delete()
+            change = -deleted
+        if change:
+            Post.objects.filter(pk=post_id).update(like_count=F('like_count') + change)
+            _invalidate([post_id], [user_id])
+    return change
+
+
+def _buffer_like(post_id, user_id, liked):
+    """Record the new state in the buffer; returns the change to the effective state"""
+    if is_liked(post_id, user_id) == liked:
+        return 0
+    cache = _cache()
+    change = 1 if liked else -1
+    cache.set(_state_key(post_id, user_id), int(liked), timeout=STATE_TIMEOUT)
+    incr_counter(cache, _delta_key(post_id), change)
+    seq = incr_counter(cache, SEQ_KEY, 1)
+    cache.set(_pending_key(seq), (post_id, user_id), timeout=STATE_TIMEOUT)
+    like_flusher.ensure_started()
+    return change
+
+
+def set_like(post_id, user_id, liked):
+    """Like or unlike a post. Returns (liked, total_likes)."""
+    if write_behind_enabled():
+        _buffer_like(post_id, user_id, liked)
+    else:
+        _write_like(post_id, user_id, liked)
+    return liked, like_count(post_id)
+
+
+def toggle_like(post_id, user_id):
+    """Flip the user's like on a post. Returns (liked, total_likes)."""
+    if write_behind_enabled():
+        return set_like(post_id, user_id, not is_liked(post_id, user_id))
+
+    with transaction.atomic(savepoint=False):
+        # Try the unlike first: one indexed DELETE answers "was it liked?"
+        liked = _write_like(post_id, user_id, False) == 0
+        if liked:
+            _write_like(post_id, user_id, True)
+    return liked, like_count(post_id)
+
+
+# ============================================
+# WRITE-BEHIND FLUSH
+# ============================================
+
+def _pending_range(cache, start, end):
+    """
+    Buffered toggles start+1..end that can be flushed. A toggle takes its
+    number before storing its entry, so a missing entry is normally a write
+    in progress and the flush stops short of it; one that is still missing
+    on the next flush belonged to a crashed request and is skipped.
+    """
+    entries = cache.get_many([_pending_key(seq) for seq in range(start + 1, end + 1)])
+    pairs = []
+    for seq in range(start + 1, end + 1):
+        entry = entries.get(_pending_key(seq))
+        if entry is None:
+            if cache.get(GAP_KEY) == seq:
+                logger.warning(f"Skipping lost like toggle #{seq}")
+                continue
+            cache.set(GAP_KEY, seq, timeout=STATE_TIMEOUT)
+            return pairs, seq - 1
+        pairs.append(tuple(entry))
+    return pairs, end
+
+
+def flush_pending_likes():
+    """
+    Write up to LIKE_FLUSH_BATCH_SIZE buffered like toggles to the database in
+    bulk. Returns the number of toggles consumed (several toggles of one like
+    make at most one write); 0 if there were none or another flush is running.
+    """
+    cache = _cache()
+    if not cache.add(LOCK_KEY, 1, timeout=60):
+        return 0
+    try:
+        start = cache.get(FLUSHED_KEY, 0)
+        end = min(cache.get(SEQ_KEY, 0), start + getattr(settings, 'LIKE_FLUSH_BATCH_SIZE', 500))
+        if end <= start:
+            return 0
+        pairs, end = _pending_range(cache, start, end)
+        pairs = set(pairs)
+
+        if pairs:
+            states = cache.get_many([_state_key(*pair) for pair in pairs])
+            existing = set(PostLike.objects.filter(_pairs_filter(pairs)).values_list('post_id', 'user_id'))
+            live_posts = set(Post.objects.filter(pk__in={post_id for post_id, _ in pairs}).values_list('pk', flat=True))
+            live_users = set(User.objects.filter(pk__in={user_id for _, user_id in pairs}).values_list('pk', flat=True))
+
+            to_add, to_remove = [], []
+            for pair in pairs:
+                state = states.get(_state_key(*pair))
+                if state == 1 and pair not in existing and pair[0] in live_posts and pair[1] in live_users:
+                    to_add.append(pair)
+                elif state == 0 and pair in existing:
+                    to_remove.append(pair)
+
+            net = {}
+            for post_id, _ in to_add:
+                net[post_id] = net.get(post_id, 0) + 1
+            for post_id, _ in to_remove:
+                net[post_id] = net.get(post_id, 0) - 1
+
+            if to_add or to_remove:
+                with transaction.atomic():
+                    PostLike.objects.bulk_create(
+                        [PostLike(post_id=post_id, user_id=user_id) for post_id, user_id in to_add],
+                        ignore_conflicts=True,
+                    )
+                    if to_remove:
+                        PostLike.objects.filter(_pairs_filter(to_remove)).delete()
+                    recount_likes(net)
+                    _invalidate(net, {user_id for _, user_id in to_add + to_remove})
+
+            # What is now in the database no longer counts as buffered
+            for post_id, applied in net.items():
+                if applied:
+                    incr_counter(cache, _delta_key(post_id), -applied)
+
+        cache.delete_many([_pending_key(seq) for seq in range(start + 1, end + 1)])
+        cache.set(FLUSHED_KEY, end, timeout=None)
+        return end - start
+    finally:
+        cache.delete(LOCK_KEY)
+
+
+class LikeFlusher:
+    """
+    Background thread that calls flush_pending_likes every `interval` seconds.
+    Like MailWorker, it starts on first use so it is created after gunicorn forks.
+    """
+
+    def __init__(self, interval=2.0):
+        self.interval = interval
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def ensure_started(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='like-flusher', daemon=True)
+                self._thread.start()
+
+    def flush(self):
+        try:
+            return flush_pending_likes()
+        except Exception as e:
+            logger.error(f"Like flush failed: {str(e)}")
+            return 0
+        finally:
+            close_old_connections()
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            self.flush()
+
+
+like_flusher = LikeFlusher(interval=getattr(settings, 'LIKE_FLUSH_INTERVAL', 2.0))
+
+
+def _flush_at_exit():
+    if write_behind_enabled():
+        like_flusher.flush()
+
+
+# Write out what this worker buffered when it exits
+atexit.register(_flush_at_exit)
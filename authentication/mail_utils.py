@@ -0,0 +1,187 @@
+import atexit
+import logging
+import queue
+import smtplib
+import threading
+import time
+from functools import lru_cache
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.template.loader import get_template
+
+logger = logging.getLogger(__name__)
+
+@lru_cache(maxsize=None)
+def get_email_template(template_name):
+    """Load and compile an email template once per process"""
+    return get_template(template_name)
+
+def build_email(subject, to, template_base, context):
+    """
+    Build a multipart email from a pair of pre-compiled templates:
+    `<template_base>.txt` for the plain text body and `<template_base>.html`
+    for the HTML alternative.
+    """
+    text_content = get_email_template(f'{template_base}.txt').render(context)
+    html_content = get_email_template(f'{template_base}.html').render(context)
+
+    email = EmailMultiAlternatives(
+        subject=subject,
+        body=text_content,
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        to=to
+    )
+    email.attach_alternative(html_content, "text/html")
+    return email
+
+
+class MailWorker:
+    """
+    Background sender that delivers queued messages in batches over one
+    persistent connection to the configured email backend.
+
+    The worker thread starts on first use (so it is created after gunicorn
+    forks), keeps the SMTP connection open while mail keeps arriving, closes
+    it after `idle_timeout` seconds without messages, and retries failed
+    batches with exponential backoff on a fresh connection.
+    """
+
+    def __init__(self, batch_size=50, idle_timeout=30, max_retries=3, retry_backoff=1.0):
+        self.batch_size = batch_size
+        self.idle_timeout = idle_timeout
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.sent_count = 0
+        self.failed_count = 0
+        self._queue = queue.Queue()
+        self._connection = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def enqueue(self, *messages):
+        """Queue messages for delivery and return immediately"""
+        self._ensure_started()
+        for message in messages:
+            self._queue.put(message)
+
+    def flush(self, timeout=None):
+        """
+        Block until every queued message has been delivered or dropped.
+        Returns False if the timeout expired first.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='mail-worker', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                message = self._queue.get(timeout=self.idle_timeout)
+            except queue.Empty:
+                self._close_connection()
+                continue
+
+            batch = [message]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            try:
+                self._deliver(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _deliver(self, batch):
+        pending = list(batch)
+        for attempt in range(self.max_retries + 1):
+            try:
+                if self._connection is None:
+                    self._connection = get_connection(fail_silently=False)
+                    self._connection.open()
+                # One message at a time over the open connection, so a retry
+                # resumes at the failed message instead of resending the batch
+                while pending:
+                    self._connection.send_messages(pending[:1])
+                    pending.pop(0)
+                    self.sent_count += 1
+                return
+            except (smtplib.SMTPException, OSError) as e:
+                self._close_connection()
+                if attempt == self.max_retries:
+                    self.failed_count += len(pending)
+                    logger.error(f"Dropping {len(pending)} email(s) after {attempt + 1} attempts: {str(e)}")
+                    return
+                delay = self.retry_backoff * (2 ** attempt)
+                logger.warning(f"Email delivery failed ({str(e)}); retrying in {delay:.1f}s")
+                time.sleep(delay)
+            except Exception as e:
+                # Malformed messages will not succeed on retry
+                self._close_connection()
+                self.failed_count += len(pending)
+                logger.error(f"Failed to send {len(pending)} email(s): {str(e)}")
+                return
+
+    def _close_connection(self):
+        if self._connection is not None:
+            try:
+                self._connection.close()
+            except Exception:
+                pass
+            self._connection = None
+
+
+mail_worker = MailWorker(
+    batch_size=getattr(settings, 'EMAIL_WORKER_BATCH_SIZE', 50),
+    idle_timeout=getattr(settings, 'EMAIL_WORKER_IDLE_TIMEOUT', 30),
+    max_retries=getattr(settings, 'EMAIL_MAX_RETRIES', 3),
+    retry_backoff=getattr(settings, 'EMAIL_RETRY_BACKOFF', 1.0),
+)
+
+# Give queued mail a chance to go out when the worker process exits
+atexit.register(mail_worker.flush, timeout=10)
+
+def send_email(email):
+    """
+    Send an email through the background worker, or synchronously when
+    EMAIL_ASYNC is disabled. Returns True if the message was accepted.
+    """
+    if getattr(settings, 'EMAIL_ASYNC', True):
+        mail_worker.enqueue(email)
+        return True
+
+    try:
+        email.send(fail_silently=False)
+        return True
+    except Exception as e:
+        logger.error(f"Failed to send email: {str(e)}")
+        return False
+
+def send_order_confirmation_email(purchase):
+    """Queue an order confirmation email for a new purchase"""
+    user = purchase.buyer
+    if not user.email:
+        return False
+
+    try:
+        email = build_email(
+            f'🛍️ KoraQuest - Order {purchase.order_id} Confirmed',
+            [user.email],
+            'authentication/emails/order_confirmation',
+            {'user': user, 'purchase': purchase, 'total': purchase.calculate_total()}
+        )
+        return send_email(email)
+    except Exception as e:
+        logger.error(f"Failed to build order confirmation email: {str(e)}")
+        return False
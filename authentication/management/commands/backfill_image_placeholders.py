@@ -0,0 +1,48 @@
+"""
+Django management command to compute image placeholders for existing products.
+New uploads get their placeholder on save; this fills in rows created before that.
+"""
+
+from django.core.management.base import BaseCommand
+from authentication.models import Post, ProductImage
+from authentication.image_utils import compute_image_placeholder
+
+
+class Command(BaseCommand):
+    help = 'Computes low-quality placeholders and dominant colours for images that lack them'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Recompute placeholders even for images that already have one',
+        )
+
+    def handle(self, *args, **options):
+        for model in (Post, ProductImage):
+            queryset = model.objects.exclude(image='')
+            if not options['force']:
+                queryset = queryset.filter(image_placeholder='')
+
+            updated = 0
+            for obj in queryset.only('id', 'image').iterator():
+                try:
+                    with obj.image.open('rb') as image_file:
+                        placeholder, dominant_color = compute_image_placeholder(image_file)
+                except (FileNotFoundError, OSError) as e:
+                    self.stdout.write(
+                        self.style.WARNING(f'Skipping {model.__name__} {obj.id}: {str(e)}')
+                    )
+                    continue
+
+                if placeholder:
+                    # Queryset update so auto_now fields are not bumped
+                    model.objects.filter(id=obj.id).update(
+                        image_placeholder=placeholder,
+                        dominant_color=dominant_color
+                    )
+                    updated += 1
+
+            self.stdout.write(
+                self.style.SUCCESS(f'Updated {updated} {model.__name__} placeholder(s)')
+            )
@@ -0,0 +1,114 @@
+"""
+Django management command to compare the sync catalog views (served by a
+thread pool, like WSGI workers) with their async versions (served as
+concurrent tasks on one event loop, like ASGI) on the current database.
+Views are called directly, so middleware is not included in the timings.
+"""
+
+import asyncio
+import statistics
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+from django.test import AsyncRequestFactory, RequestFactory
+from django.test.utils import override_settings
+
+from authentication import async_catalog_views, views
+from authentication.models import Post
+
+# Serve {% static %} without a collectstatic manifest
+BENCHMARK_STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}
+
+
+class Command(BaseCommand):
+    help = 'Compares sync and async catalog view throughput under concurrent load'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help='Requests per endpoint and mode')
+        parser.add_argument('--concurrency', type=int, default=20, help='Concurrent requests in flight')
+        parser.add_argument('--username', help='User to request as (default: first active customer)')
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        users = User.objects.filter(is_active=True)
+        user = users.filter(username=options['username']).first() if options['username'] else users.filter(role='customer').first()
+        post = Post.objects.order_by('-created_at').first()
+        if user is None or post is None:
+            raise CommandError('Needs at least one active user and one product in the database')
+
+        endpoints = [
+            ('landing_page', '/', views.landing_page, async_catalog_views.landing_page, {}),
+            ('post_detail', f'/post/{post.id}/', views.post_detail, async_catalog_views.post_detail, {'post_id': post.id}),
+            ('dashboard_api', '/v1/dashboard/?page_size=20', views.dashboard_api, async_catalog_views.dashboard_api, {}),
+            ('categories_api', '/v1/categories/', views.categories_api, async_catalog_views.categories_api, {}),
+        ]
+
+        self.stdout.write(
+            f"{options['requests']} requests per endpoint, {options['concurrency']} concurrent, as {user.username}\n"
+        )
+        with override_settings(STORAGES=BENCHMARK_STORAGES, ALLOWED_HOSTS=['*']):
+            for name, path, sync_view, async_view, kwargs in endpoints:
+                self.stdout.write(self.style.SUCCESS(name))
+                sync_results = self.run_sync(sync_view, path, kwargs, user, options)
+                self.report('sync  (threads)', *sync_results)
+                async_results = asyncio.run(self.run_async(async_view, path, kwargs, user, options))
+                self.report('async (tasks)', *async_results)
+
+    def run_sync(self, view, path, kwargs, user, options):
+        factory = RequestFactory()
+
+        def call(_):
+            request = factory.get(path)
+            request.user = user
+            start = time.perf_counter()
+            try:
+                status = view(request, **kwargs).status_code
+            finally:
+                close_old_connections()
+            return time.perf_counter() - start, status
+
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+            call(0)  # warm up
+            start = time.perf_counter()
+            results = list(pool.map(call, range(options['requests'])))
+            elapsed = time.perf_counter() - start
+        return results, elapsed
+
+    async def run_async(self, view, path, kwargs, user, options):
+        factory = AsyncRequestFactory()
+        semaphore = asyncio.Semaphore(options['concurrency'])
+
+        async def auser():
+            return user
+
+        async def call():
+            async with semaphore:
+                request = factory.get(path)
+                request.user = user
+                request.auser = auser
+                start = time.perf_counter()
+                status = (await view(request, **kwargs)).status_code
+                return time.perf_counter() - start, status
+
+        await call()  # warm up
+        start = time.perf_counter()
+        results = await asyncio.gather(*(call() for _ in range(options['requests'])))
+        elapsed = time.perf_counter() - start
+        return results, elapsed
+
+    def report(self, label, results, elapsed):
+        latencies = sorted(latency for latency, _ in results)
+        statuses = Counter(status for _, status in results)
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        self.stdout.write(
+            f"  {label}: {len(results) / elapsed:,.0f} req/s, "
+            f"p50 {statistics.median(latencies) * 1000:.1f} ms, p95 {p95 * 1000:.1f} ms, "
+            f"statuses {dict(statuses)}"
+        )
@@ -0,0 +1,88 @@
+"""
+Django management command to benchmark JSON encoding of a dashboard_api page.
+Compares Django's JsonResponse and DRF's JSONRenderer (stdlib json) with the
+json_utils / FastJSONRenderer path on a synthetic page of products.
+"""
+
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.http import JsonResponse as DjangoJsonResponse
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from authentication.json_utils import JsonResponse, use_orjson
+from authentication.renderers import FastJSONRenderer
+
+
+def build_dashboard_page(items):
+    """A payload shaped like a dashboard_api page of `items` products"""
+    now = timezone.now()
+    posts = []
+    for i in range(items):
+        created = now - timedelta(hours=i)
+        posts.append({
+            'id': i + 1,
+            'title': f'Sneaker model {i}',
+            'description': 'Breathable mesh upper with a cushioned sole. ' * 4,
+            'price': Decimal('45000.00') + i,
+            'category': 'sneakers',
+            'category_display': 'Sneakers',
+            'inventory': 12,
+            'created_at': created,
+            'updated_at': created,
+            'total_purchases': i * 3,
+            'image_url': f'/media/posts/sneaker_{i}.jpg',
+            'image_placeholder': 'data:image/png;base64,' + 'A' * 120,
+            'dominant_color': '#3a5f8c',
+            'auxiliary_images': [
+                {'id': i * 10 + n, 'image_url': f'/media/product_gallery/{i}_{n}.jpg', 'display_order': n}
+                for n in range(3)
+            ],
+            'average_rating': 4.5,
+            'review_count': 8,
+            'total_likes': 21,
+            'is_bookmarked': i % 2 == 0,
+            'is_liked': i % 3 == 0,
+            'user': {'id': 1, 'username': 'store', 'first_name': 'Kicks', 'last_name': 'Life'},
+        })
+    return {
+        'success': True,
+        'message': 'Dashboard data retrieved successfully',
+        'data': {'posts': posts, 'pagination': {'current_page': 1, 'page_size': items}},
+    }
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks JSON encoding of a dashboard_api page (stdlib vs. fast encoder)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--items', type=int, default=100, help='Products on the page')
+        parser.add_argument('--iterations', type=int, default=500, help='Encodes per encoder')
+
+    def handle(self, *args, **options):
+        payload = build_dashboard_page(options['items'])
+        iterations = options['iterations']
+
+        if not use_orjson():
+            self.stdout.write(self.style.WARNING('orjson is not installed or JSON_BACKEND is "stdlib"; both paths use json'))
+
+        encoders = [
+            ('django JsonResponse', lambda: DjangoJsonResponse(payload).content),
+            ('json_utils JsonResponse', lambda: JsonResponse(payload).content),
+            ('DRF JSONRenderer', lambda: JSONRenderer().render(payload)),
+            ('FastJSONRenderer', lambda: FastJSONRenderer().render(payload)),
+        ]
+
+        self.stdout.write(f"{options['items']} items, {iterations} encodes each")
+        for label, encode in encoders:
+            size = len(encode())
+            start = time.perf_counter()
+            for _ in range(iterations):
+                encode()
+            elapsed = time.perf_counter() - start
+            self.stdout.write(self.style.SUCCESS(
+                f'{label:<25} {elapsed * 1000 / iterations:.3f} ms/page, {size:,} bytes'
+            ))
@@ -0,0 +1,53 @@
+"""
+Django management command to benchmark in-memory QR code rendering.
+Reports renders per second for uncached payloads and for LRU cache hits.
+"""
+
+import time
+from django.core.management.base import BaseCommand
+from authentication.qr_utils import render_qr_image, qr_image_cache, encode_qr_token, qr_token_expiry
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks QR code rendering throughput (cold renders vs. cache hits)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--renders', type=int, default=200, help='Number of distinct payloads to render')
+        parser.add_argument('--format', choices=['png', 'svg'], default='png', help='Image format to render')
+
+    def handle(self, *args, **options):
+        renders = options['renders']
+        image_format = options['format']
+
+        # Signed tokens with a few open purchases each, one per simulated user
+        expires_at = qr_token_expiry()
+        payloads = [
+            encode_qr_token(i + 1, [i * 3 + 1, i * 3 + 2, i * 3 + 3], expires_at)
+            for i in range(renders)
+        ]
+
+        qr_image_cache.clear()
+        original_maxsize = qr_image_cache.maxsize
+        qr_image_cache.maxsize = max(original_maxsize, renders)
+
+        try:
+            start = time.perf_counter()
+            for payload in payloads:
+                render_qr_image(payload, image_format)
+            cold_elapsed = time.perf_counter() - start
+
+            start = time.perf_counter()
+            for payload in payloads:
+                render_qr_image(payload, image_format)
+            cached_elapsed = time.perf_counter() - start
+        finally:
+            qr_image_cache.maxsize = original_maxsize
+            qr_image_cache.clear()
+
+        self.stdout.write(f'Format: {image_format.upper()}, payloads: {renders}')
+        self.stdout.write(
+            self.style.SUCCESS(f'Cold renders:  {renders / cold_elapsed:,.0f} renders/sec ({cold_elapsed * 1000 / renders:.2f} ms each)')
+        )
+        self.stdout.write(
+            self.style.SUCCESS(f'Cache hits:    {renders / cached_elapsed:,.0f} renders/sec ({cached_elapsed * 1000 / renders:.3f} ms each)')
+        )
@@ -0,0 +1,84 @@
+"""
+Django management command to measure per-request database hits for each
+session configuration. Every run happens inside a rolled-back transaction, so
+the temporary benchmark user never persists, and against private in-process
+caches, so the shared cache (sessions, tokens, OTPs) is never touched.
+"""
+
+import time
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+
+# (label, SESSION_ENGINE, authentication backend)
+CONFIGURATIONS = [
+    ('db sessions + db user (before)', 'django.contrib.sessions.backends.db', 'django.contrib.auth.backends.ModelBackend'),
+    ('cached_db sessions + cached user', 'django.contrib.sessions.backends.cached_db', 'authentication.auth_backends.CachedModelBackend'),
+    ('cache + L1 sessions + cached user', 'authentication.session_backends', 'authentication.auth_backends.CachedModelBackend'),
+]
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Reports database queries per authenticated request for each session engine'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=50, help='Requests per configuration')
+        parser.add_argument('--path', default='/api/rest/users/me/', help='Authenticated URL to request')
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{options['requests']} requests to {options['path']} per configuration\n")
+
+        for label, engine, backend in CONFIGURATIONS:
+            try:
+                with transaction.atomic():
+                    self.run_configuration(label, engine, backend, options)
+                    raise Rollback()
+            except Rollback:
+                pass
+
+    def run_configuration(self, label, engine, backend, options):
+        User = get_user_model()
+        private_caches = {
+            alias: {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': f'benchmark-sessions-{alias}'}
+            for alias in settings.CACHES
+        }
+
+        with override_settings(SESSION_ENGINE=engine, AUTHENTICATION_BACKENDS=[backend], CACHES=private_caches):
+            # Start every configuration cold
+            for cache in caches.all():
+                cache.clear()
+            user = User.objects.create_user('session-benchmark-user', password='unused-password')
+            client = Client(HTTP_HOST='localhost', HTTP_ACCEPT='application/json')
+            client.force_login(user, backend=backend)
+
+            # Warm up caches and lazy imports before measuring
+            client.get(options['path'])
+
+            requests = options['requests']
+            with CaptureQueriesContext(connection) as context:
+                start = time.perf_counter()
+                for _ in range(requests):
+                    response = client.get(options['path'])
+                elapsed = time.perf_counter() - start
+
+        session_queries = sum('django_session' in q['sql'] for q in context.captured_queries)
+        user_queries = sum(
+            f'FROM "{User._meta.db_table}"' in q['sql'] or f'FROM `{User._meta.db_table}`' in q['sql']
+            for q in context.captured_queries
+        )
+
+        self.stdout.write(self.style.SUCCESS(label))
+        self.stdout.write(
+            f"  status {response.status_code}, "
+            f"{len(context.captured_queries) / requests:.2f} queries/request "
+            f"(session {session_queries / requests:.2f}, user {user_queries / requests:.2f}), "
+            f"{elapsed * 1000 / requests:.2f} ms/request"
+        )
@@ -0,0 +1,33 @@
+"""
+Django management command to write buffered like toggles to the database
+(LIKE_WRITE_BEHIND mode), e.g. before a deploy, and to repair like counters.
+Web workers flush on their own every LIKE_FLUSH_INTERVAL seconds.
+"""
+
+from django.core.management.base import BaseCommand
+
+from authentication.like_service import flush_pending_likes, recount_likes
+
+
+class Command(BaseCommand):
+    help = 'Flushes buffered like toggles to the database'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--recount',
+            action='store_true',
+            help='Also recompute every product like_count from the likes table',
+        )
+
+    def handle(self, *args, **options):
+        total = 0
+        while True:
+            flushed = flush_pending_likes()
+            total += flushed
+            if not flushed:
+                break
+        self.stdout.write(self.style.SUCCESS(f'Flushed {total} buffered like toggle(s)'))
+
+        if options['recount']:
+            recount_likes()
+            self.stdout.write(self.style.SUCCESS('Recomputed like counts'))
@@ -0,0 +1,51 @@
+"""
+Django management command to copy existing database sessions into the
+configured session engine, so switching SESSION_BACKEND to `cache` does not
+log everyone out. Not needed for `cached_db`, which falls back to the database.
+"""
+
+from importlib import import_module
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+
+class Command(BaseCommand):
+    help = 'Copies unexpired database sessions into the configured SESSION_ENGINE'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--delete',
+            action='store_true',
+            help='Delete the database rows after copying them',
+        )
+
+    def handle(self, *args, **options):
+        if settings.SESSION_ENGINE in (
+            'django.contrib.sessions.backends.db',
+            'django.contrib.sessions.backends.cached_db',
+        ):
+            self.stdout.write(
+                self.style.WARNING(f'{settings.SESSION_ENGINE} reads the database directly. Nothing to migrate.')
+            )
+            return
+
+        SessionStore = import_module(settings.SESSION_ENGINE).SessionStore
+        now = timezone.now()
+        copied = 0
+
+        sessions = Session.objects.filter(expire_date__gt=now)
+        for session in sessions.iterator():
+            store = SessionStore(session_key=session.session_key)
+            # Write straight to the cache with the row's remaining lifetime,
+            # rather than restarting the clock at SESSION_COOKIE_AGE
+            remaining = int((session.expire_date - now).total_seconds())
+            store._cache.set(store.cache_key, session.get_decoded(), remaining)
+            copied += 1
+
+        self.stdout.write(self.style.SUCCESS(f'Copied {copied} session(s) to {settings.SESSION_ENGINE}'))
+
+        if options['delete']:
+            deleted, _ = Session.objects.all().delete()
+            self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} database session row(s)'))
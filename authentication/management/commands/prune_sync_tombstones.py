@@ -0,0 +1,30 @@
+"""
+Django management command to delete sync tombstones older than the retention
+window. Clients whose cursor predates the window are told to resync from
+scratch, so nothing older is ever read. Run it daily (e.g. a Render cron job).
+"""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from authentication.models import SyncTombstone
+
+
+class Command(BaseCommand):
+    help = 'Deletes delta-sync tombstones older than SYNC_TOMBSTONE_RETENTION_DAYS'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=getattr(settings, 'SYNC_TOMBSTONE_RETENTION_DAYS', 30),
+            help='Keep tombstones from the last N days',
+        )
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        deleted, _ = SyncTombstone.objects.filter(deleted_at__lt=cutoff).delete()
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} tombstone(s) older than {options["days"]} days'))
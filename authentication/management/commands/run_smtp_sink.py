@@ -0,0 +1,112 @@
+"""
+Django management command that runs a local SMTP stand-in.
+It accepts every message and prints a one-line summary, so the mail worker can
+be exercised end to end without a real mail server:
+
+    python manage.py run_smtp_sink --port 1025
+    EMAIL_BACKEND=django.core.mail.backends.smtp.EmailBackend EMAIL_HOST=localhost \
+        EMAIL_PORT=1025 EMAIL_USE_TLS=False DEBUG=True python manage.py runserver
+"""
+
+import email
+import socketserver
+import threading
+from email.header import decode_header, make_header
+from django.core.management.base import BaseCommand
+
+
+class SMTPSinkHandler(socketserver.StreamRequestHandler):
+    """Minimal SMTP dialogue: enough for smtplib and Django's SMTP backend"""
+
+    def reply(self, line):
+        self.wfile.write(f'{line}\r\n'.encode('ascii'))
+
+    def handle(self):
+        server = self.server
+        connection_messages = 0
+        mail_from, recipients = None, []
+        self.reply('220 koraquest-smtp-sink ready')
+
+        for raw_line in self.rfile:
+            line = raw_line.decode('utf-8', 'replace').rstrip('\r\n')
+            command = line[:4].upper()
+
+            if command in ('HELO', 'EHLO'):
+                self.reply('250 koraquest-smtp-sink')
+            elif command == 'MAIL':
+                mail_from, recipients = line[10:].strip(), []
+                self.reply('250 OK')
+            elif command == 'RCPT':
+                recipients.append(line[8:].strip())
+                self.reply('250 OK')
+            elif command == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                data = []
+                for data_line in self.rfile:
+                    if data_line in (b'.\r\n', b'.\n'):
+                        break
+                    data.append(data_line[1:] if data_line.startswith(b'..') else data_line)
+
+                with server.lock:
+                    server.received += 1
+                    reject = server.received <= server.fail_first
+                if reject:
+                    self.reply('451 Temporary failure (simulated)')
+                else:
+                    connection_messages += 1
+                    message = email.message_from_bytes(b''.join(data))
+                    subject = str(make_header(decode_header(message.get('Subject', ''))))
+                    server.log(f'[conn {id(self) % 10000}] #{connection_messages} from {mail_from} to {", ".join(recipients)}: {subject}')
+                    self.reply('250 OK: queued')
+            elif command == 'RSET':
+                mail_from, recipients = None, []
+                self.reply('250 OK')
+            elif command == 'NOOP':
+                self.reply('250 OK')
+            elif command == 'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('502 Command not implemented')
+
+
+class SMTPSinkServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, address, log, fail_first=0):
+        super().__init__(address, SMTPSinkHandler)
+        self.log = log
+        self.fail_first = fail_first
+        self.received = 0
+        self.lock = threading.Lock()
+
+
+class Command(BaseCommand):
+    help = 'Runs a local SMTP stand-in that accepts and logs outgoing mail'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=1025)
+        parser.add_argument(
+            '--fail-first',
+            type=int,
+            default=0,
+            help='Reject the first N messages with a 451 to exercise retry/backoff',
+        )
+
+    def handle(self, *args, **options):
+        server = SMTPSinkServer(
+            (options['host'], options['port']),
+            log=lambda line: self.stdout.write(line),
+            fail_first=options['fail_first'],
+        )
+        self.stdout.write(
+            self.style.SUCCESS(f"SMTP sink listening on {options['host']}:{options['port']} (Ctrl+C to stop)")
+        )
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
@@ -0,0 +1,68 @@
+"""
+Django management command to fill the database with a synthetic store for
+benchmarks and load tests: customers, store admins, products, gallery images,
+purchases, reviews, likes and bookmarks (see authentication/seeding.py).
+
+    python manage.py seed_store                          # full size (1M purchases)
+    python manage.py seed_store --scale 0.1 --workers 4
+    python manage.py seed_store --purchases 5000000 --product-skew 4
+
+Generated users are named <prefix>_admin_N / <prefix>_customer_N and share
+one password. Never run this against production data.
+"""
+
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from authentication.seeding import DEFAULT_PASSWORD, DEFAULT_VOLUMES, is_seeded, scaled_volumes, seed_store
+
+
+class Command(BaseCommand):
+    help = 'Generates a large synthetic store (users, products and activity) with bulk inserts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', type=float, default=1.0, help='Multiply every default volume by this')
+        for name, count in DEFAULT_VOLUMES.items():
+            parser.add_argument(f'--{name}', type=int, help=f'Number of {name} (default {count:,} x scale)')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed; the same seed gives the same store')
+        parser.add_argument('--product-skew', type=float, default=3.0,
+                            help='How strongly activity concentrates on hot products (1 = uniform)')
+        parser.add_argument('--user-skew', type=float, default=2.0,
+                            help='How strongly activity concentrates on power users (1 = uniform)')
+        parser.add_argument('--workers', type=int, default=1,
+                            help='Processes generating rows (0 = one per CPU)')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows per INSERT')
+        parser.add_argument('--prefix', default='seed', help='Username prefix of the generated users')
+        parser.add_argument('--password', default=DEFAULT_PASSWORD, help='Password of every generated user')
+
+    def handle(self, *args, **options):
+        if is_seeded(options['prefix']):
+            raise CommandError(
+                f"Users named {options['prefix']}_* already exist; choose another --prefix or flush the database"
+            )
+        if min(options['product_skew'], options['user_skew']) < 1:
+            raise CommandError('Skews must be at least 1')
+
+        volumes = scaled_volumes(options['scale'])
+        for name in DEFAULT_VOLUMES:
+            if options[name] is not None:
+                volumes[name] = options[name]
+        if volumes['admins'] < 1 or volumes['customers'] < 1 or volumes['products'] < 1:
+            raise CommandError('Needs at least one admin, one customer and one product')
+
+        self.stdout.write(', '.join(f'{count:,} {name}' for name, count in volumes.items()))
+        seed_store(
+            volumes,
+            seed=options['seed'],
+            prefix=options['prefix'],
+            password=options['password'],
+            product_skew=options['product_skew'],
+            user_skew=options['user_skew'],
+            workers=options['workers'] or os.cpu_count() or 1,
+            batch_size=options['batch_size'],
+            stdout=self.stdout,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Store seeded; log in as {options['prefix']}_admin_0 or {options['prefix']}_customer_0"
+        ))
@@ -0,0 +1,296 @@
+"""
+Prometheus metrics.
+
+Counters and histograms are defined at the bottom of this module and updated
+in-process (MetricsMiddleware records every request; the order and inventory
+code records its own events). Each worker adds its increments to a pending
+batch, and a background thread moves the batch into the shared cache
+(METRICS_CACHE_ALIAS, Redis in production) every METRICS_FLUSH_INTERVAL
+seconds with atomic INCRs. Every gunicorn worker, and every instance,
+therefore adds to the same totals, and /metrics reports the sum.
+Without a shared cache each worker only sees its own numbers.
+
+Cache layout:
+    metrics:series:<n>       text of the n-th series, e.g. name{view="dashboard"}
+    metrics:seen:<digest>    marks a series as listed
+    metrics:value:<digest>   the series' running total
+    metrics:seq              number of series listed
+
+Values are stored as integers; seconds are kept in microseconds. Totals can
+lag by up to one flush interval, or by a few seconds when a worker is
+killed, since its unflushed batch is lost.
+"""
+
+import atexit
+import bisect
+import hashlib
+import hmac
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import Http404, HttpResponse, HttpResponseForbidden
+
+from .cache_utils import incr_counter
+from .token_auth import get_bearer_token
+
+logger = logging.getLogger(__name__)
+
+SEQ_KEY = 'metrics:seq'
+MICROSECONDS = 1_000_000
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _cache():
+    return caches[getattr(settings, 'METRICS_CACHE_ALIAS', 'default')]
+
+
+def metrics_enabled():
+    return getattr(settings, 'METRICS_ENABLED', False)
+
+
+def _digest(series):
+    return hashlib.md5(series.encode()).hexdigest()
+
+
+def _label_value(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _series(name, labels):
+    if not labels:
+        return name
+    return name + '{' + ','.join(f'{key}="{_label_value(value)}"' for key, value in labels) + '}'
+
+
+# ============================================
+# REGISTRY
+# ============================================
+
+class Registry:
+    def __init__(self):
+        self.metrics = {}
+        self._pending = {}
+        self._listed = set()
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        self.metrics[metric.name] = metric
+        return metric
+
+    def add(self, series, amount):
+        with self._lock:
+            self._pending[series] = self._pending.get(series, 0) + amount
+
+    def add_many(self, increments):
+        with self._lock:
+            for series, amount in increments:
+                self._pending[series] = self._pending.get(series, 0) + amount
+
+    def flush(self):
+        """Move this worker's pending increments into the shared cache"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return
+        cache = _cache()
+        for series, amount in pending.items():
+            digest = _digest(series)
+            if series not in self._listed:
+                # The first worker to see a series lists it for the scrape
+                if cache.add(f'metrics:seen:{digest}', 1, timeout=None):
+                    number = incr_counter(cache, SEQ_KEY, 1)
+                    cache.set(f'metrics:series:{number}', series, timeout=None)
+                self._listed.add(series)
+            if amount:
+                incr_counter(cache, f'metrics:value:{digest}', amount)
+
+    def collect(self):
+        """{series: total} across all workers"""
+        cache = _cache()
+        count = cache.get(SEQ_KEY, 0)
+        series = []
+        for start in range(1, count + 1, 1000):
+            keys = [f'metrics:series:{number}' for number in range(start, min(start + 1000, count + 1))]
+            series.extend(cache.get_many(keys).values())
+        totals = {}
+        for start in range(0, len(series), 1000):
+            batch = {f'metrics:value:{_digest(name)}': name for name in series[start:start + 1000]}
+            values = cache.get_many(list(batch))
+            for key, name in batch.items():
+                totals[name] = values.get(key, 0)
+        return totals
+
+    def render(self):
+        """The Prometheus text exposition of every metric"""
+        self.flush()
+        totals = self.collect()
+        families = {}
+        for series, value in totals.items():
+            name = series.split('{', 1)[0]
+            family = name if name in self.metrics else name.rsplit('_', 1)[0]
+            metric = self.metrics.get(family)
+            if metric is not None:
+                scale = metric.scale(name)
+                families.setdefault(family, []).append((series, value / scale if scale != 1 else value))
+        lines = []
+        for family in sorted(families):
+            metric = self.metrics[family]
+            lines.append(f'# HELP {family} {metric.documentation}')
+            lines.append(f'# TYPE {family} {metric.type}')
+            for series, value in sorted(families[family], key=metric.sort_key):
+                lines.append(f'{series} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+
+class Counter:
+    type = 'counter'
+
+    def __init__(self, name, documentation, labelnames=(), seconds=False):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._scale = MICROSECONDS if seconds else 1
+        registry.register(self)
+
+    def scale(self, name):
+        return self._scale
+
+    def sort_key(self, item):
+        return item[0]
+
+    def inc(self, amount=1, **labels):
+        if amount:
+            series = _series(self.name, [(key, labels[key]) for key in self.labelnames])
+            registry.add(series, round(amount * self._scale))
+
+
+class Histogram:
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets)
+        registry.register(self)
+
+    def scale(self, name):
+        # Only the sum of observed seconds is stored in microseconds
+        return MICROSECONDS if name.endswith('_sum') else 1
+
+    def sort_key(self, item):
+        # Group by labels; buckets in ascending order, then _count and _sum
+        name, _, labels = item[0].partition('{')
+        if name.endswith('_bucket'):
+            labels, _, le = labels.rpartition('le="')
+            bound = float('inf') if le.startswith('+Inf') else float(le.split('"')[0])
+            return (labels.rstrip(','), 0, bound)
+        return (labels.rstrip('}'), 1, name)
+
+    def observe(self, value, **labels):
+        pairs = [(key, labels[key]) for key in self.labelnames]
+        # Buckets below the value get 0 so every bucket of the series is listed
+        first = bisect.bisect_left(self.buckets, value)
+        increments = [
+            (_series(f'{self.name}_bucket', pairs + [('le', f'{bound:g}')]), int(index >= first))
+            for index, bound in enumerate(self.buckets)
+        ]
+        increments.append((_series(f'{self.name}_bucket', pairs + [('le', '+Inf')]), 1))
+        increments.append((_series(f'{self.name}_count', pairs), 1))
+        increments.append((_series(f'{self.name}_sum', pairs), round(value * MICROSECONDS)))
+        registry.add_many(increments)
+
+
+# ============================================
+# BACKGROUND FLUSH
+# ============================================
+
+class MetricsFlusher:
+    """
+    Background thread that flushes the registry every `interval` seconds.
+    Like LikeFlusher, it starts on first use so it is created after gunicorn forks.
+    """
+
+    def __init__(self, interval=5.0):
+        self.interval = interval
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def ensure_started(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='metrics-flusher', daemon=True)
+                self._thread.start()
+
+    def flush(self):
+        try:
+            registry.flush()
+        except Exception as e:
+            logger.error(f"Metrics flush failed: {str(e)}")
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            self.flush()
+
+
+metrics_flusher = MetricsFlusher(interval=getattr(settings, 'METRICS_FLUSH_INTERVAL', 5.0))
+
+
+def _flush_at_exit():
+    if metrics_enabled():
+        metrics_flusher.flush()
+
+
+atexit.register(_flush_at_exit)
+
+
+# ============================================
+# SCRAPE ENDPOINT
+# ============================================
+
+def metrics_view(request):
+    """
+    Prometheus scrape endpoint. Needs `Authorization: Bearer <METRICS_AUTH_TOKEN>`
+    when that setting is set, otherwise a logged-in store admin.
+    """
+    if not metrics_enabled():
+        raise Http404
+    token = getattr(settings, 'METRICS_AUTH_TOKEN', '')
+    if token:
+        if not hmac.compare_digest(get_bearer_token(request) or '', token):
+            return HttpResponseForbidden('Invalid metrics token')
+    elif not (request.user.is_authenticated and request.user.is_admin):
+        return HttpResponseForbidden('Admin access required')
+    return HttpResponse(registry.render(), content_type=CONTENT_TYPE)
+
+
+# ============================================
+# METRICS
+# ============================================
+
+REQUEST_DURATION = Histogram(
+    'koraquest_http_request_duration_seconds', 'Time to handle a request, by URL name',
+    ('view', 'method', 'status'),
+)
+REQUEST_QUEUE_TIME = Histogram(
+    'koraquest_http_request_queue_seconds', 'Time between the proxy receiving a request (X-Request-Start) and a worker picking it up',
+)
+DB_QUERIES = Counter('koraquest_db_queries_total', 'Database queries run, by URL name', ('view',))
+DB_TIME = Counter('koraquest_db_query_seconds_total', 'Time spent in database queries, by URL name', ('view',), seconds=True)
+CACHE_REQUESTS = Counter(
+    'koraquest_cache_requests_total', 'Application cache lookups, by URL name and result (hit/miss)', ('view', 'result'),
+)
+ORDERS = Counter('koraquest_orders_total', 'Orders placed, by delivery method', ('delivery_method',))
+INVENTORY_CONFLICTS = Counter(
+    'koraquest_inventory_reservation_conflicts_total', 'Orders refused because the stock was gone when reserving it',
+)
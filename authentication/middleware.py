@@ -0,0 +1,279 @@
+"""
+Request timing and query-pattern middleware.
+
+ServerTimingMiddleware measures a sample of requests (SERVER_TIMING_SAMPLE_RATE)
+and reports, per request, the number of database queries and their total
+time, application cache hits and misses, render time (templates and JSON
+encoding) and the overall time:
+
+    Server-Timing: db;dur=12.4;desc="9 queries", cache;desc="3 hits, 1 misses",
+                   render;dur=3.1, total;dur=21.7
+
+The same figures are logged as one key=value line on the
+'authentication.timing' logger (and as `extra` attributes for structured
+log handlers). With SERVER_TIMING_ENABLED off the middleware removes itself
+at startup. Put it first in MIDDLEWARE so the total covers the whole stack.
+
+NPlusOneMiddleware reports N+1 query patterns per request (see nplusone.py).
+
+MetricsMiddleware records every request in the Prometheus metrics served at
+/metrics (see metrics.py): latency by URL name, method and status class,
+database queries and time, cache hits and misses, and the queue time from the
+proxy's X-Request-Start header. It also goes first in MIDDLEWARE; the timing
+middleware inside it shares its measurements.
+
+ProfilingMiddleware profiles the requests an admin asked for with a signed
+token (see profiling.py).
+"""
+
+import logging
+import random
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.urls import reverse
+
+from . import instrumentation, metrics, nplusone, profiling
+
+logger = logging.getLogger('authentication.timing')
+
+METRIC_METHODS = {'GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'}
+
+
+class ServerTimingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'SERVER_TIMING_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.sample_rate = getattr(settings, 'SERVER_TIMING_SAMPLE_RATE', 1.0)
+        self.send_header = getattr(settings, 'SERVER_TIMING_HEADER', True)
+        self.log = getattr(settings, 'SERVER_TIMING_LOG', True)
+        instrumentation.install_query_hook()
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def _sampled(self):
+        return self.sample_rate >= 1 or random.random() < self.sample_rate
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self._sampled():
+            return self.get_response(request)
+        metrics, token = instrumentation.start_request()
+        try:
+            response = self.get_response(request)
+            self.report(request, response, metrics)
+            return response
+        finally:
+            instrumentation.end_request(token)
+
+    async def __acall__(self, request):
+        if not self._sampled():
+            return await self.get_response(request)
+        metrics, token = instrumentation.start_request()
+        try:
+            response = await self.get_response(request)
+            self.report(request, response, metrics)
+            return response
+        finally:
+            instrumentation.end_request(token)
+
+    def report(self, request, response, metrics):
+        total_ms = metrics.elapsed() * 1000
+        db_ms = metrics.db_time * 1000
+        render_ms = metrics.render_time * 1000
+
+        if self.send_header:
+            entries = [
+                f'db;dur={db_ms:.1f};desc="{metrics.db_queries} queries"',
+                f'cache;desc="{metrics.cache_hits} hits, {metrics.cache_misses} misses"',
+                f'render;dur={render_ms:.1f}',
+                f'total;dur={total_ms:.1f}',
+            ]
+            existing = response.get('Server-Timing')
+            response['Server-Timing'] = ', '.join(([existing] if existing else []) + entries)
+
+        if self.log:
+            fields = {
+                'method': request.method,
+                'path': request.path,
+                'status': response.status_code,
+                'duration_ms': round(total_ms, 1),
+                'db_queries': metrics.db_queries,
+                'db_ms': round(db_ms, 1),
+                'cache_hits': metrics.cache_hits,
+                'cache_misses': metrics.cache_misses,
+                'render_ms': round(render_ms, 1),
+            }
+            logger.info(
+                'request ' + ' '.join(f'{key}={value}' for key, value in fields.items()),
+                extra={'timing': fields},
+            )
+
+
+class NPlusOneMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'NPLUSONE_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.raise_error = getattr(settings, 'NPLUSONE_RAISE', False)
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        detector = nplusone.Detector()
+        with instrumentation.listen_queries(detector.record):
+            response = self.get_response(request)
+        self.check(request, detector)
+        return response
+
+    async def __acall__(self, request):
+        detector = nplusone.Detector()
+        with instrumentation.listen_queries(detector.record):
+            response = await self.get_response(request)
+        self.check(request, detector)
+        return response
+
+    def check(self, request, detector):
+        if not detector.problems():
+            return
+        match = request.resolver_match
+        report = detector.report(f'{match._func_path if match else request.path} ({request.method} {request.path})')
+        if self.raise_error:
+            raise nplusone.NPlusOneError(report)
+        nplusone.logger.warning(report)
+
+
+def request_queue_time(request, now):
+    """
+    Seconds since the proxy received the request, from X-Request-Start
+    (`t=<epoch>` in seconds, milliseconds or microseconds), or None
+    """
+    header = request.META.get('HTTP_X_REQUEST_START', '')
+    try:
+        started = float(header[2:] if header.startswith('t=') else header)
+    except ValueError:
+        return None
+    if started > 1e14:
+        started /= 1_000_000
+    elif started > 1e11:
+        started /= 1000
+    queued = now - started
+    return queued if 0 <= queued < 3600 else None
+
+
+class MetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not metrics.metrics_enabled():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        instrumentation.install_query_hook()
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        queued = request_queue_time(request, time.time())
+        request_metrics, token = instrumentation.start_request()
+        try:
+            response = self.get_response(request)
+            self.record(request, response, request_metrics, queued)
+            return response
+        finally:
+            instrumentation.end_request(token)
+
+    async def __acall__(self, request):
+        queued = request_queue_time(request, time.time())
+        request_metrics, token = instrumentation.start_request()
+        try:
+            response = await self.get_response(request)
+            self.record(request, response, request_metrics, queued)
+            return response
+        finally:
+            instrumentation.end_request(token)
+
+    def record(self, request, response, request_metrics, queued):
+        # Label by URL name rather than path so ids don't create new series
+        match = request.resolver_match
+        if match is None:
+            view = 'unmatched'
+        else:
+            view = match.url_name or match.route or 'unnamed'
+        method = request.method if request.method in METRIC_METHODS else 'other'
+
+        metrics.REQUEST_DURATION.observe(
+            request_metrics.elapsed(), view=view, method=method, status=f'{response.status_code // 100}xx',
+        )
+        if queued is not None:
+            metrics.REQUEST_QUEUE_TIME.observe(queued)
+        metrics.DB_QUERIES.inc(request_metrics.db_queries, view=view)
+        metrics.DB_TIME.inc(request_metrics.db_time, view=view)
+        metrics.CACHE_REQUESTS.inc(request_metrics.cache_hits, view=view, result='hit')
+        metrics.CACHE_REQUESTS.inc(request_metrics.cache_misses, view=view, result='miss')
+        metrics.metrics_flusher.ensure_started()
+
+
+class ProfilingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not profiling.profiling_enabled():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def _profiling_user(self, request):
+        token = profiling.requested_token(request)
+        if token is None:
+            return None
+        user_id = profiling.token_user_id(token)
+        if user_id is None:
+            profiling.logger.warning(f'Ignored an invalid, expired or revoked profiling token for {request.path}')
+        return user_id
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        user_id = self._profiling_user(request)
+        if user_id is None:
+            return self.get_response(request)
+        run = profiling.ProfileRun()
+        with instrumentation.listen_queries(run.record_query), run:
+            response = self.get_response(request)
+        self.save(request, response, run, user_id)
+        return response
+
+    async def __acall__(self, request):
+        # Checking a token queries the user, so only leave the event loop when one is sent
+        user_id = None
+        if profiling.requested_token(request) is not None:
+            user_id = await sync_to_async(self._profiling_user)(request)
+        if user_id is None:
+            return await self.get_response(request)
+        # Under ASGI the profile also catches other requests running on the event loop meanwhile
+        run = profiling.ProfileRun()
+        with instrumentation.listen_queries(run.record_query), run:
+            response = await self.get_response(request)
+        self.save(request, response, run, user_id)
+        return response
+
+    def save(self, request, response, run, user_id):
+        number = run.save(request, response, user_id)
+        response['X-Profile'] = reverse('profile_detail', args=[number])
@@ -0,0 +1,51 @@
+# Generated by Django 5.2 on 2026-10-19 04:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("authentication", "0007_post_user"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="post",
+            name="dominant_color",
+            field=models.CharField(
+                blank=True,
+                default="",
+                help_text="Dominant colour of the image (#rrggbb)",
+                max_length=7,
+            ),
+        ),
+        migrations.AddField(
+            model_name="post",
+            name="image_placeholder",
+            field=models.TextField(
+                blank=True,
+                default="",
+                help_text="Inline low-quality preview of the image (data URI)",
+            ),
+        ),
+        migrations.AddField(
+            model_name="productimage",
+            name="dominant_color",
+            field=models.CharField(
+                blank=True,
+                default="",
+                help_text="Dominant colour of the image (#rrggbb)",
+                max_length=7,
+            ),
+        ),
+        migrations.AddField(
+            model_name="productimage",
+            name="image_placeholder",
+            field=models.TextField(
+                blank=True,
+                default="",
+                help_text="Inline low-quality preview of the image (data URI)",
+            ),
+        ),
+    ]
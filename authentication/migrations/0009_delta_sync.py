@@ -0,0 +1,97 @@
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    """
+    Delta-sync support: (updated_at, id) indexes on the synced tables, a
+    tombstone table for deletions, and an explicit, timestamped through model
+    for Post.likes. PostLike reuses the existing authentication_post_likes
+    table, so existing likes are kept; only the created_at column is added.
+    """
+
+    dependencies = [
+        ("authentication", "0008_image_placeholders"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name="PostLike",
+                    fields=[
+                        ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                        ("post", models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to="authentication.post")),
+                        ("user", models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+                    ],
+                    options={
+                        "db_table": "authentication_post_likes",
+                        "unique_together": {("post", "user")},
+                    },
+                ),
+                migrations.AlterField(
+                    model_name="post",
+                    name="likes",
+                    field=models.ManyToManyField(
+                        blank=True,
+                        related_name="liked_posts",
+                        through="authentication.PostLike",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            database_operations=[],
+        ),
+        migrations.AddField(
+            model_name="postlike",
+            name="created_at",
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddIndex(
+            model_name="postlike",
+            index=models.Index(fields=["user", "created_at", "id"], name="postlike_user_sync_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="post",
+            index=models.Index(fields=["updated_at", "id"], name="post_sync_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="purchase",
+            index=models.Index(fields=["buyer", "updated_at", "id"], name="purchase_buyer_sync_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="bookmark",
+            index=models.Index(fields=["user", "created_at", "id"], name="bookmark_user_sync_idx"),
+        ),
+        migrations.CreateModel(
+            name="SyncTombstone",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[
+                            ("post", "Product"),
+                            ("bookmark", "Bookmark"),
+                            ("like", "Like"),
+                            ("purchase", "Purchase"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                ("object_id", models.BigIntegerField()),
+                ("user_id", models.BigIntegerField(blank=True, null=True)),
+                ("deleted_at", models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                "ordering": ["deleted_at", "id"],
+                "indexes": [
+                    models.Index(fields=["deleted_at", "id"], name="tombstone_sync_idx"),
+                    models.Index(fields=["user_id", "deleted_at", "id"], name="tombstone_user_sync_idx"),
+                ],
+            },
+        ),
+    ]
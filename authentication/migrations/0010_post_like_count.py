@@ -0,0 +1,26 @@
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_like_counts(apps, schema_editor):
+    Post = apps.get_model("authentication", "Post")
+    PostLike = apps.get_model("authentication", "PostLike")
+    counts = PostLike.objects.filter(post=OuterRef("pk")).order_by().values("post").annotate(c=Count("id")).values("c")
+    Post.objects.update(like_count=Coalesce(Subquery(counts), Value(0)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("authentication", "0009_delta_sync"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="post",
+            name="like_count",
+            field=models.PositiveIntegerField(default=0, help_text="Number of likes, maintained by like_service"),
+        ),
+        migrations.RunPython(backfill_like_counts, migrations.RunPython.noop),
+    ]
@@ -6,6 +6,7 @@ from django.utils import timezone
 from django.utils.text import slugify
 from django.core.validators import MinValueValidator, MaxValueValidator
 import uuid
+from .image_utils import update_image_placeholder
 
 class User(AbstractUser):
     USER_ROLES = (
@@ -46,10 +47,12 @@ class Post(models.Model):
     title = models.CharField(max_length=255)
     description = models.TextField()
     image = models.ImageField(upload_to='posts/')
+    image_placeholder = models.TextField(blank=True, default='', help_text="Inline low-quality preview of the image (data URI)")
+    dominant_color = models.CharField(max_length=7, blank=True, default='', help_text="Dominant colour of the image (#rrggbb)")
     created_at = models.DateTimeField(default=timezone.now)
     updated_at = models.DateTimeField(auto_now=True)
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='posts', null=True, blank=True, help_text="Store admin who created this product")
-    likes = models.ManyToManyField(User, related_name='liked_posts', blank=True)
+    likes = models.ManyToManyField(User, related_name='liked_posts', blank=True, through='PostLike')
     
     # Product fields
     price = models.DecimalField(max_digits=10, decimal_places=2)
@@ -58,12 +61,27 @@ class Post(models.Model):
     
     # Stats
     total_purchases = models.IntegerField(default=0)
+    like_count = models.PositiveIntegerField(default=0, help_text="Number of likes, maintained by like_service")
+    
+    # Moved only with F() updates (like_service, inventory_service); saving the
+    # loaded copy back would undo every change made since the row was read
+    COUNTER_FIELDS = ('like_count', 'total_purchases')
     
     def __str__(self):
         return self.title
+    
+    def save(self, *args, **kwargs):
+        # Compute the placeholder once, when a new image is uploaded
+        update_image_placeholder(self)
+        if not self._state.adding and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.COUNTER_FIELDS
+            ]
+        super().save(*args, **kwargs)
         
     def total_likes(self):
-        return self.likes.count()
+        return self.like_count
     
     def average_rating(self):
         reviews = self.reviews.all()
@@ -79,6 +97,26 @@ class Post(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Delta sync walks products in (updated_at, id) order
+            models.Index(fields=['updated_at', 'id'], name='post_sync_idx'),
+        ]
+
+class PostLike(models.Model):
+    """Through table of Post.likes (same table as the former auto-created one), timestamped for sync"""
+    post = models.ForeignKey(Post, on_delete=models.CASCADE)
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    created_at = models.DateTimeField(default=timezone.now)
+    
+    def __str__(self):
+        return f"{self.user_id} likes {self.post_id}"
+    
+    class Meta:
+        db_table = 'authentication_post_likes'
+        unique_together = ['post', 'user']
+        indexes = [
+            models.Index(fields=['user', 'created_at', 'id'], name='postlike_user_sync_idx'),
+        ]
 
 class ProductReview(models.Model):
     product = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='reviews')
@@ -160,6 +198,9 @@ class Purchase(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['buyer', 'updated_at', 'id'], name='purchase_buyer_sync_idx'),
+        ]
 
 class Bookmark(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='bookmarks')
@@ -172,17 +213,56 @@ class Bookmark(models.Model):
     class Meta:
         ordering = ['-created_at']
         unique_together = ['user', 'post']
+        indexes = [
+            models.Index(fields=['user', 'created_at', 'id'], name='bookmark_user_sync_idx'),
+        ]
 
 class ProductImage(models.Model):
     product = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='auxiliary_images')
     image = models.ImageField(upload_to='product_gallery/')
+    image_placeholder = models.TextField(blank=True, default='', help_text="Inline low-quality preview of the image (data URI)")
+    dominant_color = models.CharField(max_length=7, blank=True, default='', help_text="Dominant colour of the image (#rrggbb)")
     display_order = models.IntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     
     def __str__(self):
         return f"{self.product.title} - Image {self.display_order + 1}"
     
+    def save(self, *args, **kwargs):
+        update_image_placeholder(self)
+        super().save(*args, **kwargs)
+    
     class Meta:
         ordering = ['display_order']
 
+class SyncTombstone(models.Model):
+    """
+    Record of a deleted row for the delta-sync API, so clients can drop it locally.
+    object_id is the product id for posts, bookmarks and likes, and the purchase id
+    for purchases. user_id is empty for deletions every client must see (products);
+    it is a plain column rather than a foreign key so deleting a user, which
+    cascades to their bookmarks and likes, can still record them.
+    """
+    KIND_CHOICES = (
+        ('post', 'Product'),
+        ('bookmark', 'Bookmark'),
+        ('like', 'Like'),
+        ('purchase', 'Purchase'),
+    )
+    
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    object_id = models.BigIntegerField()
+    user_id = models.BigIntegerField(null=True, blank=True)
+    deleted_at = models.DateTimeField(default=timezone.now)
+    
+    def __str__(self):
+        return f"{self.kind} {self.object_id} deleted at {self.deleted_at}"
+    
+    class Meta:
+        ordering = ['deleted_at', 'id']
+        indexes = [
+            models.Index(fields=['deleted_at', 'id'], name='tombstone_sync_idx'),
+            models.Index(fields=['user_id', 'deleted_at', 'id'], name='tombstone_user_sync_idx'),
+        ]
+
 # Removed QR Code and OTP models for simplified workflow
@@ -0,0 +1,168 @@
+"""
+N+1 query detection for development and tests.
+
+A Detector watches the queries of one request (through
+instrumentation.listen_queries) and groups them by shape (the SQL with its
+parameters left out) and by where they came from: the innermost template
+line being rendered and the nearest frame in this project's code. When one
+group reaches NPLUSONE_THRESHOLD queries it is an N+1 pattern, typically a
+relation read inside a loop such as `purchase.product.user` in a template,
+and the report names the relation and the select_related/prefetch_related
+that would load it up front.
+
+NPlusOneMiddleware runs a Detector on every request when NPLUSONE_ENABLED is
+on (by default with DEBUG) and logs what it finds on the
+'authentication.nplusone' logger; with NPLUSONE_RAISE it raises NPlusOneError
+instead, which fails any test that makes the request. In a test,
+detect_nplusone() checks a block of code directly:
+
+    with detect_nplusone():
+        self.client.get('/purchases/')
+"""
+
+import logging
+import re
+import sys
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db.models import QuerySet
+from django.db.models.fields.related_descriptors import ForwardManyToOneDescriptor
+
+from . import instrumentation
+
+logger = logging.getLogger('authentication.nplusone')
+
+# Frames from these files are never reported as the origin of a query
+_INTERNAL_FILES = {__file__, instrumentation.__file__}
+_PARAMETER_LIST = re.compile(r'\((?:%s, )+%s\)')
+
+
+class NPlusOneError(Exception):
+    """A request or block of code ran an N+1 query pattern"""
+
+
+def query_shape(sql):
+    """The SQL with `IN (%s, %s, ...)` lists of any length made the same"""
+    return _PARAMETER_LIST.sub('(%s, ...)', sql)
+
+
+def _frames(frame):
+    while frame is not None:
+        yield frame
+        frame = frame.f_back
+
+
+def _template_line(frame):
+    """`template:line` of the innermost template node being rendered, if any"""
+    for f in _frames(frame):
+        if f.f_code.co_name == 'render_annotated':
+            node = f.f_locals.get('self')
+            origin = getattr(node, 'origin', None)
+            if origin is not None:
+                return f'{origin.template_name}:{node.token.lineno}'
+    return None
+
+
+def _is_project_frame(frame, base_dir):
+    filename = frame.f_code.co_filename
+    return filename.startswith(base_dir) and 'site-packages' not in filename and filename not in _INTERNAL_FILES
+
+
+def _call_site(frame):
+    """`file:line in function` of the nearest frame in this project's code"""
+    base_dir = str(settings.BASE_DIR)
+    for f in _frames(frame):
+        if _is_project_frame(f, base_dir):
+            return f'{f.f_code.co_filename[len(base_dir) + 1:]}:{f.f_lineno} in {f.f_code.co_name}'
+    return None
+
+
+def _relation_hint(frame):
+    """The relation being loaded and how to load it up front, if the query is a related lookup"""
+    base_dir = str(settings.BASE_DIR)
+    queryset = None
+    for f in _frames(frame):
+        if _is_project_frame(f, base_dir):
+            break
+        # type() rather than isinstance(), which would evaluate lazy objects
+        # such as request.user (and run a query from inside this one)
+        owner = f.f_locals.get('self')
+        if issubclass(type(owner), ForwardManyToOneDescriptor) and f.f_code.co_name == 'get_object':
+            field = owner.field
+            return f"{field.model.__name__}.{field.name}: select_related('{field.name}')"
+        if queryset is None and issubclass(type(owner), QuerySet):
+            queryset, method = owner, f.f_code.co_name
+
+    instance = queryset._hints.get('instance') if queryset is not None else None
+    if instance is None:
+        return None
+    names = [
+        field.get_accessor_name() if field.auto_created else field.name
+        for field in instance._meta.get_fields()
+        if field.is_relation and field.related_model is queryset.model and (field.many_to_many or field.one_to_many)
+    ]
+    if not names:
+        return None
+    model = type(instance).__name__
+    if method in ('count', 'aggregate', 'exists'):
+        return f"{model}.{' or '.join(names)}: annotate the {method}() onto the {model} queryset"
+    return f"{model}.{' or '.join(names)}: " + ' or '.join(f"prefetch_related('{name}')" for name in names)
+
+
+class QueryPattern:
+    def __init__(self, sql, template, location, relation):
+        self.sql = sql
+        self.template = template
+        self.location = location
+        self.relation = relation
+        self.count = 0
+
+    def describe(self):
+        lines = [f'{self.count} queries like: {self.sql}']
+        if self.template:
+            lines.append(f'  template: {self.template}')
+        if self.location:
+            lines.append(f'  code: {self.location}')
+        if self.relation:
+            lines.append(f'  suggestion: {self.relation}')
+        return '\n'.join(lines)
+
+
+class Detector:
+    """Groups the queries it is fed by shape and origin; see the module docstring"""
+
+    def __init__(self, threshold=None):
+        self.threshold = threshold or getattr(settings, 'NPLUSONE_THRESHOLD', 5)
+        self.patterns = {}
+        self._lock = threading.Lock()
+
+    def record(self, sql, duration):
+        frame = sys._getframe(1)
+        key = (query_shape(sql), _template_line(frame), _call_site(frame))
+        relation = _relation_hint(frame) if key not in self.patterns else None
+        with self._lock:
+            pattern = self.patterns.get(key)
+            if pattern is None:
+                pattern = self.patterns[key] = QueryPattern(*key, relation)
+            pattern.count += 1
+
+    def problems(self):
+        """Patterns that reached the threshold, most repeated first"""
+        found = [pattern for pattern in self.patterns.values() if pattern.count >= self.threshold]
+        return sorted(found, key=lambda pattern: -pattern.count)
+
+    def report(self, label):
+        problems = self.problems()
+        return f'N+1 queries in {label}:\n' + '\n'.join(pattern.describe() for pattern in problems)
+
+
+@contextmanager
+def detect_nplusone(threshold=None, label='block'):
+    """Raise NPlusOneError if the block runs an N+1 pattern"""
+    detector = Detector(threshold)
+    with instrumentation.listen_queries(detector.record):
+        yield detector
+    if detector.problems():
+        raise NPlusOneError(detector.report(label))
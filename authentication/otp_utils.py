@@ -1,318 +1,142 @@
-import random
-import string
-from django.core.mail import send_mail, EmailMultiAlternatives
-from django.conf import settings
-from django.utils import timezone
-from datetime import timedelta
-from .models import OTPVerification
-
-def generate_otp():
-    """Generate a 6-digit OTP"""
-    return ''.join(random.choices(string.digits, k=6))
-
-def send_otp_email(user, otp_code, purpose='purchase_confirmation'):
-    """Send OTP via email with beautiful HTML template"""
-    subject = '🔐 KoraQuest - Your Verification Code'
-    
-    # Create HTML email template
-    if purpose == 'purchase_confirmation':
-        email_title = "Purchase Verification Required"
-        email_subtitle = "Please verify your identity to complete your purchase pickup"
-        action_text = "complete your purchase pickup"
-    else:
-        email_title = "Verification Required"
-        email_subtitle = "Please verify your identity"
-        action_text = "continue with your action"
-    
-    html_content = f"""
-    <!DOCTYPE html>
-    <html lang="en">
-    <head>
-        <meta charset="UTF-8">
-        <meta name="viewport" content="width=device-width, initial-scale=1.0">
-        <title>KoraQuest Verification</title>
-        <style>
-            * {{
-                margin: 0;
-                padding: 0;
-                box-sizing: border-box;
-            }}
-            body {{
-                font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
-                line-height: 1.6;
-                color: #333;
-                background-color: #f5f5f5;
-            }}
-            .email-container {{
-                max-width: 600px;
-                margin: 0 auto;
-                background-color: #ffffff;
-                border-radius: 12px;
-                overflow: hidden;
-                box-shadow: 0 10px 30px rgba(0, 0, 0, 0.1);
-            }}
-            .header {{
-                background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-                color: white;
-                padding: 40px 30px;
-                text-align: center;
-            }}
-            .header h1 {{
-                font-size: 28px;
-                font-weight: 700;
-                margin-bottom: 8px;
-            }}
-            .header p {{
-                font-size: 16px;
-                opacity: 0.9;
-                margin-bottom: 0;
-            }}
-            .content {{
-                padding: 40px 30px;
-            }}
-            .greeting {{
-                font-size: 18px;
-                font-weight: 600;
-                color: #2c3e50;
-                margin-bottom: 20px;
-            }}
-            .message {{
-                font-size: 16px;
-                color: #555;
-                margin-bottom: 30px;
-                line-height: 1.7;
-            }}
-            .otp-container {{
-                background: linear-gradient(135deg, #f093fb 0%, #f5576c 100%);
-                border-radius: 12px;
-                padding: 30px;
-                text-align: center;
-                margin: 30px 0;
-                border: 3px dashed #fff;
-                position: relative;
-            }}
-            .otp-label {{
-                color: white;
-                font-size: 14px;
-                font-weight: 600;
-                text-transform: uppercase;
-                letter-spacing: 1px;
-                margin-bottom: 15px;
-                opacity: 0.9;
-            }}
-            .otp-code {{
-                font-size: 36px;
-                font-weight: 800;
-                color: white;
-                letter-spacing: 8px;
-                margin: 0;
-                text-shadow: 0 2px 4px rgba(0, 0, 0, 0.3);
-                font-family: 'Courier New', monospace;
-            }}
-            .expiry-notice {{
-                background-color: #fff3cd;
-                border: 1px solid #ffeaa7;
-                border-radius: 8px;
-                padding: 15px 20px;
-                margin: 25px 0;
-                color: #856404;
-                font-size: 14px;
-                display: flex;
-                align-items: center;
-            }}
-            .expiry-notice::before {{
-                content: "⏰";
-                font-size: 18px;
-                margin-right: 10px;
-            }}
-            .security-notice {{
-                background-color: #e8f4fd;
-                border: 1px solid #b6d7ff;
-                border-radius: 8px;
-                padding: 15px 20px;
-                margin: 25px 0;
-                color: #0c5460;
-                font-size: 14px;
-                display: flex;
-                align-items: center;
-            }}
-            .security-notice::before {{
-                content: "🔒";
-                font-size: 18px;
-                margin-right: 10px;
-            }}
-            .footer {{
-                background-color: #f8f9fa;
-                padding: 30px;
-                text-align: center;
-                border-top: 1px solid #e9ecef;
-            }}
-            .footer p {{
-                color: #6c757d;
-                font-size: 14px;
-                margin-bottom: 10px;
-            }}
-            .brand {{
-                color: #667eea;
-                font-weight: 700;
-                font-size: 16px;
-                text-decoration: none;
-            }}
-            .divider {{
-                height: 1px;
-                background: linear-gradient(to right, transparent, #e9ecef, transparent);
-                margin: 25px 0;
-            }}
-            @media (max-width: 600px) {{
-                .email-container {{
-                    margin: 10px;
-                    border-radius: 8px;
-                }}
-                .header, .content, .footer {{
-                    padding: 25px 20px;
-                }}
-                .otp-code {{
-                    font-size: 28px;
-                    letter-spacing: 4px;
-                }}
-            }}
-        </style>
-    </head>
-    <body>
-        <div class="email-container">
-            <div class="header">
-                <h1>🛡️ KoraQuest</h1>
-                <p>{email_title}</p>
-            </div>
-            
-            <div class="content">
-                <div class="greeting">Hello {user.first_name or user.username}! 👋</div>
-                
-                <div class="message">
-                    {email_subtitle}. We've generated a secure verification code for you to {action_text}.
-                </div>
-                
-                <div class="otp-container">
-                    <div class="otp-label">Your Verification Code</div>
-                    <div class="otp-code">{otp_code}</div>
-                </div>
-                
-                <div class="expiry-notice">
-                    This verification code will expire in <strong>5 minutes</strong> for your security.
-                </div>
-                
-                <div class="security-notice">
-                    If you didn't request this verification code, please ignore this email. Never share your verification codes with anyone.
-                </div>
-                
-                <div class="divider"></div>
-                
-                <div class="message">
-                    Need help? Feel free to contact our support team. We're here to assist you!
-                </div>
-            </div>
-            
-            <div class="footer">
-                <p>This email was sent by <a href="#" class="brand">KoraQuest</a></p>
-                <p>Your trusted marketplace for secure transactions</p>
-                <p style="margin-top: 15px; font-size: 12px; color: #868e96;">
-                    © 2025 KoraQuest. All rights reserved.
-                </p>
-            </div>
-        </div>
-    </body>
-    </html>
-    """
-    
-    # Plain text version for email clients that don't support HTML
-    text_content = f"""
-    KoraQuest - {email_title}
-    
-    Hello {user.first_name or user.username}!
-    
-    {email_subtitle}. Your verification code is:
-    
-    {otp_code}
-    
-    This code will expire in 5 minutes.
-    
-    If you didn't request this code, please ignore this email.
-    
-    Best regards,
-    KoraQuest Team
-    """
-    
-    try:
-        # Create email with both HTML and plain text versions
-        email = EmailMultiAlternatives(
-            subject=subject,
-            body=text_content,
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            to=[user.email]
-        )
-        email.attach_alternative(html_content, "text/html")
-        email.send(fail_silently=False)
-        return True
-    except Exception as e:
-        print(f"Failed to send OTP email: {e}")
-        return False
-
-def create_otp(user, purpose='purchase_confirmation'):
-    """Create and send OTP to user"""
-    # Invalidate any existing unused OTPs for this user and purpose
-    OTPVerification.objects.filter(
-        user=user,
-        purpose=purpose,
-        is_used=False
-    ).update(is_used=True)
-    
-    # Generate new OTP
-    otp_code = generate_otp()
-    
-    # Create OTP record
-    otp = OTPVerification.objects.create(
-        user=user,
-        otp_code=otp_code,
-        purpose=purpose,
-        expires_at=timezone.now() + timedelta(minutes=5)
-    )
-    
-    # Send OTP via email
-    email_sent = send_otp_email(user, otp_code, purpose)
-    
-    return {
-        'otp_id': otp.id,
-        'email_sent': email_sent,
-        'expires_at': otp.expires_at
-    }
-
-def verify_otp(user, otp_code, purpose='purchase_confirmation'):
-    """Verify OTP code"""
-    try:
-        otp = OTPVerification.objects.get(
-            user=user,
-            otp_code=otp_code,
-            purpose=purpose,
-            is_used=False
-        )
-        
-        if otp.is_expired():
-            return {'valid': False, 'error': 'OTP has expired'}
-        
-        # Mark OTP as used
-        otp.is_used = True
-        otp.save()
-        
-        return {'valid': True, 'otp_id': otp.id}
-    
-    except OTPVerification.DoesNotExist:
-        return {'valid': False, 'error': 'Invalid OTP code'}
-
-def cleanup_expired_otps():
-    """Clean up expired OTPs (can be run as a cron job)"""
-    expired_otps = OTPVerification.objects.filter(
-        expires_at__lt=timezone.now()
-    )
-    count = expired_otps.count()
-    expired_otps.delete()
-    return count
+import secrets
+import string
+from functools import lru_cache
+from django.core.cache import caches
+from django.conf import settings
+from django.utils import timezone
+from django.utils.crypto import salted_hmac, constant_time_compare
+from datetime import timedelta
+from .mail_utils import build_email, send_email
+from .throttling import RateLimitExceeded, check_rate_limit
+
+def generate_otp():
+    """Generate a 6-digit OTP"""
+    return ''.join(secrets.choice(string.digits) for _ in range(6))
+
+def send_otp_email(user, otp_code, purpose='purchase_confirmation'):
+    """Send OTP via email with beautiful HTML template"""
+    subject = '🔐 KoraQuest - Your Verification Code'
+    
+    if purpose == 'purchase_confirmation':
+        email_title = "Purchase Verification Required"
+        email_subtitle = "Please verify your identity to complete your purchase pickup"
+        action_text = "complete your purchase pickup"
+    else:
+        email_title = "Verification Required"
+        email_subtitle = "Please verify your identity"
+        action_text = "continue with your action"
+    
+    try:
+        email = build_email(subject, [user.email], 'authentication/emails/otp_verification', {
+            'user': user,
+            'otp_code': otp_code,
+            'email_title': email_title,
+            'email_subtitle': email_subtitle,
+            'action_text': action_text,
+        })
+        # Delivered by the background mail worker over a pooled connection
+        return send_email(email)
+    except Exception as e:
+        print(f"Failed to send OTP email: {e}")
+        return False
+
+class CacheOTPStore:
+    """
+    OTP store backed by Django's cache framework.
+    
+    Codes live under one key per user and purpose with a native TTL, so
+    issuing a new code replaces the old one and expiry needs no cleanup.
+    Wrong guesses are counted with an atomic incr and a successful code is
+    consumed with an atomic add, so it can only be redeemed once.
+    """
+    
+    def __init__(self):
+        self.cache = caches[getattr(settings, 'OTP_CACHE_ALIAS', 'default')]
+        self.expiry_seconds = getattr(settings, 'OTP_EXPIRY_SECONDS', 300)
+        self.max_attempts = getattr(settings, 'OTP_MAX_ATTEMPTS', 5)
+    
+    def _key(self, user, purpose):
+        return f'otp:{purpose}:{user.pk}'
+    
+    def _hash(self, otp_id, otp_code):
+        # Codes are never stored in clear text
+        return salted_hmac('authentication.otp_utils.otp', f'{otp_id}:{otp_code}').hexdigest()
+    
+    def create(self, user, otp_code, purpose):
+        key = self._key(user, purpose)
+        otp_id = secrets.token_hex(8)
+        expires_at = timezone.now() + timedelta(seconds=self.expiry_seconds)
+        
+        self.cache.set_many({
+            key: {'otp_id': otp_id, 'code_hash': self._hash(otp_id, otp_code), 'expires_at': expires_at},
+            f'{key}:attempts': 0,
+        }, timeout=self.expiry_seconds)
+        
+        return otp_id, expires_at
+    
+    def verify(self, user, otp_code, purpose):
+        key = self._key(user, purpose)
+        record = self.cache.get(key)
+        if record is None:
+            return {'valid': False, 'error': 'Invalid OTP code'}
+        
+        if record['expires_at'] <= timezone.now():
+            return {'valid': False, 'error': 'OTP has expired'}
+        
+        if not constant_time_compare(record['code_hash'], self._hash(record['otp_id'], otp_code)):
+            try:
+                attempts = self.cache.incr(f'{key}:attempts')
+            except ValueError:
+                attempts = self.max_attempts
+            if attempts >= self.max_attempts:
+                self.cache.delete_many([key, f'{key}:attempts'])
+                return {'valid': False, 'error': 'Too many attempts. Please request a new code.'}
+            return {'valid': False, 'error': 'Invalid OTP code'}
+        
+        # Only the first concurrent request to claim this code succeeds
+        if not self.cache.add(f'{key}:used:{record["otp_id"]}', True, timeout=self.expiry_seconds):
+            return {'valid': False, 'error': 'Invalid OTP code'}
+        self.cache.delete_many([key, f'{key}:attempts'])
+        
+        return {'valid': True, 'otp_id': record['otp_id']}
+    
+    def cleanup(self):
+        # Entries expire through the cache TTL
+        return 0
+
+
+@lru_cache(maxsize=None)
+def get_otp_store():
+    """Return the process-wide OTP store"""
+    return CacheOTPStore()
+
+def create_otp(user, purpose='purchase_confirmation'):
+    """
+    Create and send OTP to user.
+    Raises RateLimitExceeded when the user has requested too many codes
+    (RATE_LIMITS['otp']), so a client cannot flood the mail worker.
+    """
+    wait = check_rate_limit('otp', {'user': f"user:{user.pk}"})
+    if wait:
+        raise RateLimitExceeded(wait)
+    
+    # Generate new OTP; storing it replaces any previous code for this purpose
+    otp_code = generate_otp()
+    otp_id, expires_at = get_otp_store().create(user, otp_code, purpose)
+    
+    # Send OTP via email
+    email_sent = send_otp_email(user, otp_code, purpose)
+    
+    return {
+        'otp_id': otp_id,
+        'email_sent': email_sent,
+        'expires_at': expires_at
+    }
+
+def verify_otp(user, otp_code, purpose='purchase_confirmation'):
+    """Verify OTP code"""
+    return get_otp_store().verify(user, otp_code, purpose)
+
+def cleanup_expired_otps():
+    """Kept for existing cron jobs; codes expire through the cache TTL, so nothing is removed"""
+    return get_otp_store().cleanup()
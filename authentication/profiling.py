@@ -0,0 +1,276 @@
+"""
+On-demand profiling of single requests.
+
+A store admin opens /profiles/ and asks for a profiling token: a signed,
+time-limited value naming them. A request that carries it in an
+`X-Profile: <token>` header runs under cProfile with its queries recorded
+(instrumentation.listen_queries), as long as the user it names is still an
+active admin. The token is only accepted as a header, never in the URL, so it
+does not end up in access logs, browser history or Referer headers. The
+result is saved to the PROFILING_CACHE_ALIAS cache, so every worker's
+profiles show up in the same viewer. The response gets an `X-Profile` header
+pointing at it. A saved profile holds:
+
+    - the time split by where it was spent: ORM and database, templates,
+      serialization (DRF and JSON), PDF rendering (ReportLab), our own code
+      and everything else
+    - the top functions by cumulative time, as pstats prints them
+    - every query with its duration, in order
+    - the raw profile, downloadable for pstats or snakeviz
+
+Profiling is off unless PROFILING_ENABLED is set. When it is on,
+ProfilingMiddleware costs one header lookup on other requests. cProfile only
+follows the request's own thread, so work done in a thread pool (the
+ASYNC_VIEWS catalog queries) shows up as time waiting for it.
+Profiles are numbered in the order they are saved and the last
+PROFILING_KEEP are listed; older ones expire after PROFILING_TIMEOUT seconds.
+"""
+
+import cProfile
+import functools
+import io
+import logging
+import marshal
+import pstats
+import shlex
+import time
+
+from django.conf import settings
+from django.contrib import messages
+from django.contrib.auth.decorators import login_required
+from django.core import signing
+from django.core.cache import caches
+from django.http import Http404, HttpResponse
+from django.shortcuts import redirect, render
+from django.utils import timezone
+
+from .cache_utils import incr_counter
+from .models import User
+
+logger = logging.getLogger(__name__)
+
+TOKEN_SALT = 'authentication.profiling'
+HEADER = 'HTTP_X_PROFILE'
+SEQ_KEY = 'profiling:seq'
+MAX_QUERIES = 1000
+STATS_LINES = 60
+
+# Where the time went, matched against each function's file (first match wins)
+CATEGORIES = [
+    ('ORM and database', ('/django/db/', '/psycopg', 'sqlite3')),
+    ('Templates', ('/django/template/', '/templatetags/')),
+    ('Serialization', ('/rest_framework/serializers', '/rest_framework/fields', '/rest_framework/renderers',
+                       '/json/', 'json_utils', '_json', 'orjson')),
+    ('PDF (ReportLab)', ('/reportlab/',)),
+]
+APP_CODE = 'KoraQuest code'
+OTHER = 'Other'
+
+
+def profiling_enabled():
+    return getattr(settings, 'PROFILING_ENABLED', False)
+
+
+def _cache():
+    return caches[getattr(settings, 'PROFILING_CACHE_ALIAS', 'default')]
+
+
+def _timeout():
+    return getattr(settings, 'PROFILING_TIMEOUT', 86400)
+
+
+def _entry_key(number):
+    return f'profiling:entry:{number}'
+
+
+def _raw_key(number):
+    return f'profiling:raw:{number}'
+
+
+# ============================================
+# TOKENS
+# ============================================
+
+def make_token(user):
+    return signing.TimestampSigner(salt=TOKEN_SALT).sign(str(user.pk))
+
+
+def token_user_id(token):
+    """
+    The id of the admin a valid, unexpired token was issued to, or None.
+    The user is looked up on every use, so an admin who is demoted or
+    deactivated stops profiling at once rather than when the token expires.
+    """
+    max_age = getattr(settings, 'PROFILING_TOKEN_MAX_AGE', 3600)
+    try:
+        user_id = int(signing.TimestampSigner(salt=TOKEN_SALT).unsign(token, max_age=max_age))
+    except (signing.BadSignature, ValueError):
+        return None
+    if not User.objects.filter(pk=user_id, is_active=True, role='admin').exists():
+        return None
+    return user_id
+
+
+def requested_token(request):
+    """The profiling token sent in the X-Profile header, if any"""
+    return request.META.get(HEADER) or None
+
+
+# ============================================
+# CAPTURE
+# ============================================
+
+def _category(filename, function, base_dir):
+    location = filename if filename != '~' else function
+    for name, patterns in CATEGORIES:
+        if any(pattern in location for pattern in patterns):
+            return name
+    if filename.startswith(base_dir) and 'site-packages' not in filename:
+        return APP_CODE
+    return None
+
+
+def time_by_category(stats):
+    """{category: seconds} of the profile's own time (tottime) per function"""
+    base_dir = str(settings.BASE_DIR)
+    totals = dict.fromkeys([name for name, _ in CATEGORIES] + [APP_CODE, OTHER], 0.0)
+    for (filename, line, function), (cc, nc, tottime, cumtime, callers) in stats.stats.items():
+        category = _category(filename, function, base_dir)
+        if category is None and filename == '~' and callers:
+            # Built-ins (list.sort, str.join, ...) count towards their main caller
+            caller = max(callers, key=lambda key: callers[key][3])
+            category = _category(caller[0], caller[2], base_dir)
+        totals[category or OTHER] += tottime
+    return totals
+
+
+class ProfileRun:
+    """
+    cProfile and the query list for one request. The profiler runs inside the
+    `with` block; queries are fed to record_query through listen_queries.
+    """
+
+    def __init__(self):
+        self.profiler = cProfile.Profile()
+        self.queries = []
+        self.query_count = 0
+        self.duration = 0.0
+
+    def record_query(self, sql, duration):
+        self.query_count += 1
+        if len(self.queries) < MAX_QUERIES:
+            self.queries.append((sql, duration))
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        self.profiler.enable()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.profiler.disable()
+        self.duration = time.perf_counter() - self._started
+
+    def save(self, request, response, user_id):
+        """Store the profile and return its number"""
+        stats = pstats.Stats(self.profiler, stream=io.StringIO())
+        stats.sort_stats('cumulative').print_stats(STATS_LINES)
+
+        cache = _cache()
+        number = incr_counter(cache, SEQ_KEY, 1)
+        entry = {
+            'number': number,
+            'created_at': timezone.now(),
+            'user_id': user_id,
+            'method': request.method,
+            'path': request.get_full_path(),
+            'status': response.status_code,
+            'duration': self.duration,
+            'db_time': sum(duration for _, duration in self.queries),
+            'query_count': self.query_count,
+            'queries': self.queries,
+            'categories': time_by_category(stats),
+            'stats': stats.stream.getvalue(),
+        }
+        cache.set(_entry_key(number), entry, timeout=_timeout())
+        cache.set(_raw_key(number), marshal.dumps(stats.stats), timeout=_timeout())
+        return number
+
+
+# ============================================
+# VIEWER
+# ============================================
+
+def _admin_only(view):
+    @functools.wraps(view)
+    @login_required
+    def wrapped(request, *args, **kwargs):
+        if not profiling_enabled():
+            raise Http404
+        if not request.user.is_admin:
+            messages.error(request, 'Access denied. Admin role required.')
+            return redirect('dashboard')
+        return view(request, *args, **kwargs)
+    return wrapped
+
+
+def _entry(number):
+    entry = _cache().get(_entry_key(number))
+    if entry is None:
+        raise Http404('Profile not found or expired')
+    return entry
+
+
+@_admin_only
+def profile_list(request):
+    """Recent profiles, and a token to profile another request with"""
+    cache = _cache()
+    last = cache.get(SEQ_KEY, 0)
+    keep = getattr(settings, 'PROFILING_KEEP', 50)
+    numbers = range(last, max(last - keep, 0), -1)
+    found = cache.get_many([_entry_key(number) for number in numbers])
+    profiles = [found[_entry_key(number)] for number in numbers if _entry_key(number) in found]
+
+    token = make_token(request.user)
+    path = request.GET.get('path', '').strip()
+    profile_command = None
+    if path.startswith('/'):
+        url = request.build_absolute_uri(path)
+        profile_command = f'curl -H {shlex.quote(f"X-Profile: {token}")} {shlex.quote(url)}'
+
+    return render(request, 'authentication/profiles.html', {
+        'profiles': profiles,
+        'token': token,
+        'path': path,
+        'profile_command': profile_command,
+        'token_max_age': getattr(settings, 'PROFILING_TOKEN_MAX_AGE', 3600) // 60,
+    })
+
+
+@_admin_only
+def profile_detail(request, number):
+    """One profile: time by category, slowest functions and every query"""
+    entry = _entry(number)
+    total = sum(entry['categories'].values()) or 1
+    categories = [
+        {'name': name, 'seconds': seconds, 'percent': seconds / total * 100}
+        for name, seconds in entry['categories'].items()
+    ]
+    queries = [(sql, duration * 1000) for sql, duration in entry['queries']]
+    if request.GET.get('sort') == 'slowest':
+        queries.sort(key=lambda query: -query[1])
+    return render(request, 'authentication/profile_detail.html', {
+        'profile': entry,
+        'categories': categories,
+        'queries': queries,
+    })
+
+
+@_admin_only
+def profile_download(request, number):
+    """The raw profile, for `python -m pstats` or snakeviz"""
+    raw = _cache().get(_raw_key(number))
+    if raw is None:
+        raise Http404('Profile not found or expired')
+    response = HttpResponse(raw, content_type='application/octet-stream')
+    response['Content-Disposition'] = f'attachment; filename="profile-{number}.prof"'
+    return response
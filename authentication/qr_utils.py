@@ -1,154 +1,323 @@
 import qrcode
+import qrcode.image.svg
 import io
 import base64
 import json
-import jwt
-from datetime import datetime, timedelta
+import hashlib
+import struct
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone as dt_timezone
 from django.conf import settings
-from django.core.files.base import ContentFile
 from django.utils import timezone
-from .models import UserQRCode, Purchase
+from django.utils.crypto import salted_hmac, constant_time_compare
+from .models import Purchase, User
 
-def generate_user_qr_data(user):
-    """Generate QR data for a user including their purchases"""
-    # Get user's pending/awaiting pickup and delivery purchases
-    pending_purchases = Purchase.objects.filter(
-        buyer=user, 
-        status__in=['awaiting_pickup', 'awaiting_delivery']
-    ).select_related('product')
-    
-    # Prepare data for QR code
-    qr_data = {
-        'user_id': user.id,
-        'username': user.username,
-        'timestamp': timezone.now().isoformat(),
-        'purchases': []
-    }
+QR_IMAGE_CONTENT_TYPES = {
+    'png': 'image/png',
+    'svg': 'image/svg+xml',
+}
+
+class QRImageCache:
+    """Thread-safe LRU of rendered QR images keyed by a hash of the payload"""
     
-    for purchase in pending_purchases:
-        qr_data['purchases'].append({
-            'id': purchase.id,
-            'order_id': purchase.order_id,
-            'product_name': purchase.product.title,
-            'quantity': purchase.quantity,
-            'price': str(purchase.purchase_price),
-            'vendor_name': purchase.product.user.username
-        })
-    
-    # Create JWT token that expires in 10 minutes
-    token_data = {
-        'qr_data': qr_data,
-        'exp': datetime.utcnow() + timedelta(minutes=10),
-        'iat': datetime.utcnow()
-    }
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key):
+        with self._lock:
+            content = self._entries.get(key)
+            if content is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return content
+    
+    def set(self, key, content):
+        with self._lock:
+            self._entries[key] = content
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
     
-    # Use Django secret key for JWT encoding
-    token = jwt.encode(token_data, settings.SECRET_KEY, algorithm='HS256')
-    return token
+    def __len__(self):
+        return len(self._entries)
 
-def create_qr_image(data):
-    """Create QR code image from data"""
+qr_image_cache = QRImageCache(maxsize=getattr(settings, 'QR_CODE_CACHE_SIZE', 256))
+
+def current_qr_window():
+    """
+    Return the (start, end) of the current QR refresh window.
+    Tokens issued within one window are identical for the same purchases,
+    which is what lets rendered images be reused from the cache.
+    """
+    interval = getattr(settings, 'QR_CODE_UPDATE_INTERVAL', 600)
+    now = int(timezone.now().timestamp())
+    start = now - (now % interval)
+    return (
+        datetime.fromtimestamp(start, tz=dt_timezone.utc),
+        datetime.fromtimestamp(start + interval, tz=dt_timezone.utc),
+    )
+
+def qr_token_expiry():
+    """
+    Expiry for tokens issued in the current window: one full interval after it
+    ends, so a code shown just before the window turns still scans at the
+    counter. Every token of a window shares it, keeping tokens and images
+    identical within the window.
+    """
+    interval = getattr(settings, 'QR_CODE_UPDATE_INTERVAL', 600)
+    return current_qr_window()[1] + timedelta(seconds=interval)
+
+# Purchases that can be collected or handed over with the customer's QR code
+QR_PURCHASE_STATUSES = ['pending', 'processing']
+
+QR_TOKEN_VERSION = 1
+QR_TOKEN_MAC_LENGTH = 10
+QR_TOKEN_HMAC_SALT = 'authentication.qr_utils.qr_token'
+
+# RFC 9285 alphabet: every character is valid in QR alphanumeric mode
+BASE45_ALPHABET = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ $%*+-./:'
+BASE45_INDEX = {char: index for index, char in enumerate(BASE45_ALPHABET)}
+
+def base45_encode(data):
+    """Encode bytes as Base45 text (RFC 9285)"""
+    chars = []
+    for i in range(0, len(data) - 1, 2):
+        value = data[i] * 256 + data[i + 1]
+        value, c = divmod(value, 45)
+        e, d = divmod(value, 45)
+        chars.extend(BASE45_ALPHABET[x] for x in (c, d, e))
+    if len(data) % 2:
+        d, c = divmod(data[-1], 45)
+        chars.extend(BASE45_ALPHABET[x] for x in (c, d))
+    return ''.join(chars)
+
+def base45_decode(text):
+    """Decode Base45 text (RFC 9285), raising ValueError on malformed input"""
     try:
-        qr = qrcode.QRCode(
-            version=1,
-            error_correction=qrcode.constants.ERROR_CORRECT_L,
-            box_size=10,
-            border=4,
-        )
+        values = [BASE45_INDEX[char] for char in text]
+    except KeyError:
+        raise ValueError('Invalid Base45 character')
+    if len(values) % 3 == 1:
+        raise ValueError('Invalid Base45 length')
+    
+    data = bytearray()
+    for i in range(0, len(values), 3):
+        chunk = values[i:i + 3]
+        if len(chunk) == 3:
+            value = chunk[0] + chunk[1] * 45 + chunk[2] * 45 * 45
+            if value > 0xFFFF:
+                raise ValueError('Invalid Base45 chunk')
+            data.extend(divmod(value, 256))
+        else:
+            value = chunk[0] + chunk[1] * 45
+            if value > 0xFF:
+                raise ValueError('Invalid Base45 chunk')
+            data.append(value)
+    return bytes(data)
+
+def _write_varint(value, buffer):
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            buffer.append(byte | 0x80)
+        else:
+            buffer.append(byte)
+            return
+
+def _read_varint(data, offset):
+    value = 0
+    shift = 0
+    while True:
+        if offset >= len(data) or shift > 63:
+            raise ValueError('Truncated varint')
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return value, offset
+        shift += 7
+
+def _token_mac(body):
+    return salted_hmac(QR_TOKEN_HMAC_SALT, body, algorithm='sha256').digest()[:QR_TOKEN_MAC_LENGTH]
+
+def encode_qr_token(user_id, purchase_ids, expires_at):
+    """
+    Build a compact signed QR token.
+
+    Layout: version byte, expiry (uint32 seconds), user ID and the
+    delta-encoded sorted purchase IDs as varints, then a truncated
+    HMAC-SHA256. The result is Base45 text so the QR code can use
+    alphanumeric mode.
+    """
+    body = bytearray(struct.pack('>BI', QR_TOKEN_VERSION, int(expires_at.timestamp())))
+    _write_varint(user_id, body)
+    purchase_ids = sorted(set(purchase_ids))
+    _write_varint(len(purchase_ids), body)
+    previous = 0
+    for purchase_id in purchase_ids:
+        _write_varint(purchase_id - previous, body)
+        previous = purchase_id
+    return base45_encode(bytes(body) + _token_mac(bytes(body)))
+
+def parse_qr_token(token):
+    """
+    Verify and unpack a compact QR token.
+    Returns a dict with user_id, purchase_ids and expires_at, or raises
+    ValueError describing why the token was rejected.
+    """
+    raw = base45_decode(token.strip())
+    if len(raw) < 5 + QR_TOKEN_MAC_LENGTH:
+        raise ValueError('Invalid QR code format')
+    
+    body, mac = raw[:-QR_TOKEN_MAC_LENGTH], raw[-QR_TOKEN_MAC_LENGTH:]
+    if not constant_time_compare(mac, _token_mac(body)):
+        raise ValueError('Invalid QR code signature')
+    
+    version, expiry = struct.unpack_from('>BI', body)
+    if version != QR_TOKEN_VERSION:
+        raise ValueError('Unsupported QR code version')
+    
+    user_id, offset = _read_varint(body, 5)
+    count, offset = _read_varint(body, offset)
+    purchase_ids = []
+    previous = 0
+    for _ in range(count):
+        delta, offset = _read_varint(body, offset)
+        previous += delta
+        purchase_ids.append(previous)
+    if offset != len(body):
+        raise ValueError('Invalid QR code format')
+    
+    expires_at = datetime.fromtimestamp(expiry, tz=dt_timezone.utc)
+    if expires_at <= timezone.now():
+        raise ValueError('QR code has expired')
+    
+    return {
+        'user_id': user_id,
+        'purchase_ids': purchase_ids,
+        'expires_at': expires_at,
+    }
+
+def generate_user_qr_data(user):
+    """Generate a compact signed QR token for a user's open purchases"""
+    purchase_ids = Purchase.objects.filter(
+        buyer=user,
+        status__in=QR_PURCHASE_STATUSES
+    ).values_list('id', flat=True)
+    
+    return encode_qr_token(user.id, purchase_ids, qr_token_expiry())
+
+def _render_qr(data, image_format):
+    qr = qrcode.QRCode(
+        version=1,
+        error_correction=qrcode.constants.ERROR_CORRECT_L,
+        box_size=10,
+        border=4,
+    )
+    if isinstance(data, str) and all(char in BASE45_INDEX for char in data):
+        # Compact tokens are pure alphanumeric, which packs 5.5 bits per character
+        qr.add_data(qrcode.util.QRData(data, mode=qrcode.util.MODE_ALPHA_NUM))
+    else:
         qr.add_data(data)
-        qr.make(fit=True)
-        
-        # Create image
-        img = qr.make_image(fill_color="black", back_color="white")
-        
-        # Convert to bytes using a context manager
+    qr.make(fit=True)
+    
+    if image_format == 'svg':
+        img = qr.make_image(image_factory=qrcode.image.svg.SvgPathImage)
         with io.BytesIO() as buffer:
-            img.save(buffer, format='PNG')
-            buffer.seek(0)
-            image_content = buffer.getvalue()
-            
-        # Generate a unique filename that's platform-independent
-        filename = f'qr_code_{datetime.now().strftime("%Y%m%d_%H%M%S")}.png'
-        return ContentFile(image_content, name=filename)
-    except Exception as e:
-        print(f"Error creating QR image: {str(e)}")
-        import traceback
-        traceback.print_exc()
-        raise IOError(f"Failed to create QR code image: {str(e)}")
-
-def update_user_qr_code(user):
-    """Update or create QR code for user"""
-    try:
-        qr_data = generate_user_qr_data(user)
-        qr_image = create_qr_image(qr_data)
-        
-        # Get or create user QR code with expires_at set for new records
-        expires_at = timezone.now() + timedelta(minutes=10)
-        user_qr, created = UserQRCode.objects.get_or_create(
-            user=user,
-            defaults={'expires_at': expires_at}
-        )
-        
-        # Update the QR code
-        # Use a unique filename based on timestamp
-        filename = f'qr_{user.username}_{timezone.now().strftime("%Y%m%d_%H%M%S")}.png'
-        
-        # Clear old image if it exists
-        if user_qr.qr_image:
-            try:
-                user_qr.qr_image.delete(save=False)
-            except Exception as e:
-                print(f"Warning: Could not delete old QR image: {str(e)}")
-        
-        # Save new image
-        user_qr.qr_data = qr_data
-        user_qr.qr_image.save(filename, qr_image, save=False)
-        user_qr.expires_at = expires_at
-        user_qr.save()
-        
-        return user_qr
-    except Exception as e:
-        print(f"Error updating QR code: {str(e)}")
-        import traceback
-        traceback.print_exc()
-        raise IOError(f"Failed to update QR code: {str(e)}")
+            img.save(buffer)
+            return buffer.getvalue()
+    
+    img = qr.make_image(fill_color="black", back_color="white")
+    with io.BytesIO() as buffer:
+        img.save(buffer, format='PNG')
+        return buffer.getvalue()
+
+def render_qr_image(data, image_format='png'):
+    """
+    Render QR code image bytes for the given payload, entirely in memory.
+    Returns a tuple of (content, content_type). Repeated payloads are served
+    from an LRU keyed by the SHA-256 of the payload.
+    """
+    image_format = image_format.lower()
+    if image_format not in QR_IMAGE_CONTENT_TYPES:
+        raise ValueError(f"Unsupported QR image format: {image_format}")
+    
+    payload = data if isinstance(data, bytes) else str(data).encode('utf-8')
+    key = (hashlib.sha256(payload).hexdigest(), image_format)
+    
+    content = qr_image_cache.get(key)
+    if content is None:
+        try:
+            content = _render_qr(data, image_format)
+        except Exception as e:
+            raise IOError(f"Failed to create QR code image: {str(e)}")
+        qr_image_cache.set(key, content)
+    
+    return content, QR_IMAGE_CONTENT_TYPES[image_format]
+
+def create_qr_image(data):
+    """Create QR code PNG as a base64 data URI for inline embedding"""
+    content, content_type = render_qr_image(data, 'png')
+    return f"data:{content_type};base64,{base64.b64encode(content).decode('ascii')}"
 
 def decode_qr_data(token):
     """Decode QR code token and return user data"""
     try:
-        # Log token info for debugging
-        print(f"Decoding QR token of length {len(token)}")
-        print(f"Token prefix: {token[:20]}...")
-        
-        # Check if token looks like a JWT (3 parts separated by dots)
-        parts = token.split('.')
-        if len(parts) != 3:
-            print(f"Token doesn't look like a valid JWT - found {len(parts)} parts instead of 3")
-            return {'error': 'Invalid QR code format'}
-            
-        try:
-            # Try to decode the JWT
-            decoded_data = jwt.decode(token, settings.SECRET_KEY, algorithms=['HS256'])
-            
-            # Validate expected structure
-            if 'qr_data' not in decoded_data:
-                print("JWT decoded but missing 'qr_data' key")
-                return {'error': 'QR data structure is invalid'}
-            
-            print("=================== Successfully decoded QR token =====================")
-            print(decoded_data['qr_data'])
-            return decoded_data['qr_data']
-        except jwt.ExpiredSignatureError:
-            print("JWT signature has expired")
-            return {'error': 'QR code has expired'}
-        except jwt.InvalidTokenError as e:
-            print(f"Invalid JWT token: {str(e)}")
-            return {'error': 'Invalid QR code signature'}
-    except Exception as e:
-        print(f"Unexpected error decoding QR token: {str(e)}")
-        import traceback
-        traceback.print_exc()
-        return {'error': f'Error processing QR code: {str(e)}'}
+        token_data = parse_qr_token(token)
+    except ValueError as e:
+        return {'error': str(e)}
+    
+    # One indexed lookup resolves every purchase with its buyer, product and vendor
+    purchases = list(
+        Purchase.objects.filter(
+            id__in=token_data['purchase_ids'],
+            buyer_id=token_data['user_id']
+        ).select_related('buyer', 'product', 'product__user').order_by('id')
+    )
+    
+    if purchases:
+        username = purchases[0].buyer.username
+    else:
+        username = User.objects.filter(id=token_data['user_id']).values_list('username', flat=True).first()
+        if username is None:
+            return {'error': 'QR code user not found'}
+    
+    # Tokens expire one interval after the end of the window they were issued in
+    interval = getattr(settings, 'QR_CODE_UPDATE_INTERVAL', 600)
+    issued_at = datetime.fromtimestamp(token_data['expires_at'].timestamp() - 2 * interval, tz=dt_timezone.utc)
+    
+    return {
+        'user_id': token_data['user_id'],
+        'username': username,
+        'timestamp': issued_at.isoformat(),
+        'expires_at': token_data['expires_at'].isoformat(),
+        'purchases': [
+            {
+                'id': purchase.id,
+                'order_id': purchase.order_id,
+                'product_name': purchase.product.title,
+                'quantity': purchase.quantity,
+                'price': str(purchase.purchase_price),
+                'status': purchase.status,
+                'vendor_name': purchase.product.user.username if purchase.product.user else ''
+            }
+            for purchase in purchases
+        ]
+    }
 
 def get_user_purchases_from_qr(qr_data):
     """Extract purchase information from QR data"""
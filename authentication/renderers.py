@@ -0,0 +1,22 @@
+from rest_framework.renderers import JSONRenderer
+
+from .json_utils import dumps, use_orjson
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer that encodes through json_utils.dumps (orjson when available).
+    Indented output (`Accept: application/json; indent=4`) and the 'stdlib'
+    backend go through the parent class unchanged.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+
+        if not use_orjson() or self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        ret = dumps(data, self.encoder_class)
+        # Keep DRF's guarantee that output is a strict JavaScript subset
+        return ret.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
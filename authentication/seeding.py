@@ -0,0 +1,371 @@
+"""
+Synthetic store data for benchmarks and load tests.
+
+StoreSeeder generates customers and store admins, products, gallery images,
+purchases, reviews, likes and bookmarks, and writes them with bulk_create in
+large batches inside one transaction. save() and the model signals are
+bypassed, so the denormalised counters (Post.total_purchases,
+Post.like_count, User.total_purchases) are filled in with one UPDATE each at
+the end.
+
+Rows are generated in chunks of CHUNK_SIZE, each with its own random
+generator derived from the seed, so a seed always produces the same data
+(with timestamps relative to the time of seeding) whether the chunks are
+generated in this process or by `workers` forked processes. Only generation is parallel; all writes go through this process's
+database connection.
+
+Activity is skewed towards hot products and power users: an item is picked at
+index int(n * random() ** skew) of a shuffled list, so skew 1 is uniform and
+larger values concentrate activity. With the defaults the top 1% of products
+get about a fifth of all purchases, likes and reviews, and the top 1% of
+customers make about a tenth of them.
+"""
+
+import multiprocessing
+import random
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone as dt_timezone
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from .models import Bookmark, Post, PostLike, ProductImage, ProductReview, Purchase, User
+
+DEFAULT_VOLUMES = {
+    'customers': 20_000,
+    'admins': 10,
+    'products': 100_000,
+    'images': 50_000,
+    'purchases': 1_000_000,
+    'likes': 500_000,
+    'reviews': 500_000,
+    'bookmarks': 500_000,
+}
+
+CHUNK_SIZE = 50_000
+DEFAULT_PASSWORD = 'seed-pass-123'
+DELIVERY_FEE = Decimal('5.00')
+YEAR = 365 * 86400
+RECENT = 14 * 86400  # orders younger than this are still in progress
+
+TITLE_STYLES = ['Classic', 'Urban', 'Trail', 'Court', 'Street', 'Heritage', 'Coastal', 'Summit']
+TITLE_KINDS = ['Runner', 'Boot', 'Loafer', 'Slide', 'Trainer', 'Sandal', 'Oxford', 'High-Top']
+DESCRIPTION = 'Comfortable everyday shoe with a cushioned sole and breathable lining. '
+REVIEW_COMMENTS = ['', '', 'Great fit.', 'Runs small.', 'Very comfortable, would buy again.', 'Arrived quickly.']
+CATEGORIES = [code for code, _ in Post.CATEGORY_CHOICES]
+PAYMENT_METHODS = [code for code, _ in Purchase.PAYMENT_METHOD_CHOICES]
+OPEN_STATUSES = ['pending', 'processing', 'shipped']
+CLOSED_STATUSES = ['completed', 'completed', 'completed', 'delivered', 'cancelled']
+
+
+def scaled_volumes(scale, volumes=None):
+    """`volumes` (default DEFAULT_VOLUMES) multiplied by `scale`, at least 1 of each"""
+    return {name: max(1, int(count * scale)) for name, count in (volumes or DEFAULT_VOLUMES).items()}
+
+
+def is_seeded(prefix):
+    """Whether users generated with this username prefix exist"""
+    return User.objects.filter(username__startswith=f'{prefix}_').exists()
+
+
+def _datetime(timestamp):
+    return datetime.fromtimestamp(timestamp, tz=dt_timezone.utc)
+
+
+@contextmanager
+def explicit_timestamps(*models):
+    """Let bulk_create keep generated values for auto_now/auto_now_add fields"""
+    saved = []
+    for model in models:
+        for field in model._meta.concrete_fields:
+            if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False):
+                saved.append((field, field.auto_now, field.auto_now_add))
+                field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+# ============================================
+# ROW GENERATION
+# Runs in worker processes: plain tuples only, no database access
+# ============================================
+
+_shared = {}
+
+
+def _init_worker(shared):
+    _shared.clear()
+    _shared.update(shared)
+
+
+def _pick(rng, items, skew):
+    return items[int(len(items) * rng.random() ** skew)]
+
+
+def _after(rng, timestamp):
+    """A random moment between `timestamp` and now"""
+    return timestamp + (_shared['now'] - timestamp) * rng.random()
+
+
+def _product_rows(rng, start, count):
+    now = _shared['now']
+    rows = []
+    for i in range(start, start + count):
+        created = now - YEAR * rng.random()
+        stock = rng.random()
+        rows.append((
+            f'{rng.choice(TITLE_STYLES)} {rng.choice(TITLE_KINDS)} {i}',
+            DESCRIPTION * rng.randint(1, 4),
+            f'posts/seed_{i % 50}.jpg',
+            rng.randint(5, 300) * 1000,
+            rng.choice(CATEGORIES),
+            # Mostly in stock, some running low, a few sold out
+            0 if stock < 0.05 else rng.randint(1, 5) if stock < 0.15 else rng.randint(6, 200),
+            rng.choice(_shared['admins']),
+            created,
+            _after(rng, created),
+        ))
+    return rows
+
+
+def _purchase_rows(rng, start, count):
+    now = _shared['now']
+    rows = []
+    for number in range(start, start + count):
+        product_id, product_created, price = _pick(rng, _shared['products'], _shared['product_skew'])
+        created = _after(rng, product_created)
+        rows.append((
+            number,
+            _pick(rng, _shared['customers'], _shared['user_skew']),
+            product_id,
+            rng.choice((1, 1, 1, 2, 3)),
+            price,
+            rng.choice(OPEN_STATUSES if now - created < RECENT else CLOSED_STATUSES),
+            'delivery' if rng.random() < 0.4 else 'pickup',
+            rng.choice(PAYMENT_METHODS),
+            created,
+            _after(rng, created),
+        ))
+    return rows
+
+
+def _pair_rows(rng, start, count):
+    """(product, customer, created, rating, comment) for likes, reviews and bookmarks"""
+    rows = []
+    for _ in range(count):
+        product_id, product_created, _ = _pick(rng, _shared['products'], _shared['product_skew'])
+        rows.append((
+            product_id,
+            _pick(rng, _shared['customers'], _shared['user_skew']),
+            _after(rng, product_created),
+            rng.choice((1, 2, 3, 4, 4, 5, 5, 5)),
+            rng.choice(REVIEW_COMMENTS),
+        ))
+    return rows
+
+
+GENERATORS = {
+    'products': _product_rows,
+    'purchases': _purchase_rows,
+    'likes': _pair_rows,
+    'reviews': _pair_rows,
+    'bookmarks': _pair_rows,
+}
+
+
+def _generate(task):
+    table, chunk, start, count = task
+    rng = random.Random(f"{_shared['seed']}:{table}:{chunk}")
+    return GENERATORS[table](rng, start, count)
+
+
+# ============================================
+# SEEDER
+# ============================================
+
+class StoreSeeder:
+    def __init__(self, volumes=None, seed=42, prefix='seed', password=DEFAULT_PASSWORD,
+                 product_skew=3.0, user_skew=2.0, workers=1, batch_size=5000, stdout=None):
+        self.volumes = {**DEFAULT_VOLUMES, **(volumes or {})}
+        self.random_seed = seed
+        self.rng = random.Random(seed)
+        self.prefix = prefix
+        self.password = password
+        self.product_skew = product_skew
+        self.user_skew = user_skew
+        self.workers = workers
+        self.batch_size = batch_size
+        self.stdout = stdout
+        self.now = time.time()
+
+    def log(self, message):
+        if self.stdout is not None:
+            self.stdout.write(message)
+
+    def generate(self, table, total, shared, first_chunk=0):
+        """Generate `total` rows of `table`, yielding them chunk by chunk in order"""
+        tasks = [
+            (table, first_chunk + index, start, min(CHUNK_SIZE, total - start))
+            for index, start in enumerate(range(0, total, CHUNK_SIZE))
+        ]
+        shared = {
+            'seed': self.random_seed, 'now': self.now,
+            'product_skew': self.product_skew, 'user_skew': self.user_skew, **shared,
+        }
+        if self.workers > 1 and len(tasks) > 1 and 'fork' in multiprocessing.get_all_start_methods():
+            # Forked workers inherit the loaded models; they never touch the database
+            context = multiprocessing.get_context('fork')
+            with context.Pool(min(self.workers, len(tasks)), _init_worker, (shared,)) as pool:
+                yield from pool.imap(_generate, tasks)
+        else:
+            _init_worker(shared)
+            for task in tasks:
+                yield _generate(task)
+
+    def insert(self, model, rows):
+        model.objects.bulk_create(rows, batch_size=self.batch_size)
+
+    def seed(self):
+        started = time.perf_counter()
+        timestamped = (User, Post, ProductImage, Purchase, PostLike, ProductReview, Bookmark)
+        with transaction.atomic(), explicit_timestamps(*timestamped):
+            admin_ids, customer_ids = self.create_users()
+            products = self.create_products(admin_ids)
+            self.create_images(products)
+            shared = {
+                # Shuffled, so popularity does not follow creation order
+                'products': self.rng.sample(products, len(products)),
+                'customers': self.rng.sample(customer_ids, len(customer_ids)),
+            }
+            self.create_purchases(shared)
+            self.create_pairs('likes', PostLike, shared, lambda row: PostLike(
+                post_id=row[0], user_id=row[1], created_at=_datetime(row[2]),
+            ))
+            self.create_pairs('reviews', ProductReview, shared, lambda row: ProductReview(
+                product_id=row[0], reviewer_id=row[1], created_at=_datetime(row[2]), updated_at=_datetime(row[2]),
+                rating=row[3], comment=row[4],
+            ))
+            self.create_pairs('bookmarks', Bookmark, shared, lambda row: Bookmark(
+                post_id=row[0], user_id=row[1], created_at=_datetime(row[2]),
+            ))
+            self.update_counters(admin_ids)
+        self.log(f'Seeded in {time.perf_counter() - started:.1f}s')
+
+    def create_users(self):
+        password = make_password(self.password)
+        rng = self.rng
+        rows = [
+            User(
+                username=f'{self.prefix}_admin_{i}', email=f'{self.prefix}.admin{i}@example.com',
+                password=password, role='admin', first_name='Store', last_name=f'Owner {i}',
+                date_joined=_datetime(self.now - YEAR * (1 + rng.random())),
+            )
+            for i in range(self.volumes['admins'])
+        ] + [
+            User(
+                username=f'{self.prefix}_customer_{i}', email=f'{self.prefix}.customer{i}@example.com',
+                password=password, role='customer', first_name='Customer', last_name=str(i),
+                phone_number=f'+25078{rng.randint(0, 9_999_999):07d}',
+                date_joined=_datetime(self.now - YEAR * rng.random()),
+            )
+            for i in range(self.volumes['customers'])
+        ]
+        self.insert(User, rows)
+        seeded = User.objects.filter(username__startswith=f'{self.prefix}_').order_by('pk')
+        admin_ids = list(seeded.filter(role='admin').values_list('pk', flat=True))
+        customer_ids = list(seeded.filter(role='customer').values_list('pk', flat=True))
+        self.log(f'  users: {len(admin_ids):,} admins, {len(customer_ids):,} customers')
+        return admin_ids, customer_ids
+
+    def create_products(self, admin_ids):
+        for rows in self.generate('products', self.volumes['products'], {'admins': admin_ids}):
+            self.insert(Post, [
+                Post(
+                    title=title, description=description, image=image, price=Decimal(price),
+                    category=category, inventory=inventory, user_id=owner_id,
+                    created_at=_datetime(created), updated_at=_datetime(updated),
+                )
+                for title, description, image, price, category, inventory, owner_id, created, updated in rows
+            ])
+        products = [
+            (pk, created.timestamp(), int(price))
+            for pk, created, price in Post.objects.filter(user_id__in=admin_ids).order_by('pk')
+            .values_list('pk', 'created_at', 'price')
+        ]
+        self.log(f'  products: {len(products):,}')
+        return products
+
+    def create_images(self, products):
+        # Extra gallery images go to random products, one to three at a time
+        images, remaining = [], self.volumes['images']
+        while remaining > 0:
+            product_id, created, _ = self.rng.choice(products)
+            for order in range(min(remaining, self.rng.randint(1, 3))):
+                images.append(ProductImage(
+                    product_id=product_id, image=f'product_gallery/seed_{len(images) % 50}.jpg',
+                    display_order=order, created_at=_datetime(created),
+                ))
+                remaining -= 1
+        self.insert(ProductImage, images)
+        self.log(f'  gallery images: {len(images):,}')
+
+    def create_purchases(self, shared):
+        order_prefix = f'ORD-{self.prefix.upper()}-'
+        for rows in self.generate('purchases', self.volumes['purchases'], shared):
+            self.insert(Purchase, [
+                Purchase(
+                    order_id=f'{order_prefix}{number:08X}', buyer_id=buyer_id, product_id=product_id,
+                    quantity=quantity, purchase_price=Decimal(price * quantity), status=status,
+                    delivery_method=delivery, payment_method=payment,
+                    delivery_fee=DELIVERY_FEE if delivery == 'delivery' else Decimal('0.00'),
+                    delivery_address='KG 11 Ave, Kigali' if delivery == 'delivery' else None,
+                    created_at=_datetime(created), updated_at=_datetime(updated),
+                )
+                for number, buyer_id, product_id, quantity, price, status, delivery, payment, created, updated in rows
+            ])
+        self.log(f"  purchases: {self.volumes['purchases']:,}")
+
+    def create_pairs(self, table, model, shared, build):
+        """Insert `volumes[table]` rows of `model` with distinct (product, customer) pairs"""
+        wanted = min(self.volumes[table], len(shared['products']) * len(shared['customers']))
+        seen = set()
+        chunk = 0
+        while len(seen) < wanted:
+            # Popular pairs repeat; top up with further chunks until there are enough
+            missing = wanted - len(seen)
+            for rows in self.generate(table, missing + missing // 4, shared, first_chunk=chunk):
+                chunk += 1
+                batch = []
+                for row in rows:
+                    if len(seen) < wanted and (row[0], row[1]) not in seen:
+                        seen.add((row[0], row[1]))
+                        batch.append(build(row))
+                self.insert(model, batch)
+        self.log(f'  {table}: {len(seen):,}')
+
+    def update_counters(self, admin_ids):
+        purchases = Purchase.objects.filter(product=OuterRef('pk')).order_by().values('product')
+        likes = PostLike.objects.filter(post=OuterRef('pk')).order_by().values('post')
+        Post.objects.filter(user_id__in=admin_ids).update(
+            total_purchases=Coalesce(Subquery(purchases.annotate(c=Count('id')).values('c')), Value(0)),
+            like_count=Coalesce(Subquery(likes.annotate(c=Count('id')).values('c')), Value(0)),
+        )
+        spent = (
+            Purchase.objects.filter(buyer=OuterRef('pk')).order_by().values('buyer')
+            .annotate(total=Sum(F('purchase_price') + F('delivery_fee'))).values('total')
+        )
+        User.objects.filter(username__startswith=f'{self.prefix}_customer_').update(
+            total_purchases=Coalesce(Subquery(spent), Value(Decimal('0.00')))
+        )
+
+
+def seed_store(volumes=None, **options):
+    """Generate a synthetic store; see StoreSeeder for the options"""
+    StoreSeeder(volumes, **options).seed()
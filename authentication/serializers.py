@@ -2,6 +2,7 @@ from rest_framework import serializers
 from django.contrib.auth import authenticate
 from django.contrib.auth.password_validation import validate_password
 from django.core.exceptions import ValidationError
+from django.db import transaction
 from .models import (
     User, Post, Purchase, Bookmark, ProductImage, ProductReview
 )
@@ -102,7 +103,8 @@ class ProductImageSerializer(serializers.ModelSerializer):
     """Serializer for ProductImage model"""
     class Meta:
         model = ProductImage
-        fields = ['id', 'image', 'display_order', 'created_at']
+        fields = ['id', 'image', 'image_placeholder', 'dominant_color', 'display_order', 'created_at']
+        read_only_fields = ['image_placeholder', 'dominant_color']
 
 
 class ProductReviewSerializer(serializers.ModelSerializer):
@@ -130,12 +132,15 @@ class PostSerializer(serializers.ModelSerializer):
     class Meta:
         model = Post
         fields = [
-            'id', 'title', 'description', 'image', 'price', 'category',
-            'inventory', 'total_purchases', 'created_at', 'updated_at',
+            'id', 'title', 'description', 'image', 'image_placeholder', 'dominant_color',
+            'price', 'category', 'inventory', 'total_purchases', 'created_at', 'updated_at',
             'user', 'likes_count', 'average_rating', 'review_count',
             'is_sold_out', 'auxiliary_images', 'reviews'
         ]
-        read_only_fields = ['id', 'created_at', 'updated_at', 'total_purchases']
+        read_only_fields = [
+            'id', 'created_at', 'updated_at', 'total_purchases',
+            'image_placeholder', 'dominant_color'
+        ]
     
     def get_likes_count(self, obj):
         return obj.total_likes()
@@ -167,14 +172,16 @@ class PostCreateSerializer(serializers.ModelSerializer):
     
     def create(self, validated_data):
         auxiliary_images = validated_data.pop('auxiliary_images', [])
-        post = Post.objects.create(**validated_data)
-        
-        for i, image in enumerate(auxiliary_images):
-            ProductImage.objects.create(
-                product=post,
-                image=image,
-                display_order=i
-            )
+        # The product and its gallery become visible (and syncable) together
+        with transaction.atomic():
+            post = Post.objects.create(**validated_data)
+            
+            for i, image in enumerate(auxiliary_images):
+                ProductImage.objects.create(
+                    product=post,
+                    image=image,
+                    display_order=i
+                )
         
         return post
 
@@ -0,0 +1,110 @@
+"""
+Cache session engine with a per-process L1 tier.
+
+Use with SESSION_ENGINE = 'authentication.session_backends'. Sessions live in
+the shared cache (SESSION_CACHE_ALIAS) like Django's cache engine, and each
+worker also keeps recently used sessions in a small in-memory LRU for
+SESSION_L1_TIMEOUT seconds, so most authenticated requests read their session
+without a network round trip.
+
+The L1 copy is per process: a logout or session change made by another worker
+becomes visible here after at most SESSION_L1_TIMEOUT seconds.
+"""
+
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.sessions.backends.cache import SessionStore as CacheSessionStore
+
+
+class LocalSessionCache:
+    """Thread-safe LRU of session data with a short per-entry TTL"""
+
+    def __init__(self, max_entries, timeout):
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, data = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+        # Callers mutate session dicts, so never hand out the shared copy
+        return copy.deepcopy(data)
+
+    def set(self, key, data):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.timeout, copy.deepcopy(data))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+local_sessions = LocalSessionCache(
+    max_entries=getattr(settings, 'SESSION_L1_MAX_ENTRIES', 10000),
+    timeout=getattr(settings, 'SESSION_L1_TIMEOUT', 5),
+)
+
+
+class SessionStore(CacheSessionStore):
+    """Cache-backed session store with a process-local L1 in front"""
+
+    cache_key_prefix = 'authentication.sessions.tiered'
+
+    def load(self):
+        if self.session_key:
+            data = local_sessions.get(self.cache_key)
+            if data is not None:
+                return data
+        data = super().load()
+        if self.session_key and data:
+            local_sessions.set(self.cache_key, data)
+        return data
+
+    async def aload(self):
+        if self.session_key:
+            data = local_sessions.get(await self.acache_key())
+            if data is not None:
+                return data
+        data = await super().aload()
+        if self.session_key and data:
+            local_sessions.set(await self.acache_key(), data)
+        return data
+
+    def save(self, must_create=False):
+        super().save(must_create=must_create)
+        local_sessions.set(self.cache_key, self._get_session(no_load=must_create))
+
+    async def asave(self, must_create=False):
+        await super().asave(must_create=must_create)
+        local_sessions.set(await self.acache_key(), await self._aget_session(no_load=must_create))
+
+    def delete(self, session_key=None):
+        key = session_key or self.session_key
+        if key:
+            local_sessions.delete(self.cache_key_prefix + key)
+        super().delete(session_key)
+
+    async def adelete(self, session_key=None):
+        key = session_key or self.session_key
+        if key:
+            local_sessions.delete(self.cache_key_prefix + key)
+        await super().adelete(session_key)
@@ -0,0 +1,163 @@
+from django.contrib.auth.signals import user_logged_out
+from django.db import transaction
+from django.db.models import QuerySet
+from django.db.models.signals import post_save, pre_delete, post_delete, m2m_changed
+from django.dispatch import receiver
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from .auth_backends import invalidate_cached_user
+from . import metrics
+from .cache_utils import invalidate_tags_on_commit, model_tag, post_tag, user_tag
+from .like_service import recount_likes
+from .models import User, Post, PostLike, Purchase, ProductReview, Bookmark, ProductImage, SyncTombstone
+from .token_auth import invalidate_user_tokens
+
+@receiver(post_save, sender=User)
+def invalidate_tokens_on_user_change(sender, instance, update_fields=None, **kwargs):
+    """Password changes, deactivation and profile edits must not be served from a stale cache"""
+    if update_fields is not None and set(update_fields) == {'last_login'}:
+        return
+    invalidate_user_tokens(instance.pk)
+    invalidate_cached_user(instance.pk)
+
+@receiver(pre_delete, sender=User)
+def note_liked_posts_on_user_delete(sender, instance, **kwargs):
+    # The user's likes are deleted by cascade, which fires no m2m_changed
+    instance._liked_post_ids = list(PostLike.objects.filter(user=instance).values_list('post_id', flat=True))
+
+@receiver(post_delete, sender=User)
+def invalidate_cached_user_on_delete(sender, instance, **kwargs):
+    invalidate_user_tokens(instance.pk)
+    invalidate_cached_user(instance.pk)
+    recount_likes(getattr(instance, '_liked_post_ids', ()))
+
+@receiver(post_delete, sender=Token)
+def invalidate_tokens_on_token_delete(sender, instance, **kwargs):
+    invalidate_user_tokens(instance.user_id)
+
+@receiver(user_logged_out)
+def invalidate_tokens_on_logout(sender, request, user, **kwargs):
+    if user is not None:
+        invalidate_user_tokens(user.pk)
+
+@receiver([post_save, post_delete], sender=Post)
+def invalidate_post_cache(sender, instance, **kwargs):
+    invalidate_tags_on_commit(model_tag(Post), post_tag(instance.pk))
+
+@receiver(post_save, sender=Post)
+def note_new_post(sender, instance, created, **kwargs):
+    # Gallery images saved with a new product need not touch it again (see below)
+    if created:
+        instance._created_with_images = True
+
+@receiver([post_save, post_delete], sender=Purchase)
+def invalidate_purchase_cache(sender, instance, **kwargs):
+    invalidate_tags_on_commit(model_tag(Purchase), post_tag(instance.product_id), user_tag(instance.buyer_id))
+
+@receiver(post_save, sender=Purchase)
+def count_order(sender, instance, created, **kwargs):
+    if created:
+        transaction.on_commit(lambda: metrics.ORDERS.inc(delivery_method=instance.delivery_method))
+
+@receiver([post_save, post_delete], sender=ProductReview)
+def invalidate_review_cache(sender, instance, **kwargs):
+    invalidate_tags_on_commit(model_tag(ProductReview), post_tag(instance.product_id), user_tag(instance.reviewer_id))
+
+@receiver([post_save, post_delete], sender=Bookmark)
+def invalidate_bookmark_cache(sender, instance, **kwargs):
+    invalidate_tags_on_commit(model_tag(Bookmark), post_tag(instance.post_id), user_tag(instance.user_id))
+
+@receiver([post_save, post_delete], sender=ProductImage)
+def invalidate_product_image_cache(sender, instance, created=False, **kwargs):
+    invalidate_tags_on_commit(model_tag(ProductImage), post_tag(instance.product_id))
+    product_field = ProductImage._meta.get_field('product')
+    if created and product_field.is_cached(instance) and getattr(instance.product, '_created_with_images', False):
+        # Added while creating the product, whose updated_at is already current
+        return
+    # Gallery images are part of the synced product, so the product counts as changed
+    Post.objects.filter(pk=instance.product_id).update(updated_at=timezone.now())
+
+@receiver(m2m_changed, sender=Post.likes.through)
+def invalidate_like_cache(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Likes are a Post M2M, so adding or removing one fires no Post save.
+    like_service writes PostLike rows directly and keeps like_count itself;
+    this covers direct post.likes / user.liked_posts changes.
+    """
+    if action == 'pre_clear' and reverse:
+        # user.liked_posts.clear() reports no post ids afterwards; note them now
+        instance._cleared_like_post_ids = list(PostLike.objects.filter(user=instance).values_list('post_id', flat=True))
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if reverse:
+        # user.liked_posts.add(...): instance is the user
+        post_ids = pk_set or getattr(instance, '_cleared_like_post_ids', ())
+        user_ids = [instance.pk]
+    else:
+        post_ids, user_ids = [instance.pk], pk_set or ()
+    recount_likes(post_ids)
+    invalidate_tags_on_commit(
+        model_tag(Post),
+        *(post_tag(post_id) for post_id in post_ids),
+        *(user_tag(user_id) for user_id in user_ids),
+    )
+
+
+# Delta sync (sync_views): deletions leave a tombstone so clients can drop the row.
+# Deleting a product or a user cascades to its bookmarks, likes and purchases:
+# their tombstones are gathered in the parent's pre_delete with one query per
+# kind and written with one bulk_create, and the per-row receivers skip rows
+# removed by such a cascade. PostLike deletes cover likes.remove()/clear().
+
+def _tombstones(bookmarks, likes, purchases):
+    return [
+        *(SyncTombstone(kind='bookmark', object_id=post_id, user_id=user_id)
+          for post_id, user_id in bookmarks.values_list('post_id', 'user_id')),
+        *(SyncTombstone(kind='like', object_id=post_id, user_id=user_id)
+          for post_id, user_id in likes.values_list('post_id', 'user_id')),
+        *(SyncTombstone(kind='purchase', object_id=purchase_id, user_id=buyer_id)
+          for purchase_id, buyer_id in purchases.values_list('id', 'buyer_id')),
+    ]
+
+def _cascaded(origin):
+    """Whether the row goes because a product or user was deleted (instance or queryset)"""
+    model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    return model in (Post, User)
+
+@receiver(pre_delete, sender=Post)
+def collect_post_tombstones(sender, instance, **kwargs):
+    instance._tombstones = [SyncTombstone(kind='post', object_id=instance.pk)] + _tombstones(
+        Bookmark.objects.filter(post=instance),
+        PostLike.objects.filter(post=instance),
+        Purchase.objects.filter(product=instance),
+    )
+
+@receiver(pre_delete, sender=User)
+def collect_user_tombstones(sender, instance, **kwargs):
+    # Rows on the user's own products are collected when those products cascade
+    instance._tombstones = _tombstones(
+        Bookmark.objects.filter(user=instance).exclude(post__user=instance),
+        PostLike.objects.filter(user=instance).exclude(post__user=instance),
+        Purchase.objects.filter(buyer=instance).exclude(product__user=instance),
+    )
+
+@receiver(post_delete, sender=Post)
+@receiver(post_delete, sender=User)
+def record_cascade_tombstones(sender, instance, **kwargs):
+    SyncTombstone.objects.bulk_create(getattr(instance, '_tombstones', ()))
+
+@receiver(post_delete, sender=Bookmark)
+def record_bookmark_tombstone(sender, instance, origin=None, **kwargs):
+    if not _cascaded(origin):
+        SyncTombstone.objects.create(kind='bookmark', object_id=instance.post_id, user_id=instance.user_id)
+
+@receiver(post_delete, sender=PostLike)
+def record_like_tombstone(sender, instance, origin=None, **kwargs):
+    if not _cascaded(origin):
+        SyncTombstone.objects.create(kind='like', object_id=instance.post_id, user_id=instance.user_id)
+
+@receiver(post_delete, sender=Purchase)
+def record_purchase_tombstone(sender, instance, origin=None, **kwargs):
+    if not _cascaded(origin):
+        SyncTombstone.objects.create(kind='purchase', object_id=instance.pk, user_id=instance.buyer_id)
@@ -0,0 +1,273 @@
+"""
+Delta-sync endpoint for offline-capable mobile clients.
+
+GET /v1/sync/?cursor=<cursor>&limit=200 returns what changed since the cursor:
+
+    {"success": true, "data": {
+        "posts": [...], "bookmarks": [...], "likes": [...], "purchases": [...],
+        "deleted": {"posts": [ids], "bookmarks": [post ids], "likes": [post ids], "purchases": [ids]},
+        "cursor": "...", "has_more": false}}
+
+Omit the cursor for the initial full download. Each stream (products, the
+caller's bookmarks, likes and purchases, and tombstones of deleted rows) is
+walked in (timestamp, id) order on its own index and returns at most `limit`
+rows per call; keep calling with the returned cursor while has_more is true.
+
+Rows younger than SYNC_SETTLE_SECONDS are left for the next call, so a row
+committed late with an earlier timestamp is not skipped. Tombstones are kept
+for SYNC_TOMBSTONE_RETENTION_DAYS (see prune_sync_tombstones); an older
+cursor gets 410 and the client starts over without one.
+
+Product rows carry the product's own fields and gallery; like counts,
+ratings and per-user flags come from the bookmark/like streams or
+dashboard_api, since likes and reviews do not touch Post.updated_at.
+"""
+
+import base64
+import binascii
+import json
+import logging
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_http_methods
+
+from .json_utils import JsonResponse, dumps, loads
+from .models import Bookmark, Post, PostLike, ProductImage, Purchase, SyncTombstone
+from .throttling import rate_limit
+from .views import get_token_user
+
+logger = logging.getLogger(__name__)
+
+CURSOR_VERSION = 1
+
+# Stream name -> timestamp field it is ordered by
+SYNC_STREAMS = {
+    'posts': 'updated_at',
+    'bookmarks': 'created_at',
+    'likes': 'created_at',
+    'purchases': 'updated_at',
+    'deleted': 'deleted_at',
+}
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(positions, issued_at):
+    payload = {
+        'v': CURSOR_VERSION,
+        'at': issued_at.isoformat(),
+        'pos': {
+            name: [timestamp.isoformat(), pk] for name, (timestamp, pk) in positions.items()
+        },
+    }
+    return base64.urlsafe_b64encode(dumps(payload)).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Returns (positions, issued_at); positions maps stream name -> (timestamp, id)"""
+    try:
+        payload = loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        if payload.get('v') != CURSOR_VERSION:
+            raise InvalidCursor('Unsupported cursor version')
+        positions = {
+            name: (datetime.fromisoformat(timestamp), int(pk))
+            for name, (timestamp, pk) in payload['pos'].items()
+            if name in SYNC_STREAMS
+        }
+        return positions, datetime.fromisoformat(payload['at'])
+    except InvalidCursor:
+        raise
+    except (binascii.Error, json.JSONDecodeError, AttributeError, KeyError, TypeError, ValueError) as e:
+        raise InvalidCursor(str(e))
+
+
+def changed_since(queryset, field, position, until, limit):
+    """
+    Rows of `queryset` after `position` (timestamp, id) and not newer than
+    `until`, in (field, id) order. Fetches one extra row to detect more.
+    Returns (rows, has_more).
+    """
+    queryset = queryset.filter(**{f'{field}__lte': until})
+    if position is not None:
+        timestamp, pk = position
+        queryset = queryset.filter(Q(**{f'{field}__gt': timestamp}) | Q(**{field: timestamp, 'id__gt': pk}))
+    rows = list(queryset.order_by(field, 'id')[:limit + 1])
+    return rows[:limit], len(rows) > limit
+
+
+def serialize_post(post, images):
+    return {
+        'id': post.id,
+        'title': post.title,
+        'description': post.description,
+        'price': float(post.price) if post.price else None,
+        'category': post.category,
+        'category_display': post.get_category_display(),
+        'inventory': post.inventory,
+        'created_at': post.created_at.isoformat(),
+        'updated_at': post.updated_at.isoformat(),
+        'total_purchases': post.total_purchases,
+        'image_url': post.image.url if post.image else None,
+        'image_placeholder': post.image_placeholder or None,
+        'dominant_color': post.dominant_color or None,
+        'auxiliary_images': [
+            {
+                'id': img.id,
+                'image_url': img.image.url if img.image else None,
+                'image_placeholder': img.image_placeholder or None,
+                'dominant_color': img.dominant_color or None,
+                'display_order': img.display_order
+            }
+            for img in images
+        ],
+        'user': {
+            'id': post.user.id,
+            'username': post.user.username,
+            'first_name': post.user.first_name,
+            'last_name': post.user.last_name,
+            'is_vendor_role': post.user.is_admin,
+            'profile_picture_url': post.user.profile_picture.url if post.user.profile_picture else None
+        } if post.user else None
+    }
+
+
+def serialize_purchase(purchase):
+    return {
+        'id': purchase.id,
+        'order_id': purchase.order_id,
+        'product_id': purchase.product_id,
+        'quantity': purchase.quantity,
+        'purchase_price': float(purchase.purchase_price),
+        'status': purchase.status,
+        'delivery_method': purchase.delivery_method,
+        'payment_method': purchase.payment_method,
+        'delivery_fee': float(purchase.delivery_fee),
+        'delivery_address': purchase.delivery_address,
+        'notes': purchase.notes,
+        'tracking_number': purchase.tracking_number,
+        'created_at': purchase.created_at.isoformat(),
+        'updated_at': purchase.updated_at.isoformat()
+    }
+
+
+def collect_deletions(tombstones, user):
+    """
+    Group tombstones by kind. A bookmark or like that was removed and then
+    added again is live, so its tombstone is dropped rather than sent.
+    """
+    deleted = {'posts': [], 'bookmarks': [], 'likes': [], 'purchases': []}
+    for tombstone in tombstones:
+        deleted[f'{tombstone.kind}s'].append(tombstone.object_id)
+
+    for name, model in (('bookmarks', Bookmark), ('likes', PostLike)):
+        if deleted[name]:
+            live = set(model.objects.filter(user=user, post_id__in=deleted[name]).values_list('post_id', flat=True))
+            deleted[name] = [post_id for post_id in deleted[name] if post_id not in live]
+    for name in deleted:
+        deleted[name] = sorted(set(deleted[name]))
+    return deleted
+
+
+@csrf_exempt
+@require_http_methods(['GET'])
+@rate_limit('sync')
+def sync_api(request):
+    """Rows changed since the client's cursor, in bounded batches"""
+    try:
+        if request.user.is_authenticated:
+            user = request.user
+        else:
+            user = get_token_user(request)
+            if not user:
+                return JsonResponse({
+                    'success': False,
+                    'message': 'Authentication required',
+                    'errors': {'auth': ['Please provide valid authentication credentials']}
+                }, status=401)
+
+        max_limit = getattr(settings, 'SYNC_MAX_BATCH_SIZE', 500)
+        try:
+            limit = int(request.GET.get('limit', getattr(settings, 'SYNC_BATCH_SIZE', 200)))
+        except ValueError:
+            limit = getattr(settings, 'SYNC_BATCH_SIZE', 200)
+        limit = min(max(limit, 1), max_limit)
+
+        now = timezone.now()
+        cursor = request.GET.get('cursor', '').strip()
+        positions, issued_at = {}, now
+        if cursor:
+            try:
+                positions, issued_at = decode_cursor(cursor)
+            except InvalidCursor:
+                return JsonResponse({
+                    'success': False,
+                    'message': 'Invalid sync cursor',
+                    'errors': {'cursor': ['Cursor is malformed; sync again without a cursor']}
+                }, status=400)
+            retention = timedelta(days=getattr(settings, 'SYNC_TOMBSTONE_RETENTION_DAYS', 30))
+            if issued_at < now - retention:
+                return JsonResponse({
+                    'success': False,
+                    'message': 'Sync cursor expired',
+                    'errors': {'cursor': ['Cursor is older than the deletion history; sync again without a cursor']}
+                }, status=410)
+
+        until = now - timedelta(seconds=getattr(settings, 'SYNC_SETTLE_SECONDS', 2))
+        streams = {
+            'posts': Post.objects.select_related('user'),
+            'bookmarks': Bookmark.objects.filter(user=user),
+            'likes': PostLike.objects.filter(user=user),
+            'purchases': Purchase.objects.filter(buyer=user),
+            'deleted': SyncTombstone.objects.filter(Q(user_id__isnull=True) | Q(user_id=user.pk)),
+        }
+
+        rows, has_more = {}, False
+        for name, queryset in streams.items():
+            field = SYNC_STREAMS[name]
+            rows[name], more = changed_since(queryset, field, positions.get(name), until, limit)
+            has_more = has_more or more
+            if rows[name]:
+                last = rows[name][-1]
+                positions[name] = (getattr(last, field), last.id)
+
+        images_by_post = {}
+        if rows['posts']:
+            post_ids = [post.id for post in rows['posts']]
+            for img in ProductImage.objects.filter(product_id__in=post_ids).order_by('display_order'):
+                images_by_post.setdefault(img.product_id, []).append(img)
+
+        return JsonResponse({
+            'success': True,
+            'message': 'Changes retrieved successfully',
+            'data': {
+                'posts': [serialize_post(post, images_by_post.get(post.id, [])) for post in rows['posts']],
+                'bookmarks': [
+                    {'post_id': bookmark.post_id, 'created_at': bookmark.created_at.isoformat()}
+                    for bookmark in rows['bookmarks']
+                ],
+                'likes': [
+                    {'post_id': like.post_id, 'created_at': like.created_at.isoformat()}
+                    for like in rows['likes']
+                ],
+                'purchases': [serialize_purchase(purchase) for purchase in rows['purchases']],
+                'deleted': collect_deletions(rows['deleted'], user),
+                # A cursor issued before the sync began keeps its age, so the
+                # retention check applies to the oldest unsynced change
+                'cursor': encode_cursor(positions, issued_at if has_more else now),
+                'has_more': has_more,
+            }
+        }, status=200)
+
+    except Exception as e:
+        logger.error(f"Sync API error: {str(e)}")
+        return JsonResponse({
+            'success': False,
+            'message': 'Internal server error',
+            'errors': {'server': ['An unexpected error occurred']}
+        }, status=500)
@@ -0,0 +1,22 @@
+from django import template
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+register = template.Library()
+
+@register.filter
+def placeholder_style(image_owner):
+    """
+    Inline style that paints the precomputed placeholder behind an image.
+    Usage: <div style="{{ post|placeholder_style }}"> ... </div>
+    """
+    styles = []
+    dominant_color = getattr(image_owner, 'dominant_color', '')
+    image_placeholder = getattr(image_owner, 'image_placeholder', '')
+
+    if dominant_color:
+        styles.append(f"background-color: {escape(dominant_color)};")
+    if image_placeholder:
+        styles.append(f"background-image: url('{escape(image_placeholder)}'); background-size: cover; background-position: center;")
+
+    return mark_safe(' '.join(styles))
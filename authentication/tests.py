@@ -1,3 +1,969 @@
-from django.test import TestCase
+import asyncio
+import io
+import json
+import shutil
+import smtplib
+import tempfile
+import time
+import uuid
+from datetime import date, datetime, timezone as dt_timezone
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import AnonymousUser
+from django.core import mail
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.db.models import Count
+from django.http import JsonResponse as DjangoJsonResponse
+from django.test import AsyncRequestFactory, RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.client import BOUNDARY, MULTIPART_CONTENT, encode_multipart
+from django.test.utils import CaptureQueriesContext
+from django.utils.translation import gettext_lazy
+from PIL import Image
+
+from rest_framework.authtoken.models import Token
+from rest_framework.renderers import JSONRenderer
+
+from . import (
+    async_catalog_views, async_views, bookmark_service, inventory_service, like_service, profiling, views,
+)
+from .cache_utils import cached_function, invalidate_tags, post_tag
+from .http_utils import get_client_ip
+from .json_utils import JsonResponse
+from .mail_utils import MailWorker
+from .models import Bookmark, Post, PostLike, ProductImage, ProductReview, Purchase, SyncTombstone, User
+from .nplusone import NPlusOneError, detect_nplusone
+from .otp_utils import CacheOTPStore
+from .qr_utils import (
+    BASE45_ALPHABET, base45_decode, base45_encode, encode_qr_token, generate_user_qr_data, parse_qr_token,
+)
+from .renderers import FastJSONRenderer
+from .throttling import check_rate_limit, hit, request_identities
+from .token_auth import _token_cache_key, get_user_for_token
+
+
+class ClearCachesMixin:
+    """Every test starts with empty caches (rate limits, tokens, tag versions)"""
+
+    def setUp(self):
+        super().setUp()
+        for alias in ('default', 'local'):
+            caches[alias].clear()
+
+
+class CacheClearingTestCase(ClearCachesMixin, TestCase):
+    pass
+
+
+# Sub-requests run on pool threads with their own connections, so the data
+# they read has to be committed
+@override_settings(RATE_LIMIT_ENABLED=False)
+class BatchApiTests(ClearCachesMixin, TransactionTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('shopper', password='pass-123')
+        self.client.force_login(self.user)
+
+    def batch(self, *items):
+        response = self.client.post('/v1/batch/', json.dumps({'requests': list(items)}), content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        return {result['id']: result for result in response.json()['responses']}
+
+    def test_runs_allowed_read_endpoints(self):
+        results = self.batch(
+            {'id': 'categories', 'path': '/v1/categories/'},
+            {'id': 'me', 'path': '/api/rest/users/me/'},
+        )
+        self.assertEqual(results['categories']['status'], 200)
+        self.assertEqual(results['me']['status'], 200)
+        self.assertEqual(results['me']['body']['username'], 'shopper')
+
+    def test_rejects_endpoints_outside_the_allowlist(self):
+        post = Post.objects.create(user=self.user, title='Runner', price=10, inventory=1)
+        results = self.batch(
+            {'id': 'logout', 'path': '/logout/'},
+            {'id': 'like', 'path': f'/v1/like/{post.pk}/'},
+            {'id': 'batch', 'path': '/v1/batch/'},
+        )
+        self.assertEqual({result['status'] for result in results.values()}, {403})
+        # The caller's session survived the /logout/ attempt
+        self.assertEqual(self.client.get('/api/rest/users/me/').status_code, 200)
+
+    def test_rejects_other_methods(self):
+        results = self.batch({'id': 'stats', 'method': 'POST', 'path': '/api/rest/dashboard/stats/'})
+        self.assertEqual(results['stats']['status'], 405)
+
+    def test_rejects_a_method_that_is_not_a_string(self):
+        results = self.batch(
+            {'id': 'bad', 'method': 1, 'path': '/v1/categories/'},
+            {'id': 'categories', 'path': '/v1/categories/'},
+        )
+        self.assertEqual(results['bad']['status'], 400)
+        self.assertEqual(results['categories']['status'], 200)
+
+
+class ClientIpTests(SimpleTestCase):
+    def request(self, forwarded_for=None):
+        extra = {'HTTP_X_FORWARDED_FOR': forwarded_for} if forwarded_for else {}
+        return RequestFactory().get('/', REMOTE_ADDR='10.0.0.1', **extra)
+
+    @override_settings(TRUSTED_PROXY_COUNT=1)
+    def test_uses_the_hop_added_by_the_proxy(self):
+        self.assertEqual(get_client_ip(self.request('203.0.113.7')), '203.0.113.7')
+        # Entries the client sent itself are ignored
+        self.assertEqual(get_client_ip(self.request('1.2.3.4, 5.6.7.8, 203.0.113.7')), '203.0.113.7')
+
+    @override_settings(TRUSTED_PROXY_COUNT=0)
+    def test_ignores_the_header_without_trusted_proxies(self):
+        self.assertEqual(get_client_ip(self.request('1.2.3.4')), '10.0.0.1')
+
+    @override_settings(TRUSTED_PROXY_COUNT=2)
+    def test_falls_back_to_the_socket_address_when_hops_are_missing(self):
+        self.assertEqual(get_client_ip(self.request('203.0.113.7')), '10.0.0.1')
+
+
+class SlidingWindowTests(CacheClearingTestCase):
+    def test_allows_up_to_the_limit_then_asks_to_wait(self):
+        now = 1000 * 60 + 30
+        for _ in range(3):
+            self.assertEqual(hit('test', '3/m', now=now), 0)
+        self.assertEqual(hit('test', '3/m', now=now), 30)
+
+    def test_previous_window_drains_gradually(self):
+        window_start = 1000 * 60
+        for _ in range(4):
+            hit('test', '4/m', now=window_start + 59)
+        # Just after the window turns, the previous one still fills the limit
+        self.assertGreater(hit('test', '4/m', now=window_start + 61), 0)
+        # Halfway through, half of it has slid out
+        self.assertEqual(hit('test', '4/m', now=window_start + 90), 0)
+        self.assertEqual(hit('test', '4/m', now=window_start + 90), 0)
+        self.assertGreater(hit('test', '4/m', now=window_start + 90), 0)
+
+    def test_rejected_requests_are_not_counted(self):
+        now = 1000 * 60
+        hit('test', '1/m', now=now)
+        for _ in range(5):
+            hit('test', '1/m', now=now)
+        self.assertEqual(hit('test', '1/m', now=now + 120), 0)
+
+    @override_settings(RATE_LIMIT_ENABLED=True, RATE_LIMITS={'test': {'ip': '3/m', 'user': '1/m'}})
+    def test_a_request_rejected_by_one_limit_uses_up_no_other(self):
+        first = {'ip': '10.0.0.1', 'user': 'user:1'}
+        self.assertEqual(check_rate_limit('test', first), 0)
+        for _ in range(5):
+            self.assertGreater(check_rate_limit('test', first), 0)
+        # Only the allowed request counted against the shared IP
+        self.assertEqual(check_rate_limit('test', {'ip': '10.0.0.1', 'user': 'user:2'}), 0)
+        self.assertEqual(check_rate_limit('test', {'ip': '10.0.0.1', 'user': 'user:3'}), 0)
+
+
+class RequestIdentityTests(CacheClearingTestCase):
+    def request(self, token):
+        return RequestFactory().get('/', REMOTE_ADDR='10.0.0.1', HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def test_made_up_tokens_share_the_ip_bucket(self):
+        first = request_identities(self.request('not-a-token'))
+        second = request_identities(self.request('another-one'))
+        self.assertEqual(first['user'], 'ip:10.0.0.1')
+        self.assertEqual(first, second)
+
+    def test_valid_tokens_use_the_user_bucket(self):
+        user = User.objects.create_user('shopper', password='pass-123')
+        token = Token.objects.create(user=user)
+        self.assertEqual(request_identities(self.request(token.key))['user'], f'user:{user.pk}')
+
+
+@override_settings(RATE_LIMIT_ENABLED=False)
+class PurchaseProductTests(CacheClearingTestCase):
+    def test_adds_to_the_stored_total_not_the_request_copy(self):
+        seller = User.objects.create_user('seller', password='pass-123', role='admin')
+        buyer = User.objects.create_user('buyer', password='pass-123')
+        post = Post.objects.create(user=seller, title='Runner', price=10, inventory=5)
+        self.client.force_login(buyer)
+        # Another request raised the total after this session's user was loaded
+        User.objects.filter(pk=buyer.pk).update(total_purchases=100)
+
+        self.client.post(f'/post/{post.pk}/purchase/', {'quantity': 2})
+
+        buyer.refresh_from_db()
+        post.refresh_from_db()
+        self.assertEqual(buyer.total_purchases, 120)
+        self.assertEqual(post.inventory, 3)
+
+    @override_settings(TOKEN_AUTH_CACHE_ENABLED=True)
+    def test_drops_the_token_cached_user(self):
+        seller = User.objects.create_user('seller', password='pass-123', role='admin')
+        buyer = User.objects.create_user('buyer', password='pass-123')
+        post = Post.objects.create(user=seller, title='Runner', price=10, inventory=5)
+        token = Token.objects.create(user=buyer)
+        self.assertEqual(get_user_for_token(token.key).total_purchases, 0)
+        self.client.force_login(buyer)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'/post/{post.pk}/purchase/', {'quantity': 2})
+
+        self.assertEqual(get_user_for_token(token.key).total_purchases, 20)
+
+
+class TokenUserCacheTests(CacheClearingTestCase):
+    def test_not_cached_without_a_shared_cache(self):
+        user = User.objects.create_user('shopper', password='pass-123')
+        token = Token.objects.create(user=user)
+        self.assertEqual(get_user_for_token(token.key), user)
+        self.assertIsNone(caches['default'].get(_token_cache_key(token.key)))
+
+        # Deactivated by another worker; no invalidation reaches this one
+        User.objects.filter(pk=user.pk).update(is_active=False)
+
+        self.assertIsNone(get_user_for_token(token.key))
+
+    @override_settings(TOKEN_AUTH_CACHE_ENABLED=True)
+    def test_cached_with_a_shared_cache(self):
+        user = User.objects.create_user('shopper', password='pass-123')
+        token = Token.objects.create(user=user)
+        get_user_for_token(token.key)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(get_user_for_token(token.key), user)
+
+
+@override_settings(RATE_LIMIT_ENABLED=False)
+class CatalogEtagTests(CacheClearingTestCase):
+    def test_unchanged_catalog_is_not_modified(self):
+        etag = self.client.get('/v1/categories/')['ETag']
+        self.assertEqual(self.client.get('/v1/categories/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    @override_settings(CACHE_TAGS_ENABLED=False)
+    def test_no_etag_without_shared_tag_versions(self):
+        response = self.client.get('/v1/categories/')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('ETag', response)
+
+
+@override_settings(QR_CODE_UPDATE_INTERVAL=600)
+class QrTokenExpiryTests(CacheClearingTestCase):
+    def at(self, timestamp):
+        return mock.patch('django.utils.timezone.now', return_value=datetime.fromtimestamp(timestamp, tz=dt_timezone.utc))
+
+    def test_code_issued_at_the_end_of_a_window_still_scans_in_the_next(self):
+        user = User.objects.create_user('shopper', password='pass-123')
+        window_start = 1_800_000_000 - 1_800_000_000 % 600
+        with self.at(window_start + 599):
+            token = generate_user_qr_data(user)
+        with self.at(window_start + 600 + 300):
+            self.assertEqual(parse_qr_token(token)['user_id'], user.pk)
+        with self.at(window_start + 1200):
+            with self.assertRaisesMessage(ValueError, 'expired'):
+                parse_qr_token(token)
+
+    def test_tokens_are_identical_within_a_window(self):
+        user = User.objects.create_user('shopper', password='pass-123')
+        window_start = 1_800_000_000 - 1_800_000_000 % 600
+        with self.at(window_start + 1):
+            first = generate_user_qr_data(user)
+        with self.at(window_start + 599):
+            self.assertEqual(generate_user_qr_data(user), first)
+
+
+class ReserveInventoryTests(CacheClearingTestCase):
+    def setUp(self):
+        super().setUp()
+        seller = User.objects.create_user('seller', password='pass-123', role='admin')
+        self.post = Post.objects.create(user=seller, title='Runner', price=10, inventory=2)
+
+    def test_takes_stock_and_counts_the_sale(self):
+        self.assertTrue(inventory_service.reserve_inventory(self.post.pk, 2))
+        self.post.refresh_from_db()
+        self.assertEqual((self.post.inventory, self.post.total_purchases), (0, 1))
+
+    def test_refuses_more_than_is_left(self):
+        # The product row may be stale in the caller; the UPDATE checks the stored stock
+        Post.objects.filter(pk=self.post.pk).update(inventory=1)
+        self.assertFalse(inventory_service.reserve_inventory(self.post.pk, 2))
+        self.post.refresh_from_db()
+        self.assertEqual((self.post.inventory, self.post.total_purchases), (1, 0))
+
+    def test_a_product_edit_keeps_a_sale_made_meanwhile(self):
+        post = Post.objects.get(pk=self.post.pk)
+        inventory_service.reserve_inventory(self.post.pk, 1)
+        post.title = 'Trail Runner'
+        post.save()
+        self.post.refresh_from_db()
+        self.assertEqual((self.post.title, self.post.total_purchases), ('Trail Runner', 1))
+
+
+@override_settings(RATE_LIMIT_ENABLED=False, SYNC_SETTLE_SECONDS=0)
+class SyncApiTests(CacheClearingTestCase):
+    def setUp(self):
+        super().setUp()
+        self.seller = User.objects.create_user('seller', password='pass-123', role='admin')
+        self.customer = User.objects.create_user('shopper', password='pass-123')
+        self.client.force_login(self.customer)
+
+    def sync(self, cursor=None, limit=None):
+        params = {key: value for key, value in (('cursor', cursor), ('limit', limit)) if value}
+        response = self.client.get('/v1/sync/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()['data']
+
+    def test_pages_through_changes_with_the_cursor(self):
+        posts = [Post.objects.create(user=self.seller, title=f'Item {i}', price=10, inventory=1) for i in range(3)]
+        first = self.sync(limit=2)
+        self.assertTrue(first['has_more'])
+        second = self.sync(first['cursor'], limit=2)
+        self.assertFalse(second['has_more'])
+        synced = [post['id'] for post in first['posts'] + second['posts']]
+        self.assertEqual(sorted(synced), sorted(post.pk for post in posts))
+        self.assertEqual(self.sync(second['cursor'])['posts'], [])
+
+    def test_deleting_a_product_tombstones_it_and_its_rows(self):
+        post = Post.objects.create(user=self.seller, title='Runner', price=10, inventory=1)
+        Bookmark.objects.create(user=self.customer, post=post)
+        PostLike.objects.create(user=self.customer, post=post)
+        cursor = self.sync()['cursor']
+        post_id = post.pk
+
+        post.delete()
+
+        deleted = self.sync(cursor)['deleted']
+        self.assertEqual(deleted['posts'], [post_id])
+        self.assertEqual(deleted['bookmarks'], [post_id])
+        self.assertEqual(deleted['likes'], [post_id])
+
+    def test_cascades_write_tombstones_in_one_insert(self):
+        post = Post.objects.create(user=self.seller, title='Runner', price=10, inventory=5)
+        for i in range(3):
+            buyer = User.objects.create_user(f'buyer{i}', password='pass-123')
+            Bookmark.objects.create(user=buyer, post=post)
+            PostLike.objects.create(user=buyer, post=post)
+        with CaptureQueriesContext(connection) as queries:
+            post.delete()
+        inserts = [query for query in queries if query['sql'].startswith('INSERT INTO "authentication_synctombstone"')]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(SyncTombstone.objects.count(), 7)
+
+    def test_deleting_a_user_records_each_row_once(self):
+        own = Post.objects.create(user=self.seller, title='Own', price=10, inventory=1)
+        other = Post.objects.create(user=User.objects.create_user('other', password='pass-123', role='admin'),
+                                    title='Other', price=10, inventory=1)
+        PostLike.objects.create(user=self.seller, post=own)
+        PostLike.objects.create(user=self.seller, post=other)
+        Bookmark.objects.create(user=self.customer, post=own)
+
+        seller_id = self.seller.pk
+        self.seller.delete()
+
+        tombstones = sorted(SyncTombstone.objects.values_list('kind', 'object_id', 'user_id'))
+        self.assertEqual(tombstones, sorted([
+            ('post', own.pk, None),
+            ('like', own.pk, seller_id),
+            ('like', other.pk, seller_id),
+            ('bookmark', own.pk, self.customer.pk),
+        ]))
+
+    def test_single_deletes_still_leave_a_tombstone(self):
+        post = Post.objects.create(user=self.seller, title='Runner', price=10, inventory=1)
+        Bookmark.objects.create(user=self.customer, post=post).delete()
+        self.assertEqual(list(SyncTombstone.objects.values_list('kind', 'object_id')), [('bookmark', post.pk)])
+
+
+GIF = (b'GIF89a\x01\x00\x01\x00\x80\x00\x00\x00\x00\x00\xff\xff\xff!\xf9\x04\x01\x00\x00\x00\x00'
+       b',\x00\x00\x00\x00\x01\x00\x01\x00\x00\x02\x02D\x01\x00;')
+
+
+class ProductImageSyncTests(CacheClearingTestCase):
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root))
+        self.seller = User.objects.create_user('seller', password='pass-123', role='admin')
+
+    def image(self, post):
+        return ProductImage.objects.create(product=post, image=SimpleUploadedFile('pixel.gif', GIF, 'image/gif'))
+
+    def post_updates(self, queries):
+        return [query for query in queries if query['sql'].startswith('UPDATE "authentication_post"')]
+
+    def test_images_saved_with_a_new_product_do_not_touch_it(self):
+        with CaptureQueriesContext(connection) as queries:
+            post = Post.objects.create(user=self.seller, title='Runner', price=10, inventory=1)
+            self.image(post)
+        self.assertEqual(self.post_updates(queries), [])
+
+    def test_images_added_later_mark_the_product_changed(self):
+        post = Post.objects.create(user=self.seller, title='Runner', price=10, inventory=1)
+        before = post.updated_at
+        self.image(Post.objects.get(pk=post.pk))
+        post.refresh_from_db()
+        self.assertGreater(post.updated_at, before)
+
+
+class BookmarkSyncTests(CacheClearingTestCase):
+    def setUp(self):
+        super().setUp()
+        seller = User.objects.create_user('seller', password='pass-123', role='admin')
+        self.user = User.objects.create_user('shopper', password='pass-123')
+        self.posts = [Post.objects.create(user=seller, title=f'Item {i}', price=10, inventory=1) for i in range(3)]
+
+    def test_applies_the_diff(self):
+        first, second, third = (post.pk for post in self.posts)
+        Bookmark.objects.create(user=self.user, post_id=first)
+
+        result = bookmark_service.sync_bookmarks(self.user.pk, add=[second, 999999], remove=[first, third])
+
+        self.assertEqual(result['added'], [second])
+        self.assertEqual(result['removed'], [first])
+        self.assertEqual(result['not_found'], [999999])
+        self.assertEqual(result['bookmarks'], [second])
+
+    def test_tombstones_only_removed_bookmarks(self):
+        first, second, _ = (post.pk for post in self.posts)
+        Bookmark.objects.create(user=self.user, post_id=first)
+
+        self.assertEqual(bookmark_service._delete(self.user.pk, [first, second]), 1)
+
+        self.assertEqual(list(SyncTombstone.objects.values_list('kind', 'object_id', 'user_id')),
+                         [('bookmark', first, self.user.pk)])
+
+    def test_toggle(self):
+        post_id = self.posts[0].pk
+        self.assertTrue(bookmark_service.toggle_bookmark(self.user.pk, post_id))
+        self.assertFalse(bookmark_service.toggle_bookmark(self.user.pk, post_id))
+        self.assertFalse(Bookmark.objects.filter(user=self.user).exists())
+
+
+@override_settings(TOKEN_AUTH_CACHE_ENABLED=True)
+class LogoutApiTests(CacheClearingTestCase):
+    def test_keeps_the_token_and_drops_its_cached_mapping(self):
+        user = User.objects.create_user('shopper', password='pass-123')
+        token = Token.objects.create(user=user)
+        self.assertEqual(get_user_for_token(token.key), user)
+        self.assertIsNotNone(caches['default'].get(_token_cache_key(token.key)))
+
+        response = self.client.post('/v1/logout/', HTTP_AUTHORIZATION=f'Bearer {token.key}')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(Token.objects.filter(key=token.key).exists())
+        self.assertIsNone(caches['default'].get(_token_cache_key(token.key)))
+        self.assertEqual(get_user_for_token(token.key), user)
+
+
+@override_settings(RATE_LIMIT_ENABLED=False)
+class VerifyPickupsBatchTests(CacheClearingTestCase):
+    url = '/api/rest/admin/pickups/verify/'
+
+    def setUp(self):
+        super().setUp()
+        admin = User.objects.create_user('seller', password='pass-123', role='admin')
+        buyer = User.objects.create_user('shopper', password='pass-123')
+        post = Post.objects.create(user=admin, title='Runner', price=10, inventory=5)
+        self.purchase = Purchase.objects.create(buyer=buyer, product=post, quantity=1, purchase_price=10)
+        self.client.force_login(admin)
+
+    def verify(self, body):
+        return self.client.post(self.url, json.dumps(body), content_type='application/json')
+
+    def test_rejects_a_body_that_is_not_an_object(self):
+        self.assertEqual(self.verify([self.purchase.pk]).status_code, 400)
+
+    def test_rejects_a_complete_flag_that_is_not_a_bool(self):
+        response = self.verify({'purchase_ids': [self.purchase.pk], 'complete': 'false'})
+        self.assertEqual(response.status_code, 400)
+        self.purchase.refresh_from_db()
+        self.assertEqual(self.purchase.status, 'pending')
+
+    def test_rejects_purchase_ids_that_are_not_integers(self):
+        for purchase_id in (True, 1.9, str(self.purchase.pk)):
+            with self.subTest(purchase_id=purchase_id):
+                self.assertEqual(self.verify({'purchase_ids': [purchase_id]}).status_code, 400)
+        self.purchase.refresh_from_db()
+        self.assertEqual(self.purchase.status, 'pending')
+
+    def test_checks_without_completing(self):
+        response = self.verify({'purchase_ids': [self.purchase.pk], 'complete': False})
+        self.assertEqual(response.status_code, 200)
+        self.purchase.refresh_from_db()
+        self.assertEqual(self.purchase.status, 'pending')
+
+
+@override_settings(PROFILING_ENABLED=True, RATE_LIMIT_ENABLED=False)
+class ProfilingTests(CacheClearingTestCase):
+    def setUp(self):
+        super().setUp()
+        self.admin = User.objects.create_user('seller', password='pass-123', role='admin')
+        self.token = profiling.make_token(self.admin)
+
+    def test_profiles_requests_sending_the_header(self):
+        response = self.client.get('/v1/categories/', HTTP_X_PROFILE=self.token)
+        self.assertIn('X-Profile', response)
+
+    def test_stops_profiling_once_the_admin_is_demoted_or_deactivated(self):
+        for change in ({'role': 'customer'}, {'is_active': False}):
+            with self.subTest(change=change):
+                User.objects.filter(pk=self.admin.pk).update(**change)
+                response = self.client.get('/v1/categories/', HTTP_X_PROFILE=self.token)
+                self.assertEqual(response.status_code, 200)
+                self.assertNotIn('X-Profile', response)
+                User.objects.filter(pk=self.admin.pk).update(role='admin', is_active=True)
+
+    def test_ignores_the_token_in_the_query_string(self):
+        response = self.client.get('/v1/categories/', {'_profile': self.token})
+        self.assertNotIn('X-Profile', response)
+
+    @override_settings(STORAGES={
+        'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+        'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+    })
+    def test_viewer_shows_a_header_command(self):
+        self.client.force_login(self.admin)
+        response = self.client.get('/profiles/', {'path': '/v1/categories/'})
+        self.assertContains(response, 'X-Profile: ')
+        self.assertNotContains(response, '_profile=')
+
+
+class QrTokenTests(SimpleTestCase):
+    def expiry(self, seconds):
+        return datetime.fromtimestamp(int(time.time()) + seconds, tz=dt_timezone.utc)
+
+    def test_round_trip(self):
+        expires_at = self.expiry(600)
+        token = encode_qr_token(42, [907, 15, 300, 15], expires_at)
+        self.assertTrue(all(char in BASE45_ALPHABET for char in token))
+        self.assertEqual(parse_qr_token(token), {
+            'user_id': 42,
+            'purchase_ids': [15, 300, 907],
+            'expires_at': expires_at,
+        })
+
+    def test_rejects_tampered_tokens(self):
+        token = encode_qr_token(42, [15], self.expiry(600))
+        raw = bytearray(base45_decode(token))
+        raw[5] ^= 1  # another user id
+        with self.assertRaisesMessage(ValueError, 'signature'):
+            parse_qr_token(base45_encode(bytes(raw)))
+        with self.assertRaises(ValueError):
+            parse_qr_token(token[:-3])
+        with self.assertRaises(ValueError):
+            parse_qr_token('not a token!')
+
+    def test_rejects_expired_tokens(self):
+        token = encode_qr_token(42, [15], self.expiry(-1))
+        with self.assertRaisesMessage(ValueError, 'expired'):
+            parse_qr_token(token)
+
+
+@override_settings(OTP_MAX_ATTEMPTS=3)
+class CacheOTPStoreTests(ClearCachesMixin, SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        self.store = CacheOTPStore()
+        self.user = User(pk=7)
+
+    def test_code_is_single_use(self):
+        self.store.create(self.user, '123456', 'pickup')
+        self.assertTrue(self.store.verify(self.user, '123456', 'pickup')['valid'])
+        self.assertFalse(self.store.verify(self.user, '123456', 'pickup')['valid'])
+
+    def test_wrong_guesses_burn_the_code(self):
+        self.store.create(self.user, '123456', 'pickup')
+        for _ in range(2):
+            self.assertEqual(self.store.verify(self.user, '000000', 'pickup')['error'], 'Invalid OTP code')
+        self.assertIn('Too many attempts', self.store.verify(self.user, '000000', 'pickup')['error'])
+        # The right code no longer works either
+        self.assertFalse(self.store.verify(self.user, '123456', 'pickup')['valid'])
+
+    def test_new_code_replaces_the_old_one(self):
+        self.store.create(self.user, '111111', 'pickup')
+        self.store.create(self.user, '222222', 'pickup')
+        self.assertFalse(self.store.verify(self.user, '111111', 'pickup')['valid'])
+        self.assertTrue(self.store.verify(self.user, '222222', 'pickup')['valid'])
+
+    def test_codes_are_scoped_to_the_purpose(self):
+        self.store.create(self.user, '123456', 'pickup')
+        self.assertFalse(self.store.verify(self.user, '123456', 'password_reset')['valid'])
+
+
+class LikeTestCase(CacheClearingTestCase):
+    def setUp(self):
+        super().setUp()
+        seller = User.objects.create_user('seller', password='pass-123', role='admin')
+        self.user = User.objects.create_user('shopper', password='pass-123')
+        self.post = Post.objects.create(user=seller, title='Runner', price=10, inventory=1)
+
+
+class ToggleLikeTests(LikeTestCase):
+    def test_toggles_the_row_and_the_counter(self):
+        self.assertEqual(like_service.toggle_like(self.post.pk, self.user.pk), (True, 1))
+        self.assertTrue(PostLike.objects.filter(post=self.post, user=self.user).exists())
+        self.assertEqual(like_service.toggle_like(self.post.pk, self.user.pk), (False, 0))
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.like_count, 0)
+        self.assertFalse(PostLike.objects.exists())
+
+
+    @override_settings(RATE_LIMIT_ENABLED=False)
+    def test_editing_a_product_keeps_a_concurrent_like(self):
+        self.client.force_login(self.post.user)
+        # The like lands after the edit loaded the product, just before it is saved
+        like = lambda post: like_service.toggle_like(post.pk, self.user.pk)
+        with mock.patch('authentication.models.update_image_placeholder', side_effect=like):
+            response = self.client.patch(
+                f'/api/rest/posts/{self.post.pk}/', encode_multipart(BOUNDARY, {'title': 'Trail Runner'}),
+                content_type=MULTIPART_CONTENT,
+            )
+
+        self.assertEqual(response.status_code, 200)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.title, 'Trail Runner')
+        self.assertEqual(self.post.like_count, 1)
+
+
+# The flusher thread would write through its own connection; tests flush by hand
+@override_settings(LIKE_WRITE_BEHIND=True)
+@mock.patch.object(like_service.like_flusher, 'ensure_started')
+class WriteBehindLikeTests(LikeTestCase):
+    def test_toggles_are_buffered_until_flushed(self, ensure_started):
+        like_service.toggle_like(self.post.pk, self.user.pk)
+        like_service.toggle_like(self.post.pk, self.user.pk)
+        self.assertEqual(like_service.toggle_like(self.post.pk, self.user.pk), (True, 1))
+        self.assertFalse(PostLike.objects.exists())
+
+        self.assertEqual(like_service.flush_pending_likes(), 3)
+
+        self.assertEqual(PostLike.objects.filter(post=self.post, user=self.user).count(), 1)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.like_count, 1)
+        self.assertEqual(like_service.like_count(self.post.pk), 1)
+        self.assertEqual(like_service.flush_pending_likes(), 0)
+
+    def test_flush_removes_unliked_rows(self, ensure_started):
+        like_service.toggle_like(self.post.pk, self.user.pk)
+        like_service.flush_pending_likes()
+        self.assertEqual(like_service.toggle_like(self.post.pk, self.user.pk), (False, 0))
+
+        like_service.flush_pending_likes()
+
+        self.assertFalse(PostLike.objects.exists())
+        self.assertEqual(like_service.like_count(self.post.pk), 0)
+
+
+@override_settings(RATE_LIMIT_ENABLED=False)
+class AsyncAuthViewTests(SimpleTestCase):
+    def post(self, view, body):
+        request = AsyncRequestFactory().post('/', body, content_type='application/json')
+        return async_to_sync(view)(request)
+
+    def test_rejects_json_that_is_not_an_object(self):
+        for view in (async_views.login_api, async_views.register_api):
+            for body in ('[]', '"x"', 'not json'):
+                with self.subTest(view=view.__name__, body=body):
+                    response = self.post(view, body)
+                    self.assertEqual(response.status_code, 400)
+                    self.assertEqual(json.loads(response.content)['message'], 'Invalid JSON data')
+        for view in (async_views.user_login_view, async_views.user_registration_view):
+            with self.subTest(view=view.__name__):
+                self.assertEqual(self.post(view, '[]').status_code, 400)
+
+    def test_rejects_missing_credentials(self):
+        response = self.post(async_views.login_api, json.dumps({'username': 'alice'}))
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('credentials', json.loads(response.content)['errors'])
+
+    def test_rejects_logins_over_the_concurrency_limit(self):
+        limiter = async_views.username_limiter
+        for _ in range(limiter.limit):
+            self.assertTrue(limiter.try_acquire('alice'))
+            self.addCleanup(limiter.release, 'alice')
+
+        response = self.post(async_views.login_api, json.dumps({'username': 'Alice', 'password': 'pass-123'}))
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '1')
+        # A rejected attempt gives back the slots it took
+        self.assertEqual(async_views.pending_limiter._counts, {})
+
+
+class ImagePlaceholderTests(CacheClearingTestCase):
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root))
+        self.seller = User.objects.create_user('seller', password='pass-123', role='admin')
+
+    def upload(self, colour):
+        buffer = io.BytesIO()
+        Image.new('RGB', (64, 48), colour).save(buffer, format='PNG')
+        return SimpleUploadedFile('shoe.png', buffer.getvalue(), 'image/png')
+
+    def test_upload_stores_a_placeholder_and_dominant_colour(self):
+        post = Post.objects.create(user=self.seller, title='Runner', price=10, inventory=1, image=self.upload((200, 30, 40)))
+
+        post.refresh_from_db()
+        self.assertTrue(post.image_placeholder.startswith('data:image/png;base64,'))
+        self.assertLess(len(post.image_placeholder), 1024)
+        self.assertEqual(post.dominant_color, '#c81e28')
+
+    def test_saving_again_does_not_reread_the_image(self):
+        post = Post.objects.create(user=self.seller, title='Runner', price=10, inventory=1, image=self.upload((0, 0, 0)))
+        post = Post.objects.get(pk=post.pk)
+        with mock.patch('authentication.image_utils.compute_image_placeholder') as compute:
+            post.title = 'Trail Runner'
+            post.save()
+        compute.assert_not_called()
+
+
+class MailWorkerTests(SimpleTestCase):
+    def message(self, number):
+        return EmailMultiAlternatives(f'Order {number}', 'Thanks', 'shop@example.com', ['buyer@example.com'])
+
+    def test_delivers_a_batch_over_one_connection(self):
+        worker = MailWorker(idle_timeout=1)
+        with mock.patch('authentication.mail_utils.get_connection', wraps=get_connection) as connect:
+            worker.enqueue(*(self.message(number) for number in range(3)))
+            self.assertTrue(worker.flush(timeout=5))
+
+        self.assertEqual(sorted(email.subject for email in mail.outbox), ['Order 0', 'Order 1', 'Order 2'])
+        self.assertEqual(connect.call_count, 1)
+        self.assertEqual(worker.sent_count, 3)
+
+    def test_retry_resumes_at_the_failed_message(self):
+        sent = []
+        failures = [smtplib.SMTPServerDisconnected('connection lost')]
+
+        def send_messages(messages):
+            if len(sent) == 1 and failures:
+                raise failures.pop()
+            sent.extend(messages)
+
+        connection = mock.Mock(send_messages=mock.Mock(side_effect=send_messages))
+        worker = MailWorker(retry_backoff=0)
+        with mock.patch('authentication.mail_utils.get_connection', return_value=connection):
+            worker._deliver([self.message(number) for number in range(3)])
+
+        self.assertEqual([email.subject for email in sent], ['Order 0', 'Order 1', 'Order 2'])
+        self.assertEqual((worker.sent_count, worker.failed_count), (3, 0))
+        self.assertEqual(connection.open.call_count, 2)
+
+
+class FastJsonTests(SimpleTestCase):
+    payload = {
+        'price': Decimal('12.50'),
+        'created_at': datetime(2026, 10, 19, 7, 0, 0, 123456, tzinfo=dt_timezone.utc),
+        'day': date(2026, 10, 19),
+        'order_id': uuid.UUID(int=5),
+        'label': gettext_lazy('Sneakers'),
+        'name': 'Chaussure été',
+        'values': [1, 2.5, None, True],
+    }
+
+    def test_json_response_matches_django(self):
+        for backend in ('orjson', 'stdlib'):
+            with self.subTest(backend=backend), override_settings(JSON_BACKEND=backend):
+                self.assertEqual(
+                    json.loads(JsonResponse(self.payload).content),
+                    json.loads(DjangoJsonResponse(self.payload).content),
+                )
+
+    def test_renderer_matches_drf(self):
+        expected = JSONRenderer().render(self.payload)
+        for backend in ('orjson', 'stdlib'):
+            with self.subTest(backend=backend), override_settings(JSON_BACKEND=backend):
+                self.assertEqual(FastJSONRenderer().render(self.payload), expected)
+
+    def test_renderer_escapes_line_separators(self):
+        self.assertEqual(FastJSONRenderer().render({'text': 'a b'}), b'{"text":"a\\u2028b"}')
+
+
+# The async views run their queries on pool threads with their own
+# connections, so the data they read has to be committed
+class AsyncCatalogViewTests(ClearCachesMixin, TransactionTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('shopper', password='pass-123')
+        self.token = Token.objects.create(user=self.user)
+        seller = User.objects.create_user('seller', password='pass-123', role='admin')
+        for number in range(3):
+            Post.objects.create(user=seller, title=f'Runner {number}', price=10 + number, inventory=2)
+
+    def get(self, view, path='/', **headers):
+        headers.setdefault('Authorization', f'Bearer {self.token.key}')
+        request = AsyncRequestFactory().get(path, headers=headers)
+        request.user = AnonymousUser()
+        if asyncio.iscoroutinefunction(view):
+            async def auser():
+                return request.user
+            request.auser = auser
+            return async_to_sync(view)(request)
+        return view(request)
+
+    def test_dashboard_matches_the_sync_view(self):
+        for path in ('/', '/?sort=price_high', '/?q=runner&page=9'):
+            with self.subTest(path=path):
+                response = self.get(async_catalog_views.dashboard_api, path)
+                self.assertEqual(response.status_code, 200)
+                data = json.loads(response.content)
+                self.assertEqual(data['data']['summary']['total_products'], 3)
+                self.assertEqual(data, json.loads(self.get(views.dashboard_api, path).content))
+
+    def test_dashboard_requires_a_valid_token(self):
+        response = self.get(async_catalog_views.dashboard_api, Authorization='Bearer made-up')
+        self.assertEqual(response.status_code, 401)
+
+    @override_settings(RATE_LIMITS={'dashboard': {'user': '1/m'}})
+    def test_dashboard_is_rate_limited(self):
+        self.assertEqual(self.get(async_catalog_views.dashboard_api).status_code, 200)
+        response = self.get(async_catalog_views.dashboard_api)
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+
+    def test_unchanged_categories_are_not_modified(self):
+        etag = self.get(async_catalog_views.categories_api)['ETag']
+        self.assertEqual(self.get(async_catalog_views.categories_api, **{'If-None-Match': etag}).status_code, 304)
+
+
+@override_settings(SERVER_TIMING_ENABLED=True, SERVER_TIMING_LOG=False)
+class ServerTimingTests(CacheClearingTestCase):
+    def test_reports_the_queries_and_cache_lookups_of_the_request(self):
+        with CaptureQueriesContext(connection) as queries:
+            first = self.client.get('/v1/categories/')['Server-Timing']
+        self.assertIn(f'desc="{len(queries)} queries"', first)
+        self.assertIn('cache;desc="0 hits, 1 misses"', first)
+
+        # The category counts were cached by the first request
+        second = self.client.get('/v1/categories/')['Server-Timing']
+        self.assertIn('db;dur=0.0;desc="0 queries"', second)
+        self.assertIn('cache;desc="1 hits, 0 misses"', second)
+        self.assertIn('total;dur=', second)
+
+    @override_settings(SERVER_TIMING_LOG=True)
+    def test_logs_one_line_per_request(self):
+        with self.assertLogs('authentication.timing', 'INFO') as logs:
+            self.client.get('/v1/categories/')
+        self.assertEqual(len(logs.records), 1)
+        self.assertEqual(logs.records[0].timing['path'], '/v1/categories/')
+        self.assertEqual(logs.records[0].timing['status'], 200)
+
+    @override_settings(SERVER_TIMING_SAMPLE_RATE=0)
+    def test_unsampled_requests_are_not_measured(self):
+        self.assertNotIn('Server-Timing', self.client.get('/v1/categories/'))
+
+
+class NPlusOneDetectorTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for number in range(5):
+            seller = User.objects.create_user(f'seller{number}', password='pass-123', role='admin')
+            Post.objects.create(user=seller, title=f'Runner {number}', price=10, inventory=1)
+
+    def test_reports_a_foreign_key_read_in_a_loop(self):
+        with self.assertRaises(NPlusOneError) as caught:
+            with detect_nplusone(label='sellers'):
+                [post.user.username for post in Post.objects.all()]
+
+        report = str(caught.exception)
+        self.assertTrue(report.startswith('N+1 queries in sellers:\n5 queries like: SELECT'))
+        self.assertIn('code: authentication/tests.py:', report)
+        self.assertIn("suggestion: Post.user: select_related('user')", report)
+
+    def test_reports_a_related_count_in_a_loop(self):
+        with self.assertRaises(NPlusOneError) as caught:
+            with detect_nplusone():
+                [post.reviews.count() for post in Post.objects.all()]
+        self.assertIn('suggestion: Post.reviews: annotate the count() onto the Post queryset', str(caught.exception))
+
+    def test_accepts_the_suggested_fix_and_short_loops(self):
+        with detect_nplusone() as detector:
+            [post.user.username for post in Post.objects.select_related('user')]
+            [post.user.username for post in Post.objects.all()[:4]]
+        self.assertEqual(detector.problems(), [])
+
+
+class SeedStoreTests(TestCase):
+    volumes = {
+        'customers': 20, 'admins': 2, 'products': 30, 'images': 10,
+        'purchases': 100, 'likes': 50, 'reviews': 40, 'bookmarks': 40,
+    }
+
+    def seed(self, prefix='seed', **options):
+        call_command('seed_store', prefix=prefix, stdout=io.StringIO(), **self.volumes, **options)
+
+    def test_generates_the_requested_volumes(self):
+        self.seed()
+
+        self.assertEqual(User.objects.filter(username__startswith='seed_admin_', role='admin').count(), 2)
+        self.assertEqual(User.objects.filter(username__startswith='seed_customer_', role='customer').count(), 20)
+        for model, count in [(Post, 30), (ProductImage, 10), (Purchase, 100), (PostLike, 50),
+                             (ProductReview, 40), (Bookmark, 40)]:
+            with self.subTest(model=model.__name__):
+                self.assertEqual(model.objects.count(), count)
+        self.assertTrue(User.objects.get(username='seed_customer_0').check_password('seed-pass-123'))
+
+    def test_fills_in_the_denormalised_counters(self):
+        self.seed()
+
+        for post in Post.objects.annotate(purchases_made=Count('purchases', distinct=True),
+                                          likes_made=Count('postlike', distinct=True)):
+            self.assertEqual(post.total_purchases, post.purchases_made)
+            self.assertEqual(post.like_count, post.likes_made)
+
+    def test_the_same_seed_gives_the_same_products(self):
+        self.seed(prefix='first')
+        self.seed(prefix='second')
+
+        def products(prefix):
+            return list(Post.objects.filter(user__username__startswith=prefix).order_by('pk')
+                        .values_list('title', 'price', 'category', 'inventory'))
+        self.assertEqual(len(products('first_')), 30)
+        self.assertEqual(products('first_'), products('second_'))
+
+    def test_refuses_to_seed_a_prefix_twice(self):
+        self.seed()
+        with self.assertRaisesMessage(CommandError, 'Users named seed_* already exist'):
+            self.seed()
+
+
+class TaggedCacheTests(CacheClearingTestCase):
+    def setUp(self):
+        super().setUp()
+        self.calls = 0
+
+        @cached_function(timeout=60, tags=lambda post_id: [post_tag(post_id)])
+        def lookup(post_id):
+            self.calls += 1
+            return self.calls
+        self.lookup = lookup
+
+    def test_entries_are_served_until_their_tag_is_invalidated(self):
+        self.assertEqual([self.lookup(1), self.lookup(1), self.lookup(2)], [1, 1, 2])
+
+        invalidate_tags(post_tag(1))
+        self.assertEqual([self.lookup(1), self.lookup(2)], [3, 2])
+
+    def test_other_processes_see_the_invalidation_through_the_shared_tier(self):
+        self.lookup(1)
+        # Another process bumps the tag; this one's L1 keeps the entry and
+        # its tag version until they expire
+        caches['default'].incr(f'cache_tag:{post_tag(1)}')
+        self.assertEqual(self.lookup(1), 1)
+
+        caches['local'].clear()
+        self.assertEqual(self.lookup(1), 2)
+
+    def test_saving_a_product_invalidates_its_category_counts(self):
+        seller = User.objects.create_user('seller', password='pass-123', role='admin')
+        self.assertEqual(views.in_stock_category_counts(), {})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Post.objects.create(user=seller, title='Runner', price=10, inventory=1, category='sneakers')
+        self.assertEqual(views.in_stock_category_counts(), {'sneakers': 1})
+
+    @override_settings(CACHE_TAGS_ENABLED=False)
+    def test_tagged_entries_are_not_stored_without_shared_tag_versions(self):
+        self.assertEqual([self.lookup(1), self.lookup(1)], [1, 2])
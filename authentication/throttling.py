@@ -0,0 +1,194 @@
+"""
+Cache-backed sliding-window rate limiting.
+
+Each limit keeps two fixed-window counters in the cache (current and previous
+window) and weights the previous one by how much of it still overlaps the
+sliding window, which approximates a true sliding log with two keys and no
+per-request lists. Rejected requests are not counted, so a client that keeps
+hammering is let back in as soon as its window drains.
+
+Limits are configured per scope in settings.RATE_LIMITS, keyed by what they
+count:
+    'user'  - the authenticated user (session or valid API token), falling back to the IP
+    'ip'    - the client IP
+    'route' - every client together, to shed load before the database saturates
+
+Hand-written views use the @rate_limit(scope) decorator; REST views use the
+DRF throttle classes at the bottom of this module.
+"""
+
+import functools
+import math
+import time
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.throttling import BaseThrottle
+
+from .http_utils import get_client_ip
+from .json_utils import JsonResponse
+from .token_auth import get_bearer_token, get_user_for_token
+
+RATE_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+class RateLimitExceeded(Exception):
+    """Raised by check_rate_limit callers that are not views (e.g. the OTP sender)"""
+
+    def __init__(self, retry_after):
+        self.retry_after = retry_after
+        super().__init__(f'Rate limit exceeded, retry after {retry_after} seconds')
+
+
+def parse_rate(rate):
+    """'120/m' -> (120, 60); also accepts '5/10m' style multi-unit windows"""
+    count, period = rate.split('/')
+    multiplier = int(period[:-1] or 1)
+    return int(count), multiplier * RATE_UNITS[period[-1]]
+
+
+def _cache():
+    return caches[getattr(settings, 'RATE_LIMIT_CACHE_ALIAS', 'default')]
+
+
+def _check(key, rate, now):
+    """
+    Whether one more request against `key` fits in `rate`, without counting it.
+    Returns (wait, counter): wait is 0 when it fits, otherwise the seconds to
+    wait before retrying; counter is what _record() needs to count it.
+    """
+    limit, window = parse_rate(rate)
+    current = int(now // window)
+    elapsed = now - current * window
+
+    current_key = f"ratelimit:{key}:{window}:{current}"
+    previous_key = f"ratelimit:{key}:{window}:{current - 1}"
+    counts = _cache().get_many([current_key, previous_key])
+    current_count = counts.get(current_key, 0)
+    previous_count = counts.get(previous_key, 0)
+
+    overlap = 1 - elapsed / window
+    if previous_count * overlap + current_count + 1 > limit:
+        # Wait until enough of the previous window has slid out to make room
+        if previous_count and current_count < limit:
+            needed = (previous_count + current_count + 1 - limit) / previous_count
+            return max(1, math.ceil(needed * window - elapsed)), None
+        return max(1, math.ceil(window - elapsed)), None
+    return 0, (current_key, window)
+
+
+def _record(counter):
+    current_key, window = counter
+    cache = _cache()
+    if not cache.add(current_key, 1, timeout=window * 2):
+        try:
+            cache.incr(current_key)
+        except ValueError:
+            cache.set(current_key, 1, timeout=window * 2)
+
+
+def hit(key, rate, now=None):
+    """
+    Record one request against `key` if it fits in `rate`.
+    Returns 0 when allowed, otherwise the seconds to wait before retrying.
+    """
+    wait, counter = _check(key, rate, time.time() if now is None else now)
+    if not wait:
+        _record(counter)
+    return wait
+
+
+def check_rate_limit(scope, identities):
+    """
+    Apply every configured limit of `scope`; identities maps 'user'/'ip' to
+    the caller's identity ('route' needs none). Returns the wait in seconds
+    for the first limit that is exceeded, or 0 when the request is allowed.
+    The request is counted against every limit only once all of them allow
+    it, so a rejected request uses up none of the windows.
+    """
+    if not getattr(settings, 'RATE_LIMIT_ENABLED', True):
+        return 0
+    now = time.time()
+    counters = []
+    # Cheapest and broadest limits first, so shed requests touch fewer keys
+    limits = getattr(settings, 'RATE_LIMITS', {}).get(scope, {})
+    for kind in ('route', 'ip', 'user'):
+        rate = limits.get(kind)
+        if rate is None:
+            continue
+        identity = 'all' if kind == 'route' else identities.get(kind)
+        if identity is None:
+            continue
+        wait, counter = _check(f"{scope}:{kind}:{identity}", rate, now)
+        if wait:
+            return wait
+        counters.append(counter)
+    for counter in counters:
+        _record(counter)
+    return 0
+
+
+def request_identities(request, user=None):
+    """
+    Identities of a request: the session user, else the user of a valid Bearer
+    token (a cached lookup), else the IP. Made-up tokens share their IP's bucket.
+    """
+    ip = get_client_ip(request)
+    if user is None:
+        user = getattr(request, 'user', None)
+    if user is None or not getattr(user, 'is_authenticated', False):
+        token = get_bearer_token(request)
+        user = get_user_for_token(token) if token else None
+    user_identity = f"user:{user.pk}" if user is not None else f"ip:{ip}"
+    return {'ip': ip, 'user': user_identity}
+
+
+def too_many_requests(retry_after):
+    response = JsonResponse({
+        'success': False,
+        'message': 'Too many requests',
+        'errors': {'throttle': [f'Request limit reached. Please retry in {retry_after} seconds.']}
+    }, status=429)
+    response['Retry-After'] = str(retry_after)
+    return response
+
+
+def rate_limit(scope):
+    """
+    Throttle a function view (sync or async) with the limits of RATE_LIMITS[scope].
+    Over-limit requests get 429 with Retry-After before the view runs.
+    """
+    def decorator(view_func):
+        if iscoroutinefunction(view_func):
+            async def wrapper(request, *args, **kwargs):
+                user = await request.auser() if hasattr(request, 'auser') else None
+                # Token lookups and the cache counters block, so keep them off the event loop
+                wait = await sync_to_async(lambda: check_rate_limit(scope, request_identities(request, user)))()
+                if wait:
+                    return too_many_requests(wait)
+                return await view_func(request, *args, **kwargs)
+        else:
+            def wrapper(request, *args, **kwargs):
+                wait = check_rate_limit(scope, request_identities(request))
+                if wait:
+                    return too_many_requests(wait)
+                return view_func(request, *args, **kwargs)
+        return functools.wraps(view_func)(wrapper)
+    return decorator
+
+
+class SlidingWindowThrottle(BaseThrottle):
+    """
+    DRF throttle backed by the same sliding windows as @rate_limit.
+    Uses the view's `throttle_scope` (default 'api') to pick RATE_LIMITS entries.
+    """
+    default_scope = 'api'
+
+    def allow_request(self, request, view):
+        scope = getattr(view, 'throttle_scope', None) or self.default_scope
+        self.wait_seconds = check_rate_limit(scope, request_identities(request, request.user))
+        return not self.wait_seconds
+
+    def wait(self):
+        return self.wait_seconds
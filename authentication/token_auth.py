@@ -0,0 +1,75 @@
+import hashlib
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+
+def _cache():
+    return caches[getattr(settings, 'TOKEN_AUTH_CACHE_ALIAS', 'default')]
+
+def _token_cache_key(key):
+    # Hash the key so raw API tokens never appear in the cache
+    return f"auth_token:{hashlib.sha256(key.encode('utf-8')).hexdigest()}"
+
+def _user_cache_key(user_id):
+    return f"auth_token_user:{user_id}"
+
+def get_user_for_token(key):
+    """
+    Resolve an API token to an active user.
+    With TOKEN_AUTH_CACHE_ENABLED the token -> user mapping is cache-resident,
+    so a warm lookup costs no queries; otherwise, and on a miss, one query
+    loads the token and user together.
+    Returns None for unknown tokens and inactive users.
+    """
+    if not key:
+        return None
+
+    use_cache = getattr(settings, 'TOKEN_AUTH_CACHE_ENABLED', False)
+    cache = _cache()
+    cache_key = _token_cache_key(key)
+    user = cache.get(cache_key) if use_cache else None
+
+    if user is None:
+        from rest_framework.authtoken.models import Token
+        try:
+            token = Token.objects.select_related('user').get(key=key)
+        except Token.DoesNotExist:
+            return None
+        user = token.user
+        if use_cache:
+            timeout = getattr(settings, 'TOKEN_AUTH_CACHE_TIMEOUT', 300)
+            cache.set_many({cache_key: user, _user_cache_key(user.pk): cache_key}, timeout=timeout)
+
+    if not user.is_active:
+        return None
+    return user
+
+def invalidate_user_tokens(user_id):
+    """Drop the cached token mapping for a user (logout, password change, deactivation)"""
+    cache = _cache()
+    user_key = _user_cache_key(user_id)
+    cache_key = cache.get(user_key)
+    if cache_key:
+        cache.delete_many([cache_key, user_key])
+
+def get_bearer_token(request):
+    """Extract the token from an `Authorization: Bearer <token>` header"""
+    auth_header = request.headers.get('Authorization', '')
+    if not auth_header.startswith('Bearer '):
+        return None
+    return auth_header[len('Bearer '):].strip() or None
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    DRF token authentication using the cached token -> user mapping.
+    Accepts the same `Authorization: Bearer <token>` header as the v1 API.
+    """
+    keyword = 'Bearer'
+
+    def authenticate_credentials(self, key):
+        user = get_user_for_token(key)
+        if user is None:
+            raise exceptions.AuthenticationFailed('Invalid token.')
+        return (user, key)
@@ -1,12 +1,22 @@
+from django.conf import settings
 from django.urls import path, include
 from . import views
 from . import api_views
+from . import async_views
+from . import async_catalog_views
+from . import batch_views
+from . import metrics
+from . import profiling
+from . import sync_views
 from django.contrib.auth import views as auth_views
 
+# Under ASGI (ASYNC_VIEWS=True) the read-heavy catalog views run their queries concurrently
+catalog_views_module = async_catalog_views if settings.ASYNC_VIEWS else views
+
 urlpatterns = [
     # Public landing page
-    path('', views.landing_page, name='landing_page'),
-    path('home/', views.landing_page, name='home'),
+    path('', catalog_views_module.landing_page, name='landing_page'),
+    path('home/', catalog_views_module.landing_page, name='home'),
     
     # Authentication
     path('register/', views.register, name='register'),
@@ -22,7 +32,7 @@ urlpatterns = [
     path('like-post/<int:post_id>/', views.like_post, name='like_post'),
     
     # Post detail and actions
-    path('post/<int:post_id>/', views.post_detail, name='post_detail'),
+    path('post/<int:post_id>/', catalog_views_module.post_detail, name='post_detail'),
     path('post/<int:post_id>/purchase/', views.purchase_product, name='purchase_product'),
     path('bookmark/<int:post_id>/', views.bookmark_toggle, name='bookmark_toggle'),
     
@@ -34,21 +44,38 @@ urlpatterns = [
     path('purchases/', views.purchase_history, name='purchase_history'),
     path('bookmarks/', views.bookmarks, name='bookmarks'),
     
-    # Removed complex QR code and OTP URLs for simplified workflow
+    # Pickup QR code, rendered in memory on each request
+    path('qr-code/image/', views.user_qr_code_image, name='user_qr_code_image'),
+    
+    # Request profiles (admins only)
+    path('profiles/', profiling.profile_list, name='profile_list'),
+    path('profiles/<int:number>/', profiling.profile_detail, name='profile_detail'),
+    path('profiles/<int:number>/download/', profiling.profile_download, name='profile_download'),
+    
+    # Prometheus scrape endpoint (METRICS_ENABLED)
+    path('metrics/', metrics.metrics_view, name='metrics'),
+    
+    # Removed complex OTP URLs for simplified workflow
     
     # REST API endpoints
     path('api/rest/', include('authentication.api_urls')),
 ]
 
+# Under ASGI (ASYNC_VIEWS=True) the auth endpoints hash passwords off the event loop
+auth_views_module = async_views if settings.ASYNC_VIEWS else views
+
 # API endpoints
 api_endpoints = [
-    path('v1/register/', views.register_api, name='register_api'),
-    path('v1/login/', views.login_api, name='login_api'),
+    path('v1/register/', auth_views_module.register_api, name='register_api'),
+    path('v1/login/', auth_views_module.login_api, name='login_api'),
     path('v1/logout/', views.logout_api, name='logout_api'),
-    path('v1/dashboard/', views.dashboard_api, name='dashboard_api'),
+    path('v1/dashboard/', catalog_views_module.dashboard_api, name='dashboard_api'),
     path('v1/bookmark/<int:post_id>/', views.bookmark_toggle_api, name='bookmark_toggle_api'),
+    path('v1/bookmarks/sync/', views.bookmark_sync_api, name='bookmark_sync_api'),
     path('v1/like/<int:post_id>/', views.like_post_api, name='like_post_api'),
-    path('v1/categories/', views.categories_api, name='categories_api'),
+    path('v1/categories/', catalog_views_module.categories_api, name='categories_api'),
+    path('v1/batch/', batch_views.batch_api, name='batch_api'),
+    path('v1/sync/', sync_views.sync_api, name='sync_api'),
 ]
 
 # Add api_endpoints to main urlpatterns
@@ -11,10 +11,11 @@ from django.contrib import messages
 from django.contrib.auth import login, authenticate, login as auth_login, logout as auth_logout
 from django.contrib.auth.forms import AuthenticationForm, UserCreationForm
 from django.contrib.auth.decorators import login_required
-from django.http import HttpResponse, JsonResponse, Http404
+from django.http import HttpResponse, Http404
 from django.views.decorators.csrf import ensure_csrf_cookie, csrf_protect
 from django.views.decorators.http import require_http_methods
-from django.db.models import Q, Sum, Count, Avg
+from django.db import transaction
+from django.db.models import F, Q, Sum, Count, Avg
 from django.utils import timezone
 from django.core.paginator import Paginator
 
@@ -27,14 +28,37 @@ from reportlab.pdfgen import canvas
 from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_RIGHT
 
 from .forms import SignUpForm, ProductReviewForm
+from .cache_utils import cached_function, model_tag
+from . import bookmark_service, inventory_service, like_service, profiling
 from .models import User, Post, Purchase, Bookmark, ProductImage, ProductReview
-# Removed QR and OTP utilities for simplified workflow
+from .auth_backends import invalidate_cached_user
+from .qr_utils import generate_user_qr_data, render_qr_image
+from .mail_utils import send_order_confirmation_email
+from .token_auth import get_user_for_token, get_bearer_token, invalidate_user_tokens
+from .http_utils import catalog_etag, etag_conditional
+from .json_utils import JsonResponse
+from .throttling import rate_limit
 from django.views.decorators.csrf import csrf_exempt
 
 # ============================================
 # LANDING PAGE (PUBLIC)
 # ============================================
 
+@cached_function(timeout=600, tags=[model_tag(Post)])
+def in_stock_category_counts():
+    """{category: number of in-stock products}, in one grouped query"""
+    rows = Post.objects.filter(inventory__gt=0).values('category').annotate(count=Count('id')).order_by()
+    return {row['category']: row['count'] for row in rows}
+
+@cached_function(timeout=600, tags=[model_tag(Post), model_tag(Purchase)])
+def landing_page_stats():
+    # Customer count is only refreshed by the timeout (User is not tag-invalidated)
+    return {
+        'total_products': Post.objects.filter(inventory__gt=0).count(),
+        'total_orders': Purchase.objects.filter(status='completed').count(),
+        'happy_customers': User.objects.filter(role='customer').count(),
+    }
+
 def landing_page(request):
     """
     Main landing page for KoraQuest - Public facing homepage
@@ -57,12 +81,10 @@ def landing_page(request):
     ).order_by('-created_at')[:4]
     
     # Get all categories with product counts
+    counts = in_stock_category_counts()
     categories_with_counts = []
     for category_code, category_name in Post.CATEGORY_CHOICES:
-        count = Post.objects.filter(
-            category=category_code,
-            inventory__gt=0
-        ).count()
+        count = counts.get(category_code, 0)
         if count > 0:  # Only show categories with products
             categories_with_counts.append({
                 'code': category_code,
@@ -76,11 +98,7 @@ def landing_page(request):
     ).select_related('reviewer', 'product').order_by('-created_at')[:6]
     
     # Statistics for "Why Choose Us" section
-    stats = {
-        'total_products': Post.objects.filter(inventory__gt=0).count(),
-        'total_orders': Purchase.objects.filter(status='completed').count(),
-        'happy_customers': User.objects.filter(role='customer').count(),
-    }
+    stats = landing_page_stats()
     
     context = {
         'new_arrivals': new_arrivals,
@@ -216,7 +234,7 @@ def register_api(request):
                     'first_name': user.first_name,
                     'last_name': user.last_name,
                     'role': user.role,
-                    'is_vendor_role': user.is_vendor_role
+                    'is_vendor_role': user.is_admin
                 }
             }, status=201)  # 201 for successful creation
         else:
@@ -252,6 +270,7 @@ def login_view(request):
 
 @csrf_exempt
 @require_http_methods(['POST'])
+@rate_limit('login')
 def login_api(request):
     """API endpoint for user login"""
     try:
@@ -312,7 +331,7 @@ def login_api(request):
                                 'first_name': user.first_name,
                                 'last_name': user.last_name,
                                 'role': user.role,
-                                'is_vendor_role': user.is_vendor_role,
+                                'is_vendor_role': user.is_admin,
                                 'phone_number': getattr(user, 'phone_number', ''),
                                 'last_login': user.last_login.isoformat() if user.last_login else None
                             },
@@ -337,7 +356,7 @@ def login_api(request):
                                 'first_name': user.first_name,
                                 'last_name': user.last_name,
                                 'role': user.role,
-                                'is_vendor_role': user.is_vendor_role,
+                                'is_vendor_role': user.is_admin,
                                 'phone_number': getattr(user, 'phone_number', ''),
                                 'last_login': user.last_login.isoformat() if user.last_login else None
                             }
@@ -385,6 +404,10 @@ def logout_view(request):
 @csrf_exempt
 @require_http_methods(['POST'])
 def logout_api(request):
+    # Drop the cached token mapping; the token itself stays valid for the client's other sessions
+    token_user = get_token_user(request)
+    if token_user:
+        invalidate_user_tokens(token_user.pk)
     auth_logout(request)
     return JsonResponse({
         'message': 'you have been successfully logged out'
@@ -392,20 +415,19 @@ def logout_api(request):
 
 def get_token_user(request):
     """Helper function to get user from token authentication"""
-    auth_header = request.headers.get('Authorization')
-    if not auth_header or not auth_header.startswith('Bearer '):
-        return None
-    
-    token = auth_header.replace('Bearer ', '')
-    try:
-        from rest_framework.authtoken.models import Token
-        token_obj = Token.objects.get(key=token)
-        return token_obj.user
-    except:
+    return get_user_for_token(get_bearer_token(request))
+
+def dashboard_etag(request):
+    # Unauthenticated requests get no ETag and fall through to the 401 below
+    user = request.user if request.user.is_authenticated else get_token_user(request)
+    if not user:
         return None
+    return catalog_etag(request, user)
 
 @csrf_exempt
 @require_http_methods(['GET'])
+@rate_limit('dashboard')
+@etag_conditional(dashboard_etag)
 def dashboard_api(request):
     """API endpoint for dashboard data with filtering, sorting, and pagination"""
     try:
@@ -442,8 +464,8 @@ def dashboard_api(request):
         # Filter out sold-out products (inventory must be greater than 0)
         posts = posts.filter(inventory__gt=0)
         
-        # Filter out the user's own products if they are a vendor
-        if user.is_vendor_role:
+        # Filter out the user's own products if they are a vendor (store admin)
+        if user.is_admin:
             posts = posts.exclude(user=user)
         
         # Apply search filter if provided
@@ -512,6 +534,8 @@ def dashboard_api(request):
                 aux_images_data.append({
                     'id': img.id,
                     'image_url': img.image.url if img.image else None,
+                    'image_placeholder': img.image_placeholder or None,
+                    'dominant_color': img.dominant_color or None,
                     'display_order': img.display_order
                 })
             
@@ -532,6 +556,8 @@ def dashboard_api(request):
                 'updated_at': post.updated_at.isoformat(),
                 'total_purchases': post.total_purchases,
                 'image_url': post.image.url if post.image else None,
+                'image_placeholder': post.image_placeholder or None,
+                'dominant_color': post.dominant_color or None,
                 'auxiliary_images': aux_images_data,
                 'average_rating': avg_rating,
                 'review_count': reviews.count(),
@@ -543,7 +569,7 @@ def dashboard_api(request):
                     'username': post.user.username,
                     'first_name': post.user.first_name,
                     'last_name': post.user.last_name,
-                    'is_vendor_role': post.user.is_vendor_role,
+                    'is_vendor_role': post.user.is_admin,
                     'profile_picture_url': post.user.profile_picture.url if post.user.profile_picture else None
                 }
             }
@@ -591,7 +617,7 @@ def dashboard_api(request):
                 'user_info': {
                     'id': user.id,
                     'username': user.username,
-                    'is_vendor_role': user.is_vendor_role,
+                    'is_vendor_role': user.is_admin,
                     'total_bookmarks': len(bookmarked_posts),
                     'total_liked_posts': len(liked_posts)
                 },
@@ -620,8 +646,12 @@ def dashboard_api(request):
 
 @csrf_exempt 
 @require_http_methods(['POST'])
+@rate_limit('bookmark')
 def bookmark_toggle_api(request, post_id):
-    """API endpoint to toggle bookmark status"""
+    """
+    API endpoint to toggle bookmark status.
+    Send {"bookmarked": true|false} to set it idempotently instead (safe to retry).
+    """
     try:
         # Get user from token
         user = get_token_user(request)
@@ -632,21 +662,24 @@ def bookmark_toggle_api(request, post_id):
                 'errors': {'auth': ['Please provide valid authentication credentials']}
             }, status=401)
         
-        post = get_object_or_404(Post, id=post_id)
-        
-        # Check if this post is already bookmarked by the user
-        existing_bookmark = Bookmark.objects.filter(user=user, post=post).first()
+        try:
+            data = json.loads(request.body) if request.body else {}
+        except json.JSONDecodeError:
+            data = {}
+        desired = data.get('bookmarked') if isinstance(data, dict) else None
         
-        if existing_bookmark:
-            # If bookmark already existed, delete it (toggle off)
-            existing_bookmark.delete()
-            is_bookmarked = False
-            status_text = 'removed'
-        else:
-            # Create a new bookmark
-            Bookmark.objects.create(user=user, post=post)
-            is_bookmarked = True
-            status_text = 'added'
+        try:
+            if isinstance(desired, bool):
+                is_bookmarked = bookmark_service.set_bookmark(user.id, post_id, desired)
+            else:
+                is_bookmarked = bookmark_service.toggle_bookmark(user.id, post_id)
+        except Post.DoesNotExist:
+            return JsonResponse({
+                'success': False,
+                'message': 'Product not found',
+                'errors': {'post': [f'No product with id {post_id}']}
+            }, status=404)
+        status_text = 'added' if is_bookmarked else 'removed'
         
         return JsonResponse({
             'success': True,
@@ -667,6 +700,65 @@ def bookmark_toggle_api(request, post_id):
 
 @csrf_exempt
 @require_http_methods(['POST'])
+@rate_limit('bookmark')
+def bookmark_sync_api(request):
+    """
+    Apply an offline client's bookmark changes in one request.
+    Body: {"add": [post ids], "remove": [post ids]}; returns what changed and
+    the user's full bookmark set so the client can reconcile.
+    """
+    try:
+        user = get_token_user(request) if not request.user.is_authenticated else request.user
+        if not user:
+            return JsonResponse({
+                'success': False,
+                'message': 'Authentication required',
+                'errors': {'auth': ['Please provide valid authentication credentials']}
+            }, status=401)
+        
+        try:
+            data = json.loads(request.body)
+        except json.JSONDecodeError:
+            return JsonResponse({
+                'success': False,
+                'message': 'Invalid JSON data',
+                'errors': {'json': ['Request body contains invalid JSON']}
+            }, status=400)
+        
+        errors = {}
+        ids = {}
+        for field in ('add', 'remove'):
+            value = data.get(field, []) if isinstance(data, dict) else None
+            if not isinstance(value, list) or not all(isinstance(v, int) and not isinstance(v, bool) for v in value):
+                errors[field] = ['Must be a list of product ids']
+            ids[field] = value
+        if not errors and len(ids['add']) + len(ids['remove']) > bookmark_service.max_sync_items():
+            errors['add'] = [f'At most {bookmark_service.max_sync_items()} changes per request']
+        if errors:
+            return JsonResponse({
+                'success': False,
+                'message': 'Validation failed',
+                'errors': errors
+            }, status=400)
+        
+        result = bookmark_service.sync_bookmarks(user.id, add=ids['add'], remove=ids['remove'])
+        
+        return JsonResponse({
+            'success': True,
+            'message': 'Bookmarks synced successfully',
+            'data': result
+        }, status=200)
+        
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'message': 'Error syncing bookmarks',
+            'errors': {'server': [str(e)]}
+        }, status=500)
+
+@csrf_exempt
+@require_http_methods(['POST'])
+@rate_limit('like')
 def like_post_api(request, post_id):
     """API endpoint to toggle like status"""
     try:
@@ -679,23 +771,17 @@ def like_post_api(request, post_id):
                 'errors': {'auth': ['Please provide valid authentication credentials']}
             }, status=401)
         
-        post = get_object_or_404(Post, id=post_id)
+        post = get_object_or_404(Post.objects.only('id'), id=post_id)
         
-        if user in post.likes.all():
-            post.likes.remove(user)
-            liked = False
-            status_text = 'removed'
-        else:
-            post.likes.add(user)
-            liked = True
-            status_text = 'added'
+        liked, total_likes = like_service.toggle_like(post.id, user.id)
+        status_text = 'added' if liked else 'removed'
         
         return JsonResponse({
             'success': True,
             'message': f'Like {status_text} successfully',
             'data': {
                 'liked': liked,
-                'total_likes': post.total_likes(),
+                'total_likes': total_likes,
                 'status': status_text,
                 'post_id': post_id
             }
@@ -710,13 +796,15 @@ def like_post_api(request, post_id):
 
 @csrf_exempt
 @require_http_methods(['GET'])
+@etag_conditional(lambda request: catalog_etag(request))
 def categories_api(request):
     """API endpoint to get all available categories"""
     try:
+        counts = in_stock_category_counts()
         categories_data = []
         for choice in Post.CATEGORY_CHOICES:
             # Get count of products in each category
-            count = Post.objects.filter(category=choice[0], inventory__gt=0).count()
+            count = counts.get(choice[0], 0)
             categories_data.append({
                 'value': choice[0],
                 'label': choice[1],
@@ -941,18 +1029,25 @@ def purchase_product(request, post_id):
             except (ValueError, TypeError):
                 pass  # Ignore invalid coordinates
         
-        purchase.save()
-        
-        # Update inventory immediately after successful purchase
-        product.inventory -= quantity
-        
-        # Update statistics
-        product.total_purchases += 1
-        product.save()
+        with transaction.atomic():
+            # Take the items out of stock first; a concurrent order may have got the last ones
+            if not inventory_service.reserve_inventory(product.id, quantity):
+                messages.error(request, f'Sorry, {product.title} sold out while placing your order.')
+                return redirect('post_detail', post_id=post_id)
+            
+            purchase.save()
+            
+            # Update user's total purchases in the database, not from the (possibly cached) request.user.
+            # update() sends no post_save, so drop the cached copies here
+            user_id = request.user.pk
+            User.objects.filter(pk=user_id).update(
+                total_purchases=F('total_purchases') + total_price + delivery_fee
+            )
+            transaction.on_commit(lambda: invalidate_cached_user(user_id))
+            transaction.on_commit(lambda: invalidate_user_tokens(user_id))
         
-        # Update user's total purchases
-        request.user.total_purchases += total_price + delivery_fee
-        request.user.save()
+        # Queued for the background mail worker; never blocks the response
+        send_order_confirmation_email(purchase)
         
         # Success message based on delivery method
         if delivery_method == 'delivery':
@@ -968,28 +1063,19 @@ def purchase_product(request, post_id):
 def bookmark_toggle(request, post_id):
     if request.method == 'POST':
         try:
-            post = get_object_or_404(Post, id=post_id)
-            
-            # Check if this post is already bookmarked by the user
-            existing_bookmark = Bookmark.objects.filter(user=request.user, post=post).first()
-            
-            if existing_bookmark:
-                # If bookmark already existed, delete it (toggle off)
-                existing_bookmark.delete()
-                is_bookmarked = False
-                status = 'removed'
-            else:
-                # Create a new bookmark
-                Bookmark.objects.create(user=request.user, post=post)
-                is_bookmarked = True
-                status = 'added'
+            is_bookmarked = bookmark_service.toggle_bookmark(request.user.id, post_id)
             
             return JsonResponse({
                 'success': True,
                 'is_bookmarked': is_bookmarked,
-                'status': status,
+                'status': 'added' if is_bookmarked else 'removed',
                 'post_id': post_id
             })
+        except Post.DoesNotExist:
+            return JsonResponse({
+                'success': False,
+                'error': 'Product not found'
+            }, status=404)
         except Exception as e:
             return JsonResponse({
                 'success': False,
@@ -1091,7 +1177,8 @@ def admin_dashboard(request):
         'completed_orders': completed_orders,
         'total_revenue': total_revenue,
         'recent_orders': recent_orders,
-        'low_stock_products': low_stock_products
+        'low_stock_products': low_stock_products,
+        'profiling_enabled': profiling.profiling_enabled(),
     }
     
     return render(request, 'authentication/admin_dashboard.html', context)
@@ -1246,20 +1333,22 @@ def create_product(request):
                 category=category,
                 inventory=inventory
             )
-            post.save()
-            
-            # Process auxiliary images (limit to 5)
-            auxiliary_images = request.FILES.getlist('auxiliary_images')
-            print(f"DEBUG: Found {len(auxiliary_images)} auxiliary images in create_product")
-            max_images = min(len(auxiliary_images), 5)  # Limit to 5 images
-            
-            for i in range(max_images):
-                print(f"DEBUG: Creating auxiliary image {i+1} of {max_images}")
-                ProductImage.objects.create(
-                    product=post,
-                    image=auxiliary_images[i],
-                    display_order=i
-                )
+            # The product and its gallery become visible (and syncable) together
+            with transaction.atomic():
+                post.save()
+                
+                # Process auxiliary images (limit to 5)
+                auxiliary_images = request.FILES.getlist('auxiliary_images')
+                print(f"DEBUG: Found {len(auxiliary_images)} auxiliary images in create_product")
+                max_images = min(len(auxiliary_images), 5)  # Limit to 5 images
+                
+                for i in range(max_images):
+                    print(f"DEBUG: Creating auxiliary image {i+1} of {max_images}")
+                    ProductImage.objects.create(
+                        product=post,
+                        image=auxiliary_images[i],
+                        display_order=i
+                    )
                 
             messages.success(request, 'Product listing created successfully!')
             return redirect('dashboard')
@@ -1272,18 +1361,12 @@ def create_product(request):
 def like_post(request, post_id):
     if request.method == 'POST':
         try:
-            post = get_object_or_404(Post, id=post_id)
-            
-            if request.user in post.likes.all():
-                post.likes.remove(request.user)
-                liked = False
-            else:
-                post.likes.add(request.user)
-                liked = True
+            post = get_object_or_404(Post.objects.only('id'), id=post_id)
+            liked, total_likes = like_service.toggle_like(post.id, request.user.id)
                 
             return JsonResponse({
                 'liked': liked,
-                'total_likes': post.total_likes()
+                'total_likes': total_likes
             })
         except Exception as e:
             return JsonResponse({
@@ -1397,4 +1480,19 @@ def edit_product(request, product_id):
     
     return render(request, 'authentication/edit_product.html', context)
 
-# Removed all QR Code, OTP, and Kicks_life 250 views for simplified single-vendor workflow
+@login_required
+def user_qr_code_image(request):
+    """Render the user's pickup QR code straight into the response (PNG or SVG)"""
+    image_format = request.GET.get('format', 'png').lower()
+    if image_format not in ['png', 'svg']:
+        return JsonResponse({'error': 'Unsupported format. Use png or svg.'}, status=400)
+    
+    token = generate_user_qr_data(request.user)
+    content, content_type = render_qr_image(token, image_format)
+    
+    response = HttpResponse(content, content_type=content_type)
+    # The image changes with the user's purchases, so it must never be shared
+    response['Cache-Control'] = 'private, no-store'
+    return response
+
+# Removed all OTP and Kicks_life 250 views for simplified single-vendor workflow
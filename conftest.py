@@ -0,0 +1,2 @@
+# Benchmark suite options and reporting (authentication/benchmarks)
+pytest_plugins = ['authentication.benchmarks.plugin']
@@ -0,0 +1,432 @@
+#!/usr/bin/env python3
+"""
+KoraQuest Load Test
+
+Runs many virtual users against a running server at once, each with its own
+KoraQuestAPIClient (see test_api_improved.py). Customers pick weighted
+scenarios (browse, search, like, bookmark, purchase) and use the endpoints a
+customer can reach: the v1 dashboard, like and bookmark APIs with their token,
+the product page, and the web purchase form. The first --admins users are
+store admins moving pending orders along through the REST API.
+At the end it reports throughput and latency percentiles per scenario,
+errors, and whether the purchases oversold the contended products.
+
+The users are the ones created by `python manage.py seed_store`
+(<prefix>_customer_N / <prefix>_admin_N). Run the server with rate limiting
+off, or most writes come back 429. Session cookies are Secure when DEBUG is
+off, so over plain http run the server with DEBUG on (and the N+1 detector
+off):
+
+    DEBUG=True NPLUSONE_ENABLED=False RATE_LIMIT_ENABLED=False gunicorn KoraQuest.wsgi:application -w 4
+    python load_test.py --users 50 --duration 60
+    python load_test.py --users 200 --mode process --mix browse=60,search=20,purchase=20
+
+Purchases all go to the --hot-products best sellers so orders race for the
+same stock. The script exits with status 1 when stock was oversold, the
+error rate is above --max-error-rate, or every request failed.
+"""
+
+import argparse
+import json
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Dict, List
+
+import requests
+
+from test_api_improved import KoraQuestAPIClient
+
+DEFAULT_MIX = {'browse': 40, 'search': 20, 'like': 15, 'bookmark': 15, 'purchase': 10}
+DEFAULT_PASSWORD = 'seed-pass-123'  # authentication.seeding.DEFAULT_PASSWORD
+# Words from the seeded product titles, so searches find something
+SEARCH_TERMS = ['Runner', 'Boot', 'Loafer', 'Trainer', 'Classic', 'Trail', 'Urban Sandal', 'Court High-Top']
+NEXT_STATUS = {'pending': 'processing', 'processing': 'shipped', 'shipped': 'delivered'}
+PERCENTILES = (50, 90, 95, 99)
+
+
+class SetupError(Exception):
+    """The server or its data cannot run the load test"""
+
+
+class LoadTestClient(KoraQuestAPIClient):
+    """
+    KoraQuestAPIClient that keeps the last response, for its status code, and
+    adds the customer-facing endpoints: the REST post endpoints only show
+    customers the products they own.
+    """
+
+    def __init__(self, base_url: str):
+        super().__init__(base_url)
+        self.last_response = None
+        self.token = None
+        self.session.hooks['response'].append(self._keep_response)
+
+    def _keep_response(self, response, *args, **kwargs):
+        self.last_response = response
+
+    def _token_headers(self) -> Dict[str, str]:
+        return {'Authorization': f'Bearer {self.token}'}
+
+    def get_api_token(self, username: str, password: str) -> Dict[str, Any]:
+        """Get the Bearer token the v1 API authenticates with"""
+        response = self.session.post(f"{self.base_url}/v1/login/", json={'username': username, 'password': password})
+        data = response.json()
+        self.token = data.get('data', {}).get('auth', {}).get('token')
+        return data
+
+    def get_dashboard(self, **params) -> Dict[str, Any]:
+        """The customer catalog (v1 dashboard API)"""
+        response = self.session.get(f"{self.base_url}/v1/dashboard/", params=params, headers=self._token_headers())
+        return response.json()
+
+    def get_product_page(self, post_id: int):
+        """The product page a customer opens from the catalog"""
+        return self.session.get(f"{self.base_url}/post/{post_id}/")
+
+    def toggle_like(self, post_id: int) -> Dict[str, Any]:
+        response = self.session.post(f"{self.base_url}/v1/like/{post_id}/", headers=self._token_headers())
+        return response.json()
+
+    def toggle_bookmark(self, post_id: int) -> Dict[str, Any]:
+        response = self.session.post(f"{self.base_url}/v1/bookmark/{post_id}/", headers=self._token_headers())
+        return response.json()
+
+    def place_order(self, post_id: int, order_data: Dict[str, Any]):
+        """
+        Submit the product page's purchase form (session and CSRF token).
+        It redirects to the purchase history when the order is placed and
+        back to the product page when it is refused.
+        """
+        return self.session.post(
+            f"{self.base_url}/post/{post_id}/purchase/", data=order_data,
+            headers={'X-CSRFToken': self.csrf_token or ''}, allow_redirects=False,
+        )
+
+
+class UserResult:
+    """What one virtual user saw; returned from pool workers, so only plain data"""
+
+    def __init__(self):
+        self.timings: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+        self.throttled = 0
+        self.sold_out = 0
+        self.sold: Dict[int, int] = {}
+        self.error_samples: List[str] = []
+
+    def record(self, scenario: str, seconds: float):
+        self.timings.setdefault(scenario, []).append(seconds)
+
+    def error(self, scenario: str, detail: str):
+        self.errors[scenario] = self.errors.get(scenario, 0) + 1
+        if len(self.error_samples) < 5:
+            self.error_samples.append(f'{scenario}: {detail}')
+
+
+# ============================================
+# SCENARIOS
+# ============================================
+# Each returns the status of its last response, or None when it handled the
+# outcome itself; `context` holds the product ids found during setup and the
+# hot products purchases go to.
+
+def browse(client, context, rng, result):
+    client.get_dashboard(page=rng.randint(1, context['pages']))
+    status = client.last_response.status_code
+    if status == 200:
+        client.get_product_page(rng.choice(context['products']))
+    return client.last_response.status_code
+
+
+def search(client, context, rng, result):
+    client.get_dashboard(q=rng.choice(SEARCH_TERMS))
+    return client.last_response.status_code
+
+
+def like(client, context, rng, result):
+    client.toggle_like(rng.choice(context['products']))
+    return client.last_response.status_code
+
+
+def bookmark(client, context, rng, result):
+    client.toggle_bookmark(rng.choice(context['products']))
+    return client.last_response.status_code
+
+
+def purchase(client, context, rng, result):
+    post_id = rng.choice(context['hot_products'])
+    quantity = rng.randint(1, 2)
+    response = client.place_order(post_id, {
+        'quantity': quantity, 'delivery_method': 'pickup', 'payment_method': 'momo',
+    })
+    location = response.headers.get('Location', '')
+    if response.status_code != 302:
+        return response.status_code
+    if location.endswith('/purchases/'):
+        result.sold[post_id] = result.sold.get(post_id, 0) + quantity
+        return None
+    if location.endswith(f'/post/{post_id}/'):
+        # Refused because the stock ran out: correct behaviour, not an error
+        result.sold_out += 1
+        return None
+    # Anything else is the login page: the session was lost
+    result.error('purchase', f'redirected to {location}')
+    return None
+
+
+def admin_orders(client, context, rng, result):
+    current = rng.choice(list(NEXT_STATUS))
+    data = client.get_purchases(status=current)
+    if client.last_response.status_code != 200:
+        return client.last_response.status_code
+    orders = data.get('results', [])
+    if orders:
+        client.update_purchase_status(rng.choice(orders)['id'], NEXT_STATUS[current])
+    return client.last_response.status_code
+
+
+SCENARIOS = {
+    'browse': browse,
+    'search': search,
+    'like': like,
+    'bookmark': bookmark,
+    'purchase': purchase,
+    'admin_orders': admin_orders,
+}
+
+
+# ============================================
+# VIRTUAL USERS
+# ============================================
+
+def run_user(options: Dict[str, Any], index: int, context: Dict[str, Any], deadline: float) -> UserResult:
+    """One virtual user: log in, then run scenarios until the deadline"""
+    result = UserResult()
+    rng = random.Random(f"{options['seed']}:{index}")
+    is_admin = index < options['admins']
+    username = (
+        f"{options['prefix']}_admin_{index % options['admin_accounts']}" if is_admin
+        else f"{options['prefix']}_customer_{index % options['customer_accounts']}"
+    )
+
+    client = LoadTestClient(options['base_url'])
+    try:
+        # Customers need the session for the purchase form and the token for the v1 API
+        client.login_user(username, options['password'])
+        if client.last_response.status_code == 200 and not is_admin:
+            client.get_api_token(username, options['password'])
+    except Exception as e:
+        result.error('login', f'{username}: {e}')
+        return result
+    if client.last_response.status_code != 200:
+        result.error('login', f'{username}: HTTP {client.last_response.status_code}')
+        return result
+
+    mix = options['mix']
+    names, weights = list(mix), list(mix.values())
+    while time.time() < deadline:
+        scenario = 'admin_orders' if is_admin else rng.choices(names, weights)[0]
+        client.last_response = None
+        started = time.perf_counter()
+        try:
+            status = SCENARIOS[scenario](client, context, rng, result)
+        except Exception as e:
+            # Usually a non-JSON error page; report its status when there is one
+            result.record(scenario, time.perf_counter() - started)
+            response = client.last_response
+            result.error(scenario, f'HTTP {response.status_code}' if response is not None and response.status_code >= 400 else str(e))
+            continue
+        result.record(scenario, time.perf_counter() - started)
+        if status == 429:
+            result.throttled += 1
+        elif status is not None and status >= 400:
+            result.error(scenario, f'HTTP {status}')
+        if options['think_time']:
+            time.sleep(rng.uniform(0, options['think_time']))
+    return result
+
+
+def setup(options: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Find the products to use and the starting stock of the hot ones.
+    Raises SetupError when the seeded users cannot log in or see the catalog.
+    """
+    admin = f"{options['prefix']}_admin_0"
+    client = LoadTestClient(options['base_url'])
+    client.login_user(admin, options['password'])
+    if client.last_response.status_code != 200:
+        raise SetupError(f"could not log in as {admin}; run `python manage.py seed_store` first")
+
+    # Admins see the whole catalog, with stock, through the REST API
+    listing = client.get_posts(ordering='-total_purchases')
+    hot = [post for post in listing['results'] if post['inventory'] > 0][:options['hot_products']]
+    if not hot:
+        raise SetupError('no product is in stock')
+
+    customer_name = f"{options['prefix']}_customer_0"
+    customer = LoadTestClient(options['base_url'])
+    customer.get_api_token(customer_name, options['password'])
+    if customer.token is None:
+        raise SetupError(f"could not get an API token for {customer_name}")
+    catalog = customer.get_dashboard(sort='popular', page_size=100)
+    if customer.last_response.status_code != 200:
+        raise SetupError(f'the customer catalog (/v1/dashboard/) returned HTTP {customer.last_response.status_code}')
+    products = [post['id'] for post in catalog['data']['posts']]
+    if not products:
+        raise SetupError(f'the catalog is empty for {customer_name}')
+
+    return {
+        'products': products,
+        # Browsing uses the default page size of 20
+        'pages': max(1, min(-(-catalog['data']['pagination']['total_items'] // 20), 50)),
+        'hot_products': [post['id'] for post in hot],
+        'initial_stock': {post['id']: post['inventory'] for post in hot},
+    }
+
+
+def check_stock(options: Dict[str, Any], context: Dict[str, Any], results: List[UserResult]) -> List[str]:
+    """Problems with the hot products' stock after the run (oversold or lost updates)"""
+    client = LoadTestClient(options['base_url'])
+    client.login_user(f"{options['prefix']}_admin_0", options['password'])
+    problems = []
+    for post_id, initial in context['initial_stock'].items():
+        sold = sum(result.sold.get(post_id, 0) for result in results)
+        final = client.get_post(post_id)['inventory']
+        if sold > initial or final < 0:
+            problems.append(f'product {post_id}: OVERSOLD, {sold} sold from a stock of {initial} (now {final})')
+        elif initial - sold != final:
+            problems.append(f'product {post_id}: stock is {final}, expected {initial} - {sold} = {initial - sold}')
+    return problems
+
+
+# ============================================
+# REPORT
+# ============================================
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    index = max(0, min(len(sorted_values) - 1, round(p / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summarize(results: List[UserResult], elapsed: float, stock_problems: List[str]) -> Dict[str, Any]:
+    timings: Dict[str, List[float]] = {}
+    errors: Dict[str, int] = {}
+    for result in results:
+        for scenario, values in result.timings.items():
+            timings.setdefault(scenario, []).extend(values)
+        for scenario, count in result.errors.items():
+            errors[scenario] = errors.get(scenario, 0) + count
+
+    scenarios = {}
+    for scenario in sorted(set(timings) | set(errors)):
+        values = sorted(timings.get(scenario, []))
+        row = {'count': len(values), 'errors': errors.get(scenario, 0), 'rate': len(values) / elapsed}
+        if values:
+            row.update({f'p{p}_ms': percentile(values, p) * 1000 for p in PERCENTILES})
+            row['max_ms'] = values[-1] * 1000
+        scenarios[scenario] = row
+
+    total = sum(row['count'] for row in scenarios.values())
+    total_errors = sum(errors.values())
+    return {
+        'duration_s': elapsed,
+        'runs': total,
+        'throughput': total / elapsed,
+        'errors': total_errors,
+        'error_rate': total_errors / total if total else 1.0,
+        'throttled': sum(result.throttled for result in results),
+        'sold_out_refusals': sum(result.sold_out for result in results),
+        'scenarios': scenarios,
+        'stock_problems': stock_problems,
+        'error_samples': [sample for result in results for sample in result.error_samples][:10],
+    }
+
+
+def print_report(summary: Dict[str, Any]):
+    print(f"\n{summary['runs']} scenario runs in {summary['duration_s']:.1f}s "
+          f"({summary['throughput']:.1f}/s), {summary['errors']} errors ({summary['error_rate']:.1%}), "
+          f"{summary['throttled']} throttled, {summary['sold_out_refusals']} refused as sold out\n")
+    header = f"{'scenario':<14}{'count':>8}{'/s':>8}{'errors':>8}" + ''.join(f'{f"p{p}":>9}' for p in PERCENTILES) + f"{'max':>9}"
+    print(header)
+    print('-' * len(header))
+    for scenario, row in summary['scenarios'].items():
+        line = f"{scenario:<14}{row['count']:>8}{row['rate']:>8.1f}{row['errors']:>8}"
+        if row['count']:
+            line += ''.join(f"{row[f'p{p}_ms']:>9.1f}" for p in PERCENTILES) + f"{row['max_ms']:>9.1f}"
+        print(line)
+    print('(latencies in ms; a scenario may make more than one request)')
+
+    if summary['error_samples']:
+        print('\nSample errors:')
+        for sample in summary['error_samples']:
+            print(f'  {sample}')
+    print('\nStock check: ' + ('OK' if not summary['stock_problems'] else ''))
+    for problem in summary['stock_problems']:
+        print(f'  ❌ {problem}')
+
+
+def parse_mix(value: str) -> Dict[str, float]:
+    mix = {}
+    for part in value.split(','):
+        name, _, weight = part.partition('=')
+        if name not in SCENARIOS or name == 'admin_orders':
+            raise argparse.ArgumentTypeError(f'unknown scenario {name!r}')
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Concurrent load test of the KoraQuest REST API')
+    parser.add_argument('--base-url', default='http://localhost:8000')
+    parser.add_argument('--users', type=int, default=20, help='Concurrent virtual users')
+    parser.add_argument('--admins', type=int, default=1, help='How many of the users are store admins')
+    parser.add_argument('--duration', type=float, default=30, help='Seconds to run')
+    parser.add_argument('--mode', choices=['thread', 'process'], default='thread',
+                        help='Run users in threads, or in processes to load the server harder')
+    parser.add_argument('--mix', type=parse_mix, default=DEFAULT_MIX,
+                        help='Customer scenario weights, e.g. browse=40,search=20,purchase=10')
+    parser.add_argument('--hot-products', type=int, default=3, help='Best sellers that purchases compete for')
+    parser.add_argument('--think-time', type=float, default=0, help='Max random pause between scenarios (s)')
+    parser.add_argument('--prefix', default='seed', help='Username prefix used by seed_store')
+    parser.add_argument('--password', default=DEFAULT_PASSWORD)
+    parser.add_argument('--customer-accounts', type=int, default=1000, help='Seeded customers to spread users over')
+    parser.add_argument('--admin-accounts', type=int, default=10, help='Seeded admins to spread admin users over')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--max-error-rate', type=float, default=0.01)
+    parser.add_argument('--json', help='Also write the summary to this file')
+    options = vars(parser.parse_args())
+
+    print(f"🚀 Load testing {options['base_url']} with {options['users']} users for {options['duration']:.0f}s")
+    try:
+        context = setup(options)
+    except (SetupError, requests.RequestException, ValueError) as e:
+        # ValueError: a response that was not JSON, e.g. an error page
+        print(f"❌ Setup failed: {e}")
+        if options['json']:
+            with open(options['json'], 'w') as f:
+                json.dump({'setup_error': str(e)}, f, indent=2)
+        sys.exit(1)
+    print(f"Purchases compete for products {context['hot_products']} (stock {context['initial_stock']})")
+
+    executor_class = ProcessPoolExecutor if options['mode'] == 'process' else ThreadPoolExecutor
+    started = time.time()
+    deadline = started + options['duration']
+    with executor_class(max_workers=options['users']) as executor:
+        futures = [executor.submit(run_user, options, index, context, deadline) for index in range(options['users'])]
+        results = [future.result() for future in futures]
+    elapsed = time.time() - started
+
+    summary = summarize(results, elapsed, check_stock(options, context, results))
+    print_report(summary)
+    if options['json']:
+        with open(options['json'], 'w') as f:
+            json.dump(summary, f, indent=2)
+
+    failed = summary['stock_problems'] or summary['error_rate'] > options['max_error_rate']
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -13,13 +13,14 @@ from typing import Dict, Any
 class KoraQuestAPIClient:
     def __init__(self, base_url: str = "http://localhost:8000"):
         self.base_url = base_url
+        self.api_url = f"{base_url}/api/rest"
         self.session = requests.Session()
         self.csrf_token = None
         
     def get_csrf_token(self):
         """Get CSRF token for authenticated requests"""
         try:
-            response = self.session.get(f"{self.base_url}/auth/login/")
+            response = self.session.get(f"{self.base_url}/login/")
             # Extract CSRF token from the response
             if 'csrftoken' in response.cookies:
                 self.csrf_token = response.cookies['csrftoken']
@@ -44,32 +45,35 @@ class KoraQuestAPIClient:
     
     def register_user(self, user_data: Dict[str, Any]) -> Dict[str, Any]:
         """Register a new user"""
-        url = f"{self.base_url}/auth/api/rest/auth/register/"
+        url = f"{self.api_url}/auth/register/"
         response = self.session.post(url, json=user_data, headers=self.get_headers())
         return response.json()
     
     def login_user(self, username: str, password: str) -> Dict[str, Any]:
         """Login user"""
-        url = f"{self.base_url}/auth/api/rest/auth/login/"
+        url = f"{self.api_url}/auth/login/"
         data = {"username": username, "password": password}
         response = self.session.post(url, json=data, headers=self.get_headers())
+        # Logging in rotates the CSRF token; later POSTs must send the new one
+        if 'csrftoken' in self.session.cookies:
+            self.csrf_token = self.session.cookies['csrftoken']
         return response.json()
     
     def logout_user(self) -> Dict[str, Any]:
         """Logout user"""
-        url = f"{self.base_url}/auth/api/rest/auth/logout/"
+        url = f"{self.api_url}/auth/logout/"
         response = self.session.post(url, headers=self.get_headers())
         return response.json()
     
     def get_user_profile(self) -> Dict[str, Any]:
         """Get current user profile"""
-        url = f"{self.base_url}/auth/api/rest/users/me/"
+        url = f"{self.api_url}/users/me/"
         response = self.session.get(url, headers=self.get_headers())
         return response.json()
     
     def create_post(self, post_data: Dict[str, Any]) -> Dict[str, Any]:
         """Create a new post/product (without file upload for testing)"""
-        url = f"{self.base_url}/auth/api/rest/posts/"
+        url = f"{self.api_url}/posts/"
         # For testing, we'll create a post without image
         test_data = {
             "title": "Test Product",
@@ -83,49 +87,61 @@ class KoraQuestAPIClient:
     
     def get_posts(self, **filters) -> Dict[str, Any]:
         """Get all posts with optional filters"""
-        url = f"{self.base_url}/auth/api/rest/posts/"
+        url = f"{self.api_url}/posts/"
         response = self.session.get(url, params=filters, headers=self.get_headers())
         return response.json()
     
+    def get_post(self, post_id: int) -> Dict[str, Any]:
+        """Get a single post"""
+        url = f"{self.api_url}/posts/{post_id}/"
+        response = self.session.get(url, headers=self.get_headers())
+        return response.json()
+    
     def like_post(self, post_id: int) -> Dict[str, Any]:
         """Like/unlike a post"""
-        url = f"{self.base_url}/auth/api/rest/posts/{post_id}/like/"
+        url = f"{self.api_url}/posts/{post_id}/like/"
         response = self.session.post(url, headers=self.get_headers())
         return response.json()
     
     def bookmark_post(self, post_id: int) -> Dict[str, Any]:
         """Bookmark/unbookmark a post"""
-        url = f"{self.base_url}/auth/api/rest/posts/{post_id}/bookmark/"
+        url = f"{self.api_url}/posts/{post_id}/bookmark/"
         response = self.session.post(url, headers=self.get_headers())
         return response.json()
     
     def purchase_product(self, post_id: int, purchase_data: Dict[str, Any]) -> Dict[str, Any]:
         """Purchase a product"""
-        url = f"{self.base_url}/auth/api/rest/posts/{post_id}/purchase/"
+        url = f"{self.api_url}/posts/{post_id}/purchase/"
         response = self.session.post(url, json=purchase_data, headers=self.get_headers())
         return response.json()
     
     def add_review(self, post_id: int, review_data: Dict[str, Any]) -> Dict[str, Any]:
         """Add a product review"""
-        url = f"{self.base_url}/auth/api/rest/posts/{post_id}/add_review/"
+        url = f"{self.api_url}/posts/{post_id}/add_review/"
         response = self.session.post(url, json=review_data, headers=self.get_headers())
         return response.json()
     
     def get_dashboard_stats(self) -> Dict[str, Any]:
         """Get dashboard statistics"""
-        url = f"{self.base_url}/auth/api/rest/dashboard/stats/"
+        url = f"{self.api_url}/dashboard/stats/"
         response = self.session.get(url, headers=self.get_headers())
         return response.json()
     
     def get_purchases(self, **filters) -> Dict[str, Any]:
         """Get user purchases"""
-        url = f"{self.base_url}/auth/api/rest/purchases/"
+        url = f"{self.api_url}/purchases/"
         response = self.session.get(url, params=filters, headers=self.get_headers())
         return response.json()
     
+    def update_purchase_status(self, purchase_id: int, status: str) -> Dict[str, Any]:
+        """Update an order's status (admin only)"""
+        url = f"{self.api_url}/purchases/{purchase_id}/update_status/"
+        response = self.session.post(url, json={"status": status}, headers=self.get_headers())
+        return response.json()
+    
     def get_bookmarks(self) -> Dict[str, Any]:
         """Get user bookmarks"""
-        url = f"{self.base_url}/auth/api/rest/bookmarks/"
+        url = f"{self.api_url}/bookmarks/"
         response = self.session.get(url, headers=self.get_headers())
         return response.json()
 
@@ -219,7 +235,7 @@ def main():
     print("\n🎉 API Test Complete!")
     print("\n✅ Your KoraQuest API is working correctly!")
     print("\nNext steps:")
-    print("1. Access the browsable API: http://localhost:8000/auth/api/rest/")
+    print("1. Access the browsable API: http://localhost:8000/api/rest/")
     print("2. Access the admin panel: http://localhost:8000/admin/")
     print("3. Start building your frontend application!")
 